@@ -2,3 +2,10 @@
 from core_debug_common.bfm_base import *
 from .mem_model import *
 from .params_iterator import *
+from .mmap_mem_model import *
+from .event_stream import *
+from .elf_cache import *
+from .os_awareness import *
+from .freertos_awareness import *
+from .excp_stats import *
+from .profiler import *
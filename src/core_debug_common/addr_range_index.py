@@ -0,0 +1,83 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from bisect import bisect_right
+
+
+class AddrRangeIndex(object):
+    """Maps address ranges to the callbacks watching them.
+    
+    The boundaries of all registered ranges split the address space
+    into segments, each holding the tuple of callbacks that cover it.
+    A lookup is a binary search over the boundaries. The segment table
+    is rebuilt when callbacks are added or removed, so the returned
+    tuples may be iterated while callbacks deregister themselves.
+    """
+    
+    def __init__(self):
+        # List of (start, end, f). end is exclusive
+        self.ranges = []
+        self.bounds = [0]
+        self.segs = [()]
+        
+    def add(self, start, end, f):
+        self.add_ranges([(start, end)], f)
+        
+    def add_ranges(self, ranges, f):
+        """Adds a list of (start,end) ranges for a callback. Nothing is
+        added if any range is empty"""
+        for start, end in ranges:
+            if end <= start:
+                raise Exception("Empty address range 0x%08x..0x%08x" % (start, end))
+        for start, end in ranges:
+            self.ranges.append((start, end, f))
+        self._build()
+        
+    def remove(self, f):
+        """Removes all ranges registered for a callback"""
+        ranges = [r for r in self.ranges if r[2] != f]
+        if len(ranges) == len(self.ranges):
+            raise ValueError("Callback is not registered")
+        self.ranges = ranges
+        self._build()
+        
+    def has(self, f) -> bool:
+        for r in self.ranges:
+            if r[2] == f:
+                return True
+        return False
+        
+    def find(self, addr, size=1) -> tuple:
+        """Returns callbacks whose ranges overlap [addr,addr+size)"""
+        bounds = self.bounds
+        i = bisect_right(bounds, addr)-1
+        if i+1 == len(bounds) or addr+size <= bounds[i+1]:
+            # Access is within a single segment
+            return self.segs[i]
+        else:
+            j = bisect_right(bounds, addr+size-1)-1
+            ret = []
+            for seg in self.segs[i:j+1]:
+                for f in seg:
+                    if f not in ret:
+                        ret.append(f)
+            return tuple(ret)
+        
+    def _build(self):
+        bounds = set([0])
+        for start, end, _ in self.ranges:
+            bounds.add(start)
+            bounds.add(end)
+        self.bounds = sorted(bounds)
+        
+        segs = []
+        for b in self.bounds:
+            seg = []
+            for start, end, f in self.ranges:
+                if start <= b < end and f not in seg:
+                    seg.append(f)
+            segs.append(tuple(seg))
+        self.segs = segs
+        
@@ -3,16 +3,29 @@ Created on Feb 7, 2021
 
 @author: mballance
 '''
+from bisect import bisect_right
 import ctypes
-import pybfms
+import mmap
+import os
 from builtins import int
 from enum import IntFlag, auto
-from typing import List
+import fnmatch
+from itertools import compress, islice
+from operator import or_
+import re
+from typing import Dict, List, Optional, Tuple
 
+from core_debug_common.addr_range_index import AddrRangeIndex
+from core_debug_common.elf_image import ElfImage
+from core_debug_common.elf_info import ElfInfo
+from core_debug_common.event_stream import EventKind, Backpressure, EventStream
+from core_debug_common.excp_stats import ExcpStats
 from core_debug_common.mem_model import MemModel
+from core_debug_common.os_awareness import OsAwareness
 from core_debug_common.params_iterator import ParamsIterator
-from core_debug_common.stack_frame import StackFrame
+from core_debug_common.stack_frame import StackFrame, SymTable
 from core_debug_common.thread_info import ThreadInfo
+from core_debug_common.waiter_registry import WaiterRegistry
 from elftools.elf.elffile import ELFFile
 from elftools.elf.sections import SymbolTableSection
 from hvlrpc import va_list
@@ -26,6 +39,13 @@ class ExecEvent(IntFlag):
     Ret  = auto()  # "Instruction is the first after returning from a function"
     Excp = auto()  # "Instruction is first in exception handler"
     Eret = auto()  # "Instruction is first after returning from exeception handler"
+    
+# Event bits as plain ints. Bitwise operators on IntFlag construct
+# new enum values, which is costly on the per-instruction path
+_EV_CALL = int(ExecEvent.Call)
+_EV_RET  = int(ExecEvent.Ret)
+_EV_EXCP = int(ExecEvent.Excp)
+_EV_ERET = int(ExecEvent.Eret)
 
 class BfmBase(hvlrpc.Endpoint):
     
@@ -33,258 +53,733 @@ class BfmBase(hvlrpc.Endpoint):
             self,
             addr_width=32,
             data_width=32,
-            little_endian=True):
+            little_endian=True,
+            mem_model_t=MemModel):
+        """mem_model_t selects the mirror-memory implementation. Pass
+        MmapMemModel to keep the mirror in a sparse memory-mapped file"""
         super().__init__()
         
         self.addr_width = addr_width
         self.data_width = data_width
         self.little_endian = little_endian
-        self.mm = MemModel(addr_width, data_width, little_endian)
+        self.mm = mem_model_t(addr_width, data_width, little_endian)
+        
+        # Callback collections are immutable tuples, replaced when a
+        # callback is added or removed. This allows callbacks to 
+        # deregister themselves without copying on each event
+        self.memwrite_cb = ()
+        self.memread_cb = ()
+        
+        # Callbacks that receive memory writes in batches
+        self.memwrite_batch_cb = ()
         
-        self.memwrite_cb = []
-        self.memread_cb = []
+        # Callbacks on specific address ranges
+        self.memwrite_idx = AddrRangeIndex()
+        self.memread_idx = AddrRangeIndex()
+        self._word_bytes = data_width // 8
+        self._word_mask = (1 << self._word_bytes)-1
 
         # Callbacks activated on each instruction execution        
-        self.on_exec_cb = []
+        self.on_exec_cb = ()
+        
+        # Callbacks activated on execution of specific addresses. Map
+        # of address to a tuple of callbacks
+        self.on_sym_exec_cb = {}
 
         # Callbacks activated on each entry/exit        
-        self.on_entry_cb = []
-        self.on_exit_cb = []
-        self.on_excp_cb = []
-        self.on_eret_cb = []
+        self.on_entry_cb = ()
+        self.on_exit_cb = ()
+        self.on_excp_cb = ()
+        self.on_eret_cb = ()
+        # Callbacks activated when the scheduled thread changes
+        self.on_thread_switch_cb = ()
         
-        # Callbacks activated on specific entry/exit
+        # Callbacks activated on specific entry/exit. Map of 
+        # function address to a tuple of callbacks
         self.on_sym_entry_cb = {}
         self.on_sym_exit_cb = {}
         
+        # Callbacks registered with a symbol pattern. Each entry is 
+        # [sym_cb_m, pattern, f, addrs]. The pattern is resolved again
+        # when images are loaded or unloaded
+        self._pattern_subs = []
+        
+        # Set of addresses at which plain instructions are of interest.
+        # Computed on demand. BFM specializations that set pc_filter_en
+        # are notified via pc_filter_changed() when the set changes
+        self.pc_filter_en = False
+        self._pc_filter = None
+        self._pc_filter_stale = True
+        # Number of users that need every instruction reported
+        self._n_full_exec = 0
+        
+        # Coroutines waiting on on_exec/on_entry/on_exit
+        self.exec_waiters = WaiterRegistry(self._exec_subscribers_changed)
+        self.entry_waiters = WaiterRegistry(self._pc_filter_changed)
+        self.exit_waiters = WaiterRegistry(self._pc_filter_changed)
+        
+        # True when nothing observes individual instructions, allowing
+        # execute() to only decode event bits
+        self._exec_idle = True
+        
+        # Addresses with exec waiters or address-specific exec callbacks.
+        # Updated in place, since execute_batch() holds a reference
+        self._exec_addrs = set()
+        
+        # Number of event streams requesting that the simulation stall
+        self._n_backpressure = 0
+        
         self.addr2sym_m = {}
         self.sym2addr_m = {}
         
-        self.filter_m = {}
+        # When set, a return that does not match the top frame raises 
+        # rather than resynchronizing the callstack
+        self.strict_unwind = False
+        # Unwinder diagnostics. Returns that required popping to a 
+        # deeper frame, frames exited that way, and returns that no 
+        # frame expected
+        self.n_ret_resync = 0
+        self.n_ret_skipped = 0
+        self.n_ret_unmatched = 0
+        
+        # exit() receives a StackFrame, so only build one when overridden
+        self._exit_hooked = type(self).exit is not BfmBase.exit
+        
+        # Symbol names of the call stacks of this BFM's threads. Scoped
+        # to the BFM, so names are not kept beyond its lifetime
+        self.symtab = SymTable()
+        # Symbol IDs of formatted names (func+off, <unknown ..>) of
+        # addresses without a symbol. Flushed when images change
+        self._fmt_symid_m = {}
+        
+        # Loaded images, in load order. addr2sym_m and sym2addr_m merge
+        # the symbols of all images, with later images taking precedence
+        self.images : List[ElfImage] = []
+        self.image_m = {}
+        # Images sorted by start address, for image_at()
+        self._img_sorted : List[ElfImage] = []
+        self._img_starts : List[int] = []
+        self._img_overlap = False
+
+        # Optional OS-awareness plugin. See set_os_awareness()
+        self.os_awareness : OsAwareness = None
 
         # Create a default thread and initial stack frame
         init_t = self.create_thread("<default>")
-        init_t.callstack.append(StackFrame(0, "<initial>", False))
+        self._init_callstack(init_t)
        
         self.active_thread = init_t
-        self.threads : List[ThreadInfo] = [init_t]
+        # Map of thread ID to thread
+        self.threads : Dict[object,ThreadInfo] = {init_t.tid : init_t}
         self.exc_thread_s : List[ThreadInfo] = []
+        # Exception contexts are reused. They are pooled by nesting 
+        # level and, when excp_pool_by_cause is set, by the trap cause
+        # reported by get_excp_cause()
+        self.excp_pool_by_cause = False
+        self._excp_pool = {}
+        self.excp_stats = ExcpStats()
+        
+        # Count of instructions reported by the BFM specialization. This
+        # is every executed instruction unless the specialization applies
+        # the PC filter (see enable_pc_filter()), in which case it omits
+        # instructions outside the filter
+        self.n_exec = 0
 
         # Map of addresses to methods we'll call        
         self.addr2method_m = {}
         
-    def add_memread_cb(self, f):
-        self.memread_cb.append(f)
+    def add_memread_cb(self, f, addr_range=None):
+        """Adds a callback function to be called on mem reads. When
+        addr_range is specified, the callback is only invoked for reads
+        that overlap the range(s)"""
+        if addr_range is None:
+            self.memread_cb += (f,)
+        else:
+            self.memread_idx.add_ranges(self._addr_ranges(addr_range), f)
         
     def del_memread_cb(self, f):
-        self.memread_cb.remove(f)
+        if self.memread_idx.has(f):
+            self.memread_idx.remove(f)
+        else:
+            self.memread_cb = self._cb_remove(self.memread_cb, f)
         
-    def add_memwrite_cb(self, f):
-        """Adds a callback function to be called on each mem write"""
-        self.memwrite_cb.append(f)
+    def add_memwrite_cb(self, f, addr_range=None, batch=False):
+        """Adds a callback function to be called on each mem write. When
+        addr_range is specified, the callback is only invoked for writes
+        that overlap the range(s). A range is a (start,end) tuple, with
+        end exclusive, or a range object. A list or tuple of ranges may 
+        be passed.
+        
+        Batch callbacks are called once per batch with sequences of 
+        (iaddrs, waddrs, wdatas, wmasks), and once per individual write
+        with single-element sequences"""
+        if batch:
+            if addr_range is not None:
+                raise Exception("addr_range is not supported for batch callbacks")
+            self.memwrite_batch_cb += (f,)
+        elif addr_range is None:
+            self.memwrite_cb += (f,)
+        else:
+            self.memwrite_idx.add_ranges(self._addr_ranges(addr_range), f)
         
     def del_memwrite_cb(self, f):
         """Removes an existing mem-write callback"""
-        self.memwrite_cb.remove(f)
+        if self.memwrite_idx.has(f):
+            self.memwrite_idx.remove(f)
+        elif f in self.memwrite_batch_cb:
+            self.memwrite_batch_cb = self._cb_remove(self.memwrite_batch_cb, f)
+        else:
+            self.memwrite_cb = self._cb_remove(self.memwrite_cb, f)
+        
+    @staticmethod
+    def _addr_ranges(addr_range) -> List[Tuple[int,int]]:
+        """Normalizes a range, or a list or tuple of ranges, to a list of
+        (start,end) tuples. All ranges are validated before any is used,
+        so an invalid argument registers nothing"""
+        if isinstance(addr_range, range) or (
+                isinstance(addr_range, tuple) and len(addr_range) == 2
+                and all(isinstance(v, int) for v in addr_range)):
+            addr_range = [addr_range]
+            
+        ret = []
+        for r in addr_range:
+            if isinstance(r, range):
+                r = (r.start, r.stop)
+            else:
+                r = tuple(r)
+            if len(r) != 2:
+                raise Exception("Address range %s is not a (start,end) pair" % str(r))
+            if r[1] <= r[0]:
+                raise Exception("Empty address range 0x%08x..0x%08x" % r)
+            ret.append(r)
+        return ret
         
-    def add_on_exec_cb(self, f):
-        """Adds a callback invoked on each instruction executed"""
-        self.on_exec_cb.append(f)
+    def add_on_exec_cb(self, f, sym=None):
+        """Adds a callback invoked on each instruction executed. When sym
+        is specified, the callback is only invoked when those symbols or
+        addresses are executed"""
+        if sym is None:
+            self.on_exec_cb += (f,)
+        else:
+            self._add_sym_cb(self.on_sym_exec_cb, f, sym)
+        self._exec_subscribers_changed()
     
     def del_on_exec_cb(self, f):
-        self.on_exec_cb.remove(f)
+        if f in self.on_exec_cb:
+            self.on_exec_cb = self._cb_remove(self.on_exec_cb, f)
+        else:
+            self._del_sym_cb(self.on_sym_exec_cb, f)
+        self._exec_subscribers_changed()
+        
+    def _exec_subscribers_changed(self):
+        self._exec_addrs.clear()
+        self._exec_addrs.update(self.exec_waiters.waiters.keys())
+        self._exec_addrs.update(self.on_sym_exec_cb.keys())
+        self._exec_idle = (
+            len(self.on_exec_cb) == 0 
+            and len(self._exec_addrs) == 0)
+        self._pc_filter_changed()
         
     def add_on_entry_cb(self, f, sym=None):
-        """Adds a callback on a symbol or symbols"""
+        """Adds a callback on a symbol or symbols. When sym is specified,
+        the callback is only invoked on entry to those functions. sym
+        may be a glob pattern (eg 'test_*') or compiled regex, which is 
+        matched against symbol names when images are loaded"""
         if sym is None:
-            self.on_entry_cb.append(f)
+            self.on_entry_cb += (f,)
         else:
-            addr = -1
-            if isinstance(sym, str):
-                if sym not in self.sym2addr_m.keys():
-                    raise Exception("Symbol \"%s\" is not defined" % sym)
-                else:
-                    addr = self.sym2addr_m[sym]
-            else:
-                addr = sym
-                
-            def filter_cb(pc):
-                if pc == addr:
-                    f(pc)
-            
-            self.filter_m[f] = filter_cb
-            self.on_entry_cb.append(filter_cb)
+            self._add_sym_cb(self.on_sym_entry_cb, f, sym)
+            self._pc_filter_changed()
     
     def del_on_entry_cb(self, f):
-        if f in self.filter_m.keys():
-            self.on_entry_cb.remove(self.filter_m[f]) 
-            self.filter_m.pop(f)
+        if f in self.on_entry_cb:
+            self.on_entry_cb = self._cb_remove(self.on_entry_cb, f)
         else:
-            self.on_entry_cb.remove(f)
+            self._del_sym_cb(self.on_sym_entry_cb, f)
+            self._pc_filter_changed()
             
     def add_on_exit_cb(self, f, sym=None):
-        """Adds a callback on an symbol or symbols"""
-        self.on_exit_cb.append(f)
+        """Adds a callback on an symbol or symbols. When sym is specified,
+        the callback is only invoked on exit from those functions"""
+        if sym is None:
+            self.on_exit_cb += (f,)
+        else:
+            self._add_sym_cb(self.on_sym_exit_cb, f, sym)
+            self._pc_filter_changed()
     
     def del_on_exit_cb(self, f):
-        self.on_exit_cb.remove(f)
+        if f in self.on_exit_cb:
+            self.on_exit_cb = self._cb_remove(self.on_exit_cb, f)
+        else:
+            self._del_sym_cb(self.on_sym_exit_cb, f)
+            self._pc_filter_changed()
+            
+    @staticmethod
+    def _cb_remove(cbs, f) -> tuple:
+        """Returns a callback tuple without the first instance of f"""
+        cbs_l = list(cbs)
+        cbs_l.remove(f)
+        return tuple(cbs_l)
+            
+    def _add_sym_cb(self, sym_cb_m, f, sym):
+        addrs = self._resolve_addrs(sym)
+        # Only a pattern may match nothing. An empty collection would 
+        # register nothing, leaving nothing to delete later
+        if len(addrs) == 0 and not self._is_pattern(sym):
+            raise Exception("No symbols or addresses specified")
+        for addr in addrs:
+            sym_cb_m[addr] = sym_cb_m.get(addr, ()) + (f,)
+        if self._is_pattern(sym):
+            self._pattern_subs.append([sym_cb_m, sym, f, addrs])
+            
+    def _del_sym_cb(self, sym_cb_m, f):
+        n_subs = len(self._pattern_subs)
+        self._pattern_subs = [sub for sub in self._pattern_subs
+                              if sub[0] is not sym_cb_m or sub[2] != f]
+        # A pattern may currently match no symbols
+        found = len(self._pattern_subs) != n_subs
+        for addr in list(sym_cb_m.keys()):
+            cbs = sym_cb_m[addr]
+            if f in cbs:
+                cbs = self._cb_remove(cbs, f)
+                found = True
+                if len(cbs) == 0:
+                    sym_cb_m.pop(addr)
+                else:
+                    sym_cb_m[addr] = cbs
+        if not found:
+            raise ValueError("Callback is not registered")
+        
+    def _resolve_addrs(self, sym_or_addr, strict=True):
+        """Resolves a symbol, address, symbol pattern, or collection of 
+        these to a set of addresses. A pattern may match no symbols. 
+        When strict is False, unknown symbols are ignored"""
+        if isinstance(sym_or_addr, (list,tuple,set)):
+            ret = set()
+            for e in sym_or_addr:
+                ret.update(self._resolve_addrs(e, strict))
+            return ret
+        elif isinstance(sym_or_addr, re.Pattern):
+            search = sym_or_addr.search
+            return {addr for sym, addr in self.sym2addr_m.items() if search(sym)}
+        elif isinstance(sym_or_addr, str):
+            # It's a symbol
+            addr = self._sym_lookup(sym_or_addr)
+            if addr is not None:
+                return {addr}
+            elif self._is_pattern(sym_or_addr):
+                return self._resolve_glob(sym_or_addr)
+            elif strict:
+                raise Exception("Symbol \"" + sym_or_addr + "\" not found")
+            else:
+                return set()
+        else:
+            # It's an address
+            return {sym_or_addr}
+        
+    def _resolve_glob(self, pattern):
+        sym2addr_m = self.sym2addr_m
+        if ":" in pattern:
+            img_name, _, img_pattern = pattern.partition(":")
+            if img_name in self.image_m.keys():
+                sym2addr_m = self.image_m[img_name].sym2addr_m
+                pattern = img_pattern
+        match = re.compile(fnmatch.translate(pattern)).match
+        return {addr for sym, addr in sym2addr_m.items() if match(sym)}
+        
+    def _is_pattern(self, sym_or_addr) -> bool:
+        """Checks whether sym_or_addr contains a glob or regex pattern. 
+        A string that names an existing symbol is not a pattern"""
+        if isinstance(sym_or_addr, (list,tuple,set)):
+            return any(self._is_pattern(e) for e in sym_or_addr)
+        elif isinstance(sym_or_addr, re.Pattern):
+            return True
+        elif isinstance(sym_or_addr, str):
+            return (any(c in sym_or_addr for c in "*?[") 
+                    and self._sym_lookup(sym_or_addr) is None)
+        else:
+            return False
+        
+    def _resolve_patterns(self):
+        """Re-resolves pattern subscriptions after symbols change"""
+        changed = False
+        for sub in self._pattern_subs:
+            sym_cb_m, pattern, f, addrs = sub
+            new_addrs = self._resolve_addrs(pattern, False)
+            if new_addrs == addrs:
+                continue
+            changed = True
+            for addr in addrs - new_addrs:
+                cbs = self._cb_remove(sym_cb_m[addr], f)
+                if len(cbs) == 0:
+                    sym_cb_m.pop(addr)
+                else:
+                    sym_cb_m[addr] = cbs
+            for addr in new_addrs - addrs:
+                sym_cb_m[addr] = sym_cb_m.get(addr, ()) + (f,)
+            sub[3] = new_addrs
+            
+        for reg in (self.exec_waiters, self.entry_waiters, self.exit_waiters):
+            reg.refresh()
+            
+        if changed:
+            self._exec_subscribers_changed()
+        
+    def pc_filter(self) -> Optional[List[Tuple[int,int]]]:
+        """Returns the addresses at which the BFM must report instructions
+        that carry no event bits, as a sorted list of (start,end) ranges 
+        with end exclusive. Instructions with event bits must always be
+        reported. Returns None when every instruction must be reported.
+        
+        The set covers exec/entry/exit waiters, symbol-specific exec and
+        entry/exit callbacks, and exported-method addresses. Changes 
+        made directly to addr2method_m are not tracked"""
+        if self._pc_filter_stale:
+            self._pc_filter = self._build_pc_filter()
+            self._pc_filter_stale = False
+        return self._pc_filter
+    
+    def enable_pc_filter(self):
+        """Called by a BFM specialization that applies the PC filter. 
+        pc_filter_changed() is called with the current filter, and
+        again each time it changes"""
+        self.pc_filter_en = True
+        self.pc_filter_changed(self.pc_filter())
+    
+    def pc_filter_changed(self, ranges : Optional[List[Tuple[int,int]]]):
+        """Called when the PC filter changes, if enabled. The BFM 
+        specialization may push the ranges to its HDL or C side"""
+        pass
+    
+    def _pc_filter_changed(self):
+        self._pc_filter_stale = True
+        
+        if self.pc_filter_en:
+            prev = self._pc_filter
+            ranges = self.pc_filter()
+            if ranges != prev:
+                self.pc_filter_changed(ranges)
+                
+    def require_full_exec(self, en : bool):
+        """Called with en=True by users that need every instruction to
+        be reported, such as for exact n_exec counts, and with en=False
+        when they no longer do. Calls nest. While any user requires it,
+        pc_filter() returns None"""
+        if en:
+            self._n_full_exec += 1
+        else:
+            if self._n_full_exec == 0:
+                raise Exception("require_full_exec(False) without a matching require_full_exec(True)")
+            self._n_full_exec -= 1
+        self._pc_filter_changed()
+    
+    def _build_pc_filter(self):
+        if len(self.on_exec_cb) > 0 or self._n_full_exec > 0:
+            return None
+        
+        addrs = set(self._exec_addrs)
+        addrs.update(self.entry_waiters.waiters.keys())
+        addrs.update(self.exit_waiters.waiters.keys())
+        addrs.update(self.on_sym_entry_cb.keys())
+        addrs.update(self.on_sym_exit_cb.keys())
+        addrs.update(self.addr2method_m.keys())
+        
+        # Merge adjacent addresses into ranges
+        ranges = []
+        for addr in sorted(addrs):
+            if len(ranges) > 0 and ranges[-1][1] == addr:
+                ranges[-1] = (ranges[-1][0], addr+1)
+            else:
+                ranges.append((addr, addr+1))
+                
+        return ranges
         
     def add_on_excp_cb(self, f):
-        self.on_excp_cb.append(f)
+        self.on_excp_cb += (f,)
         
     def del_on_excp_cb(self, f):
-        self.on_excp_cb.remove(f)
+        self.on_excp_cb = self._cb_remove(self.on_excp_cb, f)
         
     def add_on_eret_cb(self, f):
-        self.on_eret_cb.append(f)
+        self.on_eret_cb += (f,)
         
     def del_on_eret_cb(self, f):
-        self.on_eret_cb.remove(f)
+        self.on_eret_cb = self._cb_remove(self.on_eret_cb, f)
+        
+    def add_on_thread_switch_cb(self, f):
+        """Adds a callback, called with the new ThreadInfo, when the
+        scheduled thread changes"""
+        self.on_thread_switch_cb += (f,)
+        
+    def del_on_thread_switch_cb(self, f):
+        self.on_thread_switch_cb = self._cb_remove(self.on_thread_switch_cb, f)
     
-    def load_elf(self, elf_path):
-        """Specifies the software image running on the core being monitored"""
+    def load_elf(self, elf_path, use_segments=False, use_mmap=False, cache=None,
+                 offset=0, name=None, load_data=True) -> ElfImage:
+        """Loads a software image running on the core being monitored, 
+        and returns a handle to it.
         
-        with open(elf_path, "rb") as fp:
-            elffile = ELFFile(fp)
-
-            # Load symbols           
-            symtab = elffile.get_section_by_name('.symtab')
-            shstrtab = elffile.get_section_by_name('.shstrtab')
-#            strtab = elffile.get_section_by_name('.strtab')
-            for i in range(symtab.num_symbols()):
-                sym = symtab.get_symbol(i)
-                if sym.name != "":
-                    self.addr2sym_m[sym["st_value"]] = sym.name
-                    self.sym2addr_m[sym.name] = sym["st_value"]
-                    
-            # Load data to the mirror memory
-            section = None
-            for i in range(elffile.num_sections()):
-                shdr = elffile._get_section_header(i)
-                name = shstrtab.get_string(shdr['sh_name'])
-                # Load all allocated sections. This will cover .bss as well
-                if shdr['sh_size'] != 0 and (shdr['sh_flags'] & 0x2):
-                    section = elffile.get_section(i)
-                    data = section.data()
-                    addr = shdr['sh_addr']
-                    
-                    self.mm.write(addr, data)
-                    
-    async def on_exec(self, sym_or_addr):
-        """Waits for one or more addresses to be executed"""
-        target_addr_s = set()
-        if isinstance(sym_or_addr, str):
-            # It's a symbol
-            if sym_or_addr in self.sym2addr_m.keys():
-                target_addr_s.add(self.sym2addr_m[sym_or_addr])
-            else:
-                raise Exception("Symbol \"" + sym_or_addr + "\" not found")
-        elif isinstance(sym_or_addr, (list,tuple,set)):
-            for e in sym_or_addr:
-                if isinstance(e, str):
-                    # It's a symbol
-                    if e in self.sym2addr_m.keys():
-                        target_addr_s.add(self.sym2addr_m[e])
-                    else:
-                        raise Exception("Symbol \"" + e + "\" not found")
-                else:
-                    raise Exception("address not supported")
+        By default, allocated sections are loaded into the mirror memory.
+        With use_segments, PT_LOAD segments are loaded instead: file bytes
+        are bulk-copied and the remainder of each segment is zero-filled
+        without materializing .bss. use_mmap additionally maps the ELF
+        file, so segment data is copied directly from the page cache.
+        
+        cache is an optional ElfCache. A valid entry lets symbols and the 
+        segment layout be loaded without parsing the ELF. Cached loads 
+        always use segments.
+        
+        offset relocates the image's symbols and data. name identifies
+        the image for unload_image() and 'name:sym' symbol references,
+        and defaults to the file name. With load_data=False, only 
+        symbols are loaded (eg when the software itself loads the image)"""
+        
+        if name is None:
+            name = os.path.basename(elf_path)
+            base = name
+            n = 1
+            while name in self.image_m.keys():
+                n += 1
+                name = "%s#%d" % (base, n)
+        elif name in self.image_m.keys():
+            raise Exception("Image \"%s\" is already loaded" % name)
+        
+        img = ElfImage(name, elf_path, offset)
+        
+        if cache is not None:
+            info = cache.load(elf_path)
+            if info is None:
+                with open(elf_path, "rb") as fp:
+                    info = ElfInfo.from_elffile(ELFFile(fp))
+                cache.store(elf_path, info)
+            img.add_symbols(info)
+            if load_data:
+                with open(elf_path, "rb") as fp:
+                    self._load_segments(fp, info.segs, use_mmap, offset)
         else:
-            # It's an address
-            target_addr_s.add(sym_or_addr)
-            
-        ev = pybfms.event()
-
-        def waiter(pc, instr):
-            if pc in target_addr_s:
-                ev.set(pc)
-
-        self.add_on_exec_cb(waiter)
-        await ev.wait()
-        self.del_on_exec_cb(waiter)
+            with open(elf_path, "rb") as fp:
+                elffile = ELFFile(fp)
+                info = ElfInfo.from_elffile(elffile)
     
-        # Return the address actually hit    
-        return ev.data
-                    
-    async def on_entry(self, sym_or_addr):
-        """Waits for a function, identified by name or address, to be entered"""
-        target_addr_s = set()
-        if isinstance(sym_or_addr, str):
-            # It's a symbol
-            if sym_or_addr in self.sym2addr_m.keys():
-                target_addr_s.add(self.sym2addr_m[sym_or_addr])
-            else:
-                raise Exception("Symbol \"" + sym_or_addr + "\" not found")
-        elif isinstance(sym_or_addr, (list,tuple,set)):
-            for e in sym_or_addr:
-                if isinstance(e, str):
-                    # It's a symbol
-                    if e in self.sym2addr_m.keys():
-                        target_addr_s.add(self.sym2addr_m[e])
-                    else:
-                        raise Exception("Symbol \"" + e + "\" not found")
+                # Load symbols
+                img.add_symbols(info)
+                        
+                # Load data to the mirror memory
+                if not load_data:
+                    pass
+                elif use_segments:
+                    self._load_segments(fp, info.segs, use_mmap, offset)
                 else:
-                    raise Exception("address not supported")
-        else:
-            # It's an address
-            target_addr_s.add(sym_or_addr)
-            
-        ev = pybfms.event()
-
-        def waiter(pc):
-            if pc in target_addr_s:
-                ev.set(pc)
-
-        self.add_on_entry_cb(waiter)
-
-        await ev.wait()
+                    shstrtab = elffile.get_section_by_name('.shstrtab')
+                    section = None
+                    for i in range(elffile.num_sections()):
+                        shdr = elffile._get_section_header(i)
+                        sec_name = shstrtab.get_string(shdr['sh_name'])
+                        # Load all allocated sections. This will cover .bss as well
+                        if shdr['sh_size'] != 0 and (shdr['sh_flags'] & 0x2):
+                            section = elffile.get_section(i)
+                            data = section.data()
+                            addr = shdr['sh_addr'] + offset
+                            
+                            self.mm.write(addr, data)
+                            
+        self.images.append(img)
+        self.image_m[img.name] = img
+        self.addr2sym_m.update(img.addr2sym_m)
+        self.sym2addr_m.update(img.sym2addr_m)
+        self._images_changed()
         
-        self.del_on_entry_cb(waiter)
-    
-        # Return the address actually hit    
-        return ev.data        
+        return img
     
-    async def on_exit(self, sym_or_addr):
-        target_addr_s = set()
-        if isinstance(sym_or_addr, str):
-            # It's a symbol
-            if sym_or_addr in self.sym2addr_m.keys():
-                target_addr_s.add(self.sym2addr_m[sym_or_addr])
-            else:
-                raise Exception("Symbol \"" + sym_or_addr + "\" not found")
-        elif isinstance(sym_or_addr, (list,tuple,set)):
-            for e in sym_or_addr:
-                if isinstance(e, str):
-                    # It's a symbol
-                    if e in self.sym2addr_m.keys():
-                        target_addr_s.add(self.sym2addr_m[e])
-                    else:
-                        raise Exception("Symbol \"" + e + "\" not found")
-                else:
-                    raise Exception("address not supported")
+    def unload_image(self, img):
+        """Removes an image, specified by handle or name, from symbol 
+        lookup. The mirror memory is not modified. Symbols of earlier
+        images that the image shadowed become visible again"""
+        if isinstance(img, str):
+            if img not in self.image_m.keys():
+                raise Exception("Image \"%s\" is not loaded" % img)
+            img = self.image_m[img]
+        elif self.image_m.get(img.name) is not img:
+            raise Exception("Image \"%s\" is not loaded" % img.name)
+        
+        self.images.remove(img)
+        del self.image_m[img.name]
+        
+        # Remove the image's entries from the merged maps, then restore
+        # any that remaining images define. Entries added directly to
+        # the maps are left alone
+        addrs = []
+        for addr, sym in img.addr2sym_m.items():
+            if self.addr2sym_m.get(addr) == sym:
+                del self.addr2sym_m[addr]
+                addrs.append(addr)
+        syms = []
+        for sym, addr in img.sym2addr_m.items():
+            if self.sym2addr_m.get(sym) == addr:
+                del self.sym2addr_m[sym]
+                syms.append(sym)
+        for other in self.images:
+            for addr in addrs:
+                if addr in other.addr2sym_m.keys():
+                    self.addr2sym_m[addr] = other.addr2sym_m[addr]
+            for sym in syms:
+                if sym in other.sym2addr_m.keys():
+                    self.sym2addr_m[sym] = other.sym2addr_m[sym]
+        
+        img.line_idx.close()
+        self._images_changed()
+        
+    def image_at(self, addr) -> Optional[ElfImage]:
+        """Returns the image whose address range contains addr. Where
+        images overlap, the most recently loaded one is returned"""
+        if self._img_overlap:
+            for img in reversed(self.images):
+                if img.contains(addr):
+                    return img
         else:
-            # It's an address
-            target_addr_s.add(sym_or_addr)
+            i = bisect_right(self._img_starts, addr) - 1
+            if i >= 0 and self._img_sorted[i].contains(addr):
+                return self._img_sorted[i]
+        return None
+    
+    def _images_changed(self):
+        self._fmt_symid_m.clear()
+        self._img_sorted = sorted(self.images, key=lambda img: img.start)
+        self._img_starts = [img.start for img in self._img_sorted]
+        self._img_overlap = False
+        for i in range(1, len(self._img_sorted)):
+            if self._img_sorted[i].start < self._img_sorted[i-1].end:
+                self._img_overlap = True
+                break
             
-        ev = pybfms.event()
-
-        def waiter(pc):
-            if pc in target_addr_s:
-                ev.set(pc)
-
-        self.add_on_exit_cb(waiter)
-
-        await ev.wait()
+        self._resolve_patterns()
+                        
+    def _load_segments(self, fp, segs, use_mmap, reloc=0):
+        """Loads (vaddr, offset, filesz, memsz) segments from an ELF file,
+        relocated by reloc"""
+        
+        if use_mmap:
+            elf_m = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            elf_v = memoryview(elf_m)
         
-        self.del_on_exit_cb(waiter)
+        try:
+            for vaddr, offset, filesz, memsz in segs:
+                vaddr += reloc
+                if filesz != 0:
+                    if use_mmap:
+                        self.mm.write(vaddr, elf_v[offset:offset+filesz])
+                    else:
+                        fp.seek(offset)
+                        self.mm.write(vaddr, fp.read(filesz))
+                if memsz > filesz:
+                    self.mm.memset(vaddr+filesz, 0, memsz-filesz)
+        finally:
+            if use_mmap:
+                elf_v.release()
+                elf_m.close()
+                    
+    async def on_exec(self, sym_or_addr, timeout=None, units=None):
+        """Waits for one or more addresses to be executed. Returns the
+        address actually hit, or None if the timeout elapses first"""
+        return await self._wait(self.exec_waiters, sym_or_addr, timeout, units)
+                    
+    async def on_entry(self, sym_or_addr, timeout=None, units=None):
+        """Waits for a function, identified by name, address or symbol 
+        pattern, to be entered. Returns the address actually hit, or None 
+        if the timeout elapses first"""
+        return await self._wait(self.entry_waiters, sym_or_addr, timeout, units)
+    
+    async def on_exit(self, sym_or_addr, timeout=None, units=None):
+        """Waits for a function, identified by name, address or symbol 
+        pattern, to exit. Returns the address actually hit, or None if 
+        the timeout elapses first"""
+        return await self._wait(self.exit_waiters, sym_or_addr, timeout, units)
     
-        # Return the address actually hit    
-        return ev.data
+    def _wait(self, reg, sym_or_addr, timeout, units):
+        resolve = None
+        if self._is_pattern(sym_or_addr):
+            resolve = lambda: self._resolve_addrs(sym_or_addr, False)
+        return reg.wait(self._resolve_addrs(sym_or_addr), timeout, units, resolve)
+    
+    def events(self, 
+               kinds=EventKind.Entry|EventKind.Exit, 
+               addrs=None, 
+               maxlen=1024, 
+               policy=Backpressure.DropOldest) -> EventStream:
+        """Returns a stream of exec/entry/exit events for use with 
+        'async for'. addrs optionally restricts the stream to symbols
+        or addresses. Close the stream, or use it as a context manager,
+        to unsubscribe"""
+        return EventStream(self, kinds, addrs, maxlen, policy)
+    
+    def backpressure(self, en : bool):
+        """Called when event consumers require the simulation to stall 
+        (en=True) and when it may resume. BFM specializations that can 
+        hold the core should do so"""
+        pass
+    
+    def _stream_backpressure(self, en):
+        if en:
+            self._n_backpressure += 1
+            if self._n_backpressure == 1:
+                self.backpressure(True)
+        else:
+            self._n_backpressure -= 1
+            if self._n_backpressure == 0:
+                self.backpressure(False)
     
     def create_thread(self, tid):
-        """Creates a class derived from ThreadInfo"""
-        # Note: should delegate to the OS-awareness class
+        """Creates a class derived from ThreadInfo. Delegates to the
+        OS-awareness plugin, if one is installed"""
+        if self.os_awareness is not None:
+            return self.os_awareness.create_thread(tid)
         return ThreadInfo(tid)
+    
+    def _init_callstack(self, t):
+        """Binds a new thread's callstack to the BFM's symbol table, and
+        pushes its initial frame"""
+        t.callstack.symtab = self.symtab
+        t.callstack.push(0, self.symtab.intern("<initial>"), False)
+    
+    def set_os_awareness(self, os_awareness : OsAwareness):
+        """Installs an OS-awareness plugin, replacing any existing one.
+        Pass None to remove the current plugin"""
+        if self.os_awareness is not None:
+            self.os_awareness.detach()
+        self.os_awareness = os_awareness
+        if os_awareness is not None:
+            os_awareness.attach(self)
+            
+    def get_thread(self, tid) -> ThreadInfo:
+        """Returns the thread with ID tid, creating it if required"""
+        t = self.threads.get(tid)
+        if t is None:
+            t = self.create_thread(tid)
+            self._init_callstack(t)
+            self.threads[tid] = t
+        return t
+    
+    def scheduled_thread(self) -> ThreadInfo:
+        """Returns the thread that runs outside exception context. This
+        is the active thread unless an exception is being handled"""
+        if len(self.exc_thread_s) > 0:
+            return self.exc_thread_s[0]
+        return self.active_thread
+            
+    def switch_thread(self, tid):
+        """Makes tid the scheduled thread. Each thread keeps its own
+        callstack. When called in exception context (eg from a 
+        context-switch interrupt), the switch takes effect on return
+        from the outermost exception"""
+        t = self.get_thread(tid)
+        if len(self.exc_thread_s) > 0:
+            self.exc_thread_s[0] = t
+        else:
+            self.active_thread = t
+        self.thread_switch(t)
+        
+        for cb in self.on_thread_switch_cb:
+            cb(t)
 
     def disasm(self, addr, instr):
         raise NotImplementedError("disasm not implemented by class " + str(self))
@@ -299,40 +794,77 @@ class BfmBase(hvlrpc.Endpoint):
                 instr   : int,
                 ev      : ExecEvent):
         """Called by the BFM specialization to notify of an exec event"""
+        self.n_exec += 1
        
 #        if ev != 0:
 #            print("Execute %s: 0x%08x retaddr=0x%08x ev=%s" % (
 #                self.bfm_info.inst_name, addr, retaddr, str(ev)))
         
-        if len(self.on_exec_cb) > 0:
-            for cb in self.on_exec_cb.copy():
+        if not self._exec_idle:
+            for cb in self.on_exec_cb:
                 cb(addr, instr)
                 
-        
+            if addr in self._exec_addrs:
+                sym_cb = self.on_sym_exec_cb.get(addr)
+                if sym_cb is not None:
+                    for cb in sym_cb:
+                        cb(addr, instr)
+                if addr in self.exec_waiters.waiters:
+                    self.exec_waiters.notify(addr)
 
-        if ev & ExecEvent.Excp:
-            self._do_excp(addr, ev)
-        elif ev & ExecEvent.Eret:
-            self._do_eret(addr, ev)
-        elif ev & ExecEvent.Call:
-            self._do_enter(addr, retaddr)
-        elif ev & ExecEvent.Ret:
-            self._do_exit(addr)
-        else:
-            # TODO: isn't this really independent of call/ret?
-            
-            # Determine if we hit a symbol
-            if addr in self.addr2sym_m.keys():
-                # This is a known symbol
-                pass
-            pass
+        if ev:
+            ev_i = int(ev)
+            if ev_i & _EV_EXCP:
+                self._do_excp(addr, retaddr, ev_i)
+            elif ev_i & _EV_ERET:
+                self._do_eret(addr, retaddr, ev_i)
+            elif ev_i & _EV_CALL:
+                self._do_enter(addr, retaddr)
+            elif ev_i & _EV_RET:
+                self._do_exit(addr)
         
-    def memread(self, iaddr, raddr, rdata, rmask):
-        if len(self.memread_cb) > 0:
-            for cb in self.memread_cb.copy():
-                cb(iaddr, raddr, rdata, rmask)
+    def execute_batch(self, addrs, retaddrs, instrs, evs):
+        """Called by the BFM specialization to notify of a batch of exec
+        events. Arguments are equal-length sequences, in the same form 
+        as execute(). Events are processed in order, exactly as if 
+        execute() were called for each element"""
+        n = len(addrs)
+        i = 0
+        execute = self.execute
+        # Skipped instructions are counted in bulk, so n_exec is set 
+        # before each event to keep it exact as seen by callbacks
+        n_exec = self.n_exec
         
+        while i < n:
+            if len(self.on_exec_cb) > 0:
+                execute(addrs[i], retaddrs[i], instrs[i], evs[i])
+                i += 1
+            else:
+                # With no exec callbacks, plain instructions require no
+                # processing unless they are at a watched address. Skip 
+                # directly to instructions with event bits set or at 
+                # watched addresses. A callback may register an exec 
+                # callback, so check after each event
+                sel = map(or_, 
+                          islice(evs, i, n), 
+                          map(self._exec_addrs.__contains__, islice(addrs, i, n)))
+                for j in compress(range(i, n), sel):
+                    self.n_exec = n_exec + j
+                    execute(addrs[j], retaddrs[j], instrs[j], evs[j])
+                    if len(self.on_exec_cb) > 0:
+                        i = j+1
+                        break
+                else:
+                    break
+                
+        self.n_exec = n_exec + n
         
+    def memread(self, iaddr, raddr, rdata, rmask):
+        for cb in self.memread_cb:
+            cb(iaddr, raddr, rdata, rmask)
+                
+        for cb in self.memread_idx.find(raddr, self._word_bytes):
+            cb(iaddr, raddr, rdata, rmask)
 
     def memwrite(self, iaddr, waddr, wdata, wmask):
         """Called by the BFM specialiation to notify of a memory write"""
@@ -341,30 +873,76 @@ class BfmBase(hvlrpc.Endpoint):
         self.mm.write_word(waddr, wdata, wmask)
         
         # Activate any callbacks
-        if len(self.memwrite_cb) > 0:
-            for cb in self.memwrite_cb.copy():
-                cb(iaddr, waddr, wdata, wmask)
+        for cb in self.memwrite_cb:
+            cb(iaddr, waddr, wdata, wmask)
+                
+        for cb in self.memwrite_idx.find(waddr, self._word_bytes):
+            cb(iaddr, waddr, wdata, wmask)
+            
+        for cb in self.memwrite_batch_cb:
+            cb((iaddr,), (waddr,), (wdata,), (wmask,))
+                
+    def memwrite_batch(self, iaddrs, waddrs, wdatas, wmasks=None):
+        """Called by the BFM specialization to notify of a batch of memory
+        writes. Arguments are equal-length sequences, in the same form 
+        as memwrite(). wmasks may be None when all writes are full-width.
+        
+        The mirror memory is updated with the entire batch before 
+        callbacks are invoked"""
+        
+        self.mm.write_words(waddrs, wdatas, wmasks)
+        
+        if wmasks is None:
+            wmasks = (self._word_mask,)*len(waddrs)
+        
+        # Per-write callbacks
+        if len(self.memwrite_cb) > 0 or len(self.memwrite_idx.ranges) > 0:
+            find = self.memwrite_idx.find
+            nbytes = self._word_bytes
+            for iaddr, waddr, wdata, wmask in zip(iaddrs, waddrs, wdatas, wmasks):
+                for cb in self.memwrite_cb:
+                    cb(iaddr, waddr, wdata, wmask)
+                for cb in find(waddr, nbytes):
+                    cb(iaddr, waddr, wdata, wmask)
+                    
+        for cb in self.memwrite_batch_cb:
+            cb(iaddrs, waddrs, wdatas, wmasks)
     
     def _do_enter(self, addr, retaddr):
             
-        # TODO: update callstack
-        if addr in self.addr2sym_m.keys():
-            sym = self.addr2sym_m[addr]
+        sym = self.addr2sym_m.get(addr)
+        if sym is not None:
+            symid = self.symtab.ids.get(sym)
+            if symid is None:
+                symid = self.symtab.intern(sym)
         else:
-            sym = "<unknown " + hex(addr) + ">"
+            # Names such as func+0x10 are formatted once per address
+            symid = self._fmt_symid_m.get(addr)
+            if symid is None:
+                symid = self.symtab.intern(self._fmt_addr(addr))
+                self._fmt_symid_m[addr] = symid
             
-        # Record the expected return address            
-        self.active_thread.callstack[-1].retaddr = retaddr
+        # Record the expected return address
+        callstack = self.active_thread.callstack
+        callstack.retaddrs[-1] = retaddr
 
-        self.active_thread.callstack.append(StackFrame(addr, sym, True))
+        callstack.push(addr, symid)
 
         # Allow the specialization BFM to react
         self.enter()
         
         # Invoke all on-enter callbacks
-        if len(self.on_entry_cb):
-            for cb in self.on_entry_cb.copy():
+        for cb in self.on_entry_cb:
+            cb(addr)
+                
+        # Invoke callbacks specific to this function
+        sym_cb = self.on_sym_entry_cb.get(addr)
+        if sym_cb is not None:
+            for cb in sym_cb:
                 cb(addr)
+                
+        if addr in self.entry_waiters.waiters:
+            self.entry_waiters.notify(addr)
             
         # Invoke any RPC methods associated with this address
         if addr in self.addr2method_m.keys():
@@ -373,60 +951,119 @@ class BfmBase(hvlrpc.Endpoint):
         pass
     
     def _do_exit(self, addr):
-        # TODO: update callstack
-        if len(self.active_thread.callstack) == 0:
-            raise Exception("Attempting to return with empty callstack")
-        
+        callstack = self.active_thread.callstack
+        top = len(callstack)-1
         
+        if top >= 1 and callstack.retaddrs[top-1] == addr:
+            # Return to the caller, as expected
+            depth = top-1
+        else:
+            # Resynchronize to the deepest frame expecting this return 
+            # address, exiting every frame above it. This covers 
+            # longjmp, tail calls and missed exit events. A return that 
+            # no frame expects (eg after a missed call event) is ignored
+            if self.strict_unwind:
+                raise Exception("%s: Expected return address of 0x%08x ; received 0x%08x" % 
+                            (self.bfm_info.inst_name, 
+                             callstack.retaddrs[top-1] if top >= 1 else -1, addr))
+            depth = callstack.find_retaddr(addr)
+            if depth == -1:
+                self.n_ret_unmatched += 1
+                return
+            self.n_ret_resync += 1
+            self.n_ret_skipped += max(top-depth-1, 0)
         
-        if len(self.active_thread.callstack) == 0:
-            raise Exception("Return results in empty callstack")
-        
-        frame = self.active_thread.callstack.pop()
+        while len(callstack) > depth+1:
+            self._exit_frame(callstack)
+            
+        # The frame no longer expects a return. Clearing this prevents
+        # a stale match when resynchronizing later
+        callstack.retaddrs[depth] = -1
+            
+    def _exit_frame(self, callstack):
+        """Pops the top frame of callstack and notifies its exit"""
         
-        if addr != self.active_thread.callstack[-1].retaddr:
-            raise Exception("%s: Expected return address of 0x%08x ; received 0x%08x" % 
-                            (self.bfm_info.inst_name, self.active_thread.callstack[-1].retaddr, addr))
-
-        # Allow the specialization BFM to react        
-        self.exit(frame)
+        # Only materialize the frame if a specialization observes it
+        if self._exit_hooked:
+            frame = callstack.pop()
+            faddr = frame.addr
+            
+            # Allow the specialization BFM to react
+            self.exit(frame)
+        else:
+            faddr = callstack.pop_addr()
         
         # Invoke all on-exit callbacks
-        if len(self.on_exit_cb):
-            for cb in self.on_exit_cb.copy():
-                # Pass the entry address of the function
-                cb(frame.addr)
+        for cb in self.on_exit_cb:
+            # Pass the entry address of the function
+            cb(faddr)
+                
+        # Invoke callbacks specific to this function
+        sym_cb = self.on_sym_exit_cb.get(faddr)
+        if sym_cb is not None:
+            for cb in sym_cb:
+                cb(faddr)
                 
-    def _do_excp(self, addr, ev):
+        if faddr in self.exit_waiters.waiters:
+            self.exit_waiters.notify(faddr)
+                
+    def _do_excp(self, addr, retaddr, ev):
+        cause = self.get_excp_cause()
         
-        # Save the previously-active thread
-        self.active_thread.pending_ev = ev
+        # Save the previously-active thread. A call or return that 
+        # coincides with the exception belongs to the interrupted thread
+        self.active_thread.pending_ev = ev & (_EV_CALL|_EV_RET)
+        self.active_thread.pending_retaddr = retaddr
         self.exc_thread_s.append(self.active_thread)
         
-        # Create an exception thread-info
-        self.active_thread = ThreadInfo("<exception>")
-        self.active_thread.callstack.append(StackFrame(0, "<initial>", False))
+        # Obtain the exception context for this nesting level
+        key = (len(self.exc_thread_s), cause if self.excp_pool_by_cause else None)
+        t = self._excp_pool.get(key)
+        if t is None:
+            t = ThreadInfo("<exception>")
+            self._init_callstack(t)
+            self._excp_pool[key] = t
+        else:
+            # Discard any frames left by the previous use
+            t.callstack.truncate(1)
+            t.callstack.retaddrs[0] = -1
+        self.active_thread = t
+        
+        self.excp_stats.enter(self.n_exec, cause)
         
         self.excp()
         
-        if len(self.on_excp_cb) > 0:
-            for cb in self.on_excp_cb.copy():
-                cb(addr)
+        for cb in self.on_excp_cb:
+            cb(addr)
     
-    def _do_eret(self, addr, ev):
+    def _do_eret(self, addr, retaddr, ev):
+        if len(self.exc_thread_s) == 0:
+            raise Exception("Return from exception outside exception context")
+        
+        self.excp_stats.exit(self.n_exec)
         
         # Restore the previously-active thread
         self.active_thread = self.exc_thread_s.pop()
         
-        if self.active_thread.pending_ev != 0:
-            print("TODO: pending ev: " + str(self.active_thread.pending_ev))
-            self.active_thread.pending_ev = 0
-        
         self.eret()
     
-        if len(self.on_eret_cb) > 0:
-            for cb in self.on_eret_cb.copy():
-                cb(addr)
+        for cb in self.on_eret_cb:
+            cb(addr)
+            
+        # Replay a call or return that was interrupted by the exception,
+        # or that coincides with the return from exception
+        t = self.active_thread
+        pending = t.pending_ev
+        if pending:
+            retaddr = t.pending_retaddr
+            t.pending_ev = 0
+            t.pending_retaddr = -1
+        else:
+            pending = ev
+        if pending & _EV_CALL:
+            self._do_enter(addr, retaddr)
+        elif pending & _EV_RET:
+            self._do_exit(addr)
                 
     def enter(self):
         """Called when a function is entered. The function will be
@@ -443,6 +1080,16 @@ class BfmBase(hvlrpc.Endpoint):
         """Called when an exception is signaled"""
         pass
     
+    def get_excp_cause(self):
+        """Returns the cause of the exception being signaled (eg the 
+        mcause value), or None if unknown. Used to break down exception
+        statistics and, optionally, to pool exception contexts"""
+        return None
+    
+    def thread_switch(self, t : ThreadInfo):
+        """Called when the scheduled thread changes"""
+        pass
+    
     def eret(self):
         """Called when a return-from-exception is signaled"""
         pass
@@ -452,10 +1099,21 @@ class BfmBase(hvlrpc.Endpoint):
         raise NotImplementedError("param_iter not implemented for class " + str(self))
     
     def sym2addr(self, sym) -> int:
-        if sym in self.sym2addr_m.keys():
-            return self.sym2addr_m[sym]
-        else:
+        """Returns the address of a symbol. 'image:sym' names a symbol
+        in a specific image"""
+        ret = self._sym_lookup(sym)
+        if ret is None:
             raise Exception("Symbol " + sym + " not found")
+        return ret
+    
+    def _sym_lookup(self, sym) -> Optional[int]:
+        ret = self.sym2addr_m.get(sym)
+        if ret is None and ":" in sym:
+            img_name, _, img_sym = sym.partition(":")
+            img = self.image_m.get(img_name)
+            if img is not None:
+                ret = img.sym2addr_m.get(img_sym)
+        return ret
 
     def addr2sym(self, addr) -> str:
         if addr in self.addr2sym_m.keys():
@@ -463,6 +1121,31 @@ class BfmBase(hvlrpc.Endpoint):
         else:
             return None
         
+    def addr2func(self, pc) -> Optional[Tuple[str,int]]:
+        """Returns (symbol, offset) of the function containing pc, or
+        None if pc is not within a known function"""
+        img = self.image_at(pc)
+        return img.addr2func(pc) if img is not None else None
+    
+    def addr2line(self, pc) -> Optional[Tuple[str,int]]:
+        """Returns (file, line) for pc, or None if no loaded image has 
+        line information for it. The line index of an image is built 
+        the first time this is called"""
+        img = self.image_at(pc)
+        return img.addr2line(pc) if img is not None else None
+    
+    def _fmt_addr(self, addr) -> str:
+        """Formats an address as func+0xoff, or <unknown 0x..>"""
+        img = self.image_at(addr)
+        i = img.func_idx.lookup(addr) if img is not None else -1
+        if i == -1:
+            return "<unknown " + hex(addr) + ">"
+        func_idx = img.func_idx
+        off = addr - func_idx.starts[i]
+        if off == 0:
+            return func_idx.names[i]
+        return func_idx.names[i] + "+" + hex(off)
+        
     def get_method_params(self, m : MethodDef) -> List:
         """Called by the BFM to return a list of parameter values"""
         raise NotImplementedError("Class " + str(type(self)) + " does not implement get_method_params")
@@ -478,6 +1161,8 @@ class BfmBase(hvlrpc.Endpoint):
             addr = self.sym2addr(m.name)
             self.addr2method_m[addr] = m
             
+        self._pc_filter_changed()
+            
     def _do_method_call(self, m : MethodDef):
         """Implements the mechanics of invoking an hvl-rpc method"""
         p_iter = self.param_iter()
@@ -0,0 +1,128 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from core_debug_common.stack_frame import StackFrame, SymTable
+
+
+class CallStack(object):
+    """Call stack held as parallel addr/retaddr/symbol-ID/is-func lists.
+
+    Pushing a frame stores four integers, and no per-frame object is
+    kept. Indexing returns a FrameRef view that reads and writes the
+    underlying lists, so callstack[-1].retaddr = x works as it does on
+    a list of StackFrame. pop() returns a detached StackFrame. Symbol
+    IDs index symtab, which a BFM sets to its own table.
+    """
+
+    __slots__ = ("addrs", "retaddrs", "symids", "is_func", "symtab")
+
+    class FrameRef(object):
+        """Live view of one entry in a CallStack"""
+
+        __slots__ = ("stack", "idx")
+
+        def __init__(self, stack, idx):
+            self.stack = stack
+            self.idx = idx
+
+        @property
+        def addr(self):
+            return self.stack.addrs[self.idx]
+
+        @property
+        def retaddr(self):
+            return self.stack.retaddrs[self.idx]
+
+        @retaddr.setter
+        def retaddr(self, v):
+            self.stack.retaddrs[self.idx] = v
+
+        @property
+        def symid(self):
+            return self.stack.symids[self.idx]
+
+        @property
+        def sym(self) -> str:
+            return self.stack.symtab.names[self.stack.symids[self.idx]]
+
+        @property
+        def is_func(self):
+            return self.stack.is_func[self.idx]
+
+    def __init__(self, symtab=None):
+        self.symtab = symtab if symtab is not None else SymTable()
+        self.addrs = []
+        self.retaddrs = []
+        self.symids = []
+        self.is_func = []
+
+    def push(self, addr, symid, is_func=True):
+        self.addrs.append(addr)
+        self.retaddrs.append(-1)
+        self.symids.append(symid)
+        self.is_func.append(is_func)
+
+    def append(self, frame : StackFrame):
+        self.addrs.append(frame.addr)
+        self.retaddrs.append(frame.retaddr)
+        if frame.symtab is self.symtab:
+            self.symids.append(frame.symid)
+        else:
+            self.symids.append(self.symtab.intern(frame.sym))
+        self.is_func.append(frame.is_func)
+
+    def pop(self) -> StackFrame:
+        ret = StackFrame(self.addrs.pop(), self.symids.pop(), self.is_func.pop(), self.symtab)
+        ret.retaddr = self.retaddrs.pop()
+        return ret
+    
+    def pop_addr(self) -> int:
+        """Removes the top frame, returning only its address"""
+        self.retaddrs.pop()
+        self.symids.pop()
+        self.is_func.pop()
+        return self.addrs.pop()
+
+    def truncate(self, depth):
+        """Removes all frames above depth"""
+        del self.addrs[depth:]
+        del self.retaddrs[depth:]
+        del self.symids[depth:]
+        del self.is_func[depth:]
+        
+    def find_retaddr(self, retaddr) -> int:
+        """Returns the depth of the deepest frame expecting retaddr, or -1.
+        The search runs down from the top, so its cost is proportional
+        to the number of frames above the match"""
+        retaddrs = self.retaddrs
+        # Membership is checked at C speed, so a return that no frame
+        # expects doesn't walk the whole stack in Python
+        if retaddr not in retaddrs:
+            return -1
+        i = len(retaddrs)-1
+        while retaddrs[i] != retaddr:
+            i -= 1
+        return i
+
+    def __len__(self):
+        return len(self.addrs)
+
+    def __getitem__(self, idx) -> 'CallStack.FrameRef':
+        n = len(self.addrs)
+        if idx < 0:
+            idx += n
+        if idx < 0 or idx >= n:
+            raise IndexError("callstack index out of range")
+        return CallStack.FrameRef(self, idx)
+
+    def __iter__(self):
+        for i in range(len(self.addrs)):
+            yield CallStack.FrameRef(self, i)
+
+    def syms(self):
+        """Returns the symbol names of all frames, outermost first"""
+        names = self.symtab.names
+        return [names[i] for i in self.symids]
+
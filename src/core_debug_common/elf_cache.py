@@ -0,0 +1,198 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from typing import Optional
+
+from core_debug_common.elf_info import ElfInfo
+
+
+class ElfCache(object):
+    """Persistent on-disk cache of ELF symbols and load layout.
+
+    Entries are keyed by the ELF path and validated against the file
+    size, modification time and a SHA-256 of its contents. When size and
+    mtime match, the stored hash is trusted unless verify_hash is set.
+    When only mtime differs, the content is re-hashed and an identical
+    file (eg a no-op rebuild) is still a hit.
+    """
+
+    MAGIC = b"ELFC"
+    VERSION = 1
+
+    # magic, version, size, mtime_ns, sha256, path-len, n_syms, n_segs
+    _hdr = struct.Struct("<4sHQQ32sIII")
+
+    def __init__(self, cache_dir=None, verify_hash=False):
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                "CORE_DEBUG_ELF_CACHE",
+                os.path.join(os.path.expanduser("~"), ".cache", "core_debug_common"))
+        self.cache_dir = cache_dir
+        self.verify_hash = verify_hash
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, elf_path) -> str:
+        """Returns the cache file used for an ELF file"""
+        key = hashlib.sha1(os.path.abspath(elf_path).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".elfc")
+
+    def load(self, elf_path) -> Optional[ElfInfo]:
+        """Returns cached info for elf_path, or None if absent or stale"""
+        ret = None
+
+        try:
+            with open(self.entry_path(elf_path), "rb") as fp:
+                data = fp.read()
+        except OSError:
+            data = None
+
+        if data is not None:
+            ret = self._validate(elf_path, data)
+
+        if ret is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ret
+
+    def store(self, elf_path, info : ElfInfo, digest=None):
+        """Writes info for elf_path to the cache"""
+        st = os.stat(elf_path)
+        if digest is None:
+            digest = self._hash(elf_path)
+        path_b = os.path.abspath(elf_path).encode()
+        names_b = b"\0".join(n.encode() for n in info.sym_names)
+        segs = array('Q')
+        for seg in info.segs:
+            segs.extend(seg)
+
+        parts = [
+            self._hdr.pack(self.MAGIC, self.VERSION, st.st_size, st.st_mtime_ns,
+                           digest, len(path_b), info.n_syms, len(info.segs)),
+            path_b,
+            struct.pack("<I", len(names_b)),
+            names_b,
+            self._le(info.sym_values),
+            self._le(info.sym_sizes),
+            info.sym_info.tobytes(),
+            self._le(segs)]
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write-then-rename, so concurrent simulations never see a partial entry
+        path = self.entry_path(elf_path)
+        tmp = "%s.%d" % (path, os.getpid())
+        with open(tmp, "wb") as fp:
+            fp.write(b"".join(parts))
+        os.replace(tmp, path)
+
+    def invalidate(self, elf_path=None):
+        """Removes the entry for elf_path, or all entries if None"""
+        if elf_path is not None:
+            paths = [self.entry_path(elf_path)]
+        elif os.path.isdir(self.cache_dir):
+            paths = [os.path.join(self.cache_dir, f)
+                     for f in os.listdir(self.cache_dir) if f.endswith(".elfc")]
+        else:
+            paths = []
+
+        for p in paths:
+            try:
+                os.unlink(p)
+            except FileNotFoundError:
+                pass
+
+    def _validate(self, elf_path, data) -> Optional[ElfInfo]:
+        hdr = self._hdr
+        if len(data) < hdr.size:
+            return None
+        (magic, version, size, mtime_ns, digest,
+         path_len, n_syms, n_segs) = hdr.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            return None
+
+        idx = hdr.size
+        if data[idx:idx+path_len] != os.path.abspath(elf_path).encode():
+            return None
+        idx += path_len
+
+        try:
+            st = os.stat(elf_path)
+        except OSError:
+            return None
+        if st.st_size != size:
+            return None
+
+        if st.st_mtime_ns != mtime_ns or self.verify_hash:
+            if self._hash(elf_path) != digest:
+                return None
+            if st.st_mtime_ns != mtime_ns:
+                # Same content with a new timestamp. Refresh the entry,
+                # so the next load takes the fast path
+                info = self._decode(data, idx, n_syms, n_segs)
+                if info is not None:
+                    self.store(elf_path, info, digest)
+                return info
+
+        return self._decode(data, idx, n_syms, n_segs)
+
+    def _decode(self, data, idx, n_syms, n_segs) -> Optional[ElfInfo]:
+        ret = ElfInfo()
+
+        try:
+            names_len, = struct.unpack_from("<I", data, idx)
+            idx += 4
+            if n_syms > 0:
+                ret.sym_names = data[idx:idx+names_len].decode().split("\0")
+            idx += names_len
+
+            for arr in (ret.sym_values, ret.sym_sizes):
+                idx = self._frombytes(arr, data, idx, 8*n_syms)
+            idx = self._frombytes(ret.sym_info, data, idx, n_syms)
+
+            segs = array('Q')
+            idx = self._frombytes(segs, data, idx, 32*n_segs)
+        except (struct.error, UnicodeDecodeError):
+            return None
+
+        if len(ret.sym_names) != n_syms or idx != len(data):
+            return None
+
+        ret.segs = [tuple(segs[i:i+4]) for i in range(0, len(segs), 4)]
+        return ret
+
+    @staticmethod
+    def _frombytes(arr, data, idx, n):
+        if idx + n > len(data):
+            raise struct.error("truncated cache entry")
+        arr.frombytes(data[idx:idx+n])
+        if arr.itemsize > 1 and sys.byteorder != "little":
+            arr.byteswap()
+        return idx + n
+
+    @staticmethod
+    def _le(arr) -> bytes:
+        if sys.byteorder != "little":
+            arr = array(arr.typecode, arr)
+            arr.byteswap()
+        return arr.tobytes()
+
+    @staticmethod
+    def _hash(elf_path) -> bytes:
+        h = hashlib.sha256()
+        with open(elf_path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return h.digest()
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                h.update(m)
+        return h.digest()
+
@@ -0,0 +1,64 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from typing import Optional, Tuple
+
+from core_debug_common.elf_info import ElfInfo
+from core_debug_common.func_index import FuncIndex
+from core_debug_common.line_index import LineIndex
+
+
+class ElfImage(object):
+    """Handle to a software image loaded by BfmBase.load_elf().
+
+    Holds the image's own symbol maps and function index, with all
+    addresses relocated by offset. start/end give the extent of the
+    image's load segments, or of its symbols if it has no segments.
+    """
+
+    def __init__(self, name, path, offset=0):
+        self.name = name
+        self.path = path
+        self.offset = offset
+        self.addr2sym_m = {}
+        self.sym2addr_m = {}
+        self.func_idx = FuncIndex()
+        self.line_idx = LineIndex(path)
+        self.start = 0
+        self.end = 0
+
+    def add_symbols(self, info : ElfInfo):
+        offset = self.offset
+        addr2sym_m = self.addr2sym_m
+        sym2addr_m = self.sym2addr_m
+        func_idx = self.func_idx
+        for name, value, size, st_info in zip(
+                info.sym_names, info.sym_values, info.sym_sizes, info.sym_info):
+            value += offset
+            addr2sym_m[value] = name
+            sym2addr_m[name] = value
+            if (st_info & 0xF) == ElfInfo.STT_FUNC:
+                func_idx.add(name, value, size)
+
+        if len(info.segs) > 0:
+            self.start = min(s[0] for s in info.segs) + offset
+            self.end = max(s[0]+s[3] for s in info.segs) + offset
+        elif len(info.sym_values) > 0:
+            self.start = min(info.sym_values) + offset
+            self.end = max(v+s for v, s in zip(info.sym_values, info.sym_sizes)) + offset + 1
+
+    def contains(self, addr) -> bool:
+        return self.start <= addr < self.end
+
+    def addr2func(self, pc) -> Optional[Tuple[str,int]]:
+        return self.func_idx.addr2func(pc)
+
+    def addr2line(self, pc) -> Optional[Tuple[str,int]]:
+        # Line info is in terms of unrelocated addresses
+        return self.line_idx.addr2line(pc - self.offset)
+
+    def __repr__(self):
+        return "ElfImage(%s, 0x%x..0x%x)" % (self.name, self.start, self.end)
+
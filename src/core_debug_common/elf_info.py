@@ -0,0 +1,75 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from array import array
+from typing import List, Tuple
+
+from elftools.elf.elffile import ELFFile
+
+
+class ElfInfo(object):
+    """Symbols and load layout of an ELF file, held in compact arrays.
+    
+    Symbols are kept in symbol-table order as parallel arrays of name,
+    value, size and st_info. Load segments are (vaddr, offset, filesz, 
+    memsz) tuples describing the PT_LOAD program headers.
+    """
+    
+    STT_NOTYPE = 0
+    STT_OBJECT = 1
+    STT_FUNC = 2
+    
+    def __init__(self):
+        self.sym_names : List[str] = []
+        self.sym_values = array('Q')
+        self.sym_sizes = array('Q')
+        self.sym_info = array('B')
+        self.segs : List[Tuple[int,int,int,int]] = []
+        
+    @property
+    def n_syms(self):
+        return len(self.sym_names)
+    
+    def sym_type(self, i) -> int:
+        return self.sym_info[i] & 0xF
+        
+    @staticmethod
+    def from_elffile(elffile : ELFFile) -> 'ElfInfo':
+        """Collects symbols and load segments with pyelftools"""
+        ret = ElfInfo()
+        
+        symtab = elffile.get_section_by_name('.symtab')
+        if symtab is not None:
+            for i in range(symtab.num_symbols()):
+                sym = symtab.get_symbol(i)
+                if sym.name != "":
+                    ret.sym_names.append(sym.name)
+                    ret.sym_values.append(sym["st_value"])
+                    ret.sym_sizes.append(sym["st_size"])
+                    st_info = sym["st_info"]
+                    ret.sym_info.append(
+                        (ElfInfo._enc(ElfInfo._st_bind, st_info["bind"]) << 4) | 
+                        ElfInfo._enc(ElfInfo._st_type, st_info["type"]))
+                
+        for i in range(elffile.num_segments()):
+            phdr = elffile._get_segment_header(i)
+            if phdr['p_type'] == 'PT_LOAD' and phdr['p_memsz'] != 0:
+                ret.segs.append((phdr['p_vaddr'], phdr['p_offset'], 
+                                 phdr['p_filesz'], phdr['p_memsz']))
+                
+        return ret
+    
+    @staticmethod
+    def _enc(tbl, v):
+        # Values pyelftools doesn't know by name are reported as integers
+        return v if isinstance(v, int) else tbl.get(v, 0)
+    
+    # pyelftools reports symbol type and binding by name
+    _st_type = {"STT_NOTYPE" : 0, "STT_OBJECT" : 1, "STT_FUNC" : 2,
+                "STT_SECTION" : 3, "STT_FILE" : 4, "STT_COMMON" : 5,
+                "STT_TLS" : 6, "STT_GNU_IFUNC" : 10}
+    _st_bind = {"STB_LOCAL" : 0, "STB_GLOBAL" : 1, "STB_WEAK" : 2,
+                "STB_GNU_UNIQUE" : 10}
+    
@@ -0,0 +1,117 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from collections import deque, namedtuple
+from enum import Enum, IntFlag, auto
+
+import pybfms
+
+
+class EventKind(IntFlag):
+    Exec  = auto() # Instruction executed
+    Entry = auto() # Function entered
+    Exit  = auto() # Function exited
+    
+class Backpressure(Enum):
+    DropOldest = auto() # Discard the oldest queued event when full
+    BlockSim   = auto() # Ask the BFM to stall the core while full
+    
+# Entry and exit events carry the function address, with instr=None
+StreamEvent = namedtuple("StreamEvent", ["kind", "addr", "instr"])
+
+class EventStream(object):
+    """Bounded queue of exec/entry/exit events, consumed with 'async for'.
+    
+    The stream subscribes once, when created, rather than registering
+    and deregistering a callback per event. Events that occur while the
+    consumer is busy are queued. When the queue is full, the policy 
+    either discards the oldest event, counting it in 'dropped', or asks
+    the BFM to stall the simulation until the consumer catches up.
+    """
+    
+    def __init__(self, bfm, kinds, addrs, maxlen, policy):
+        self.bfm = bfm
+        self.kinds = kinds
+        self.addrs = addrs
+        self.maxlen = maxlen
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self.blocking = False
+        
+        if policy == Backpressure.DropOldest:
+            self.q = deque(maxlen=maxlen)
+        else:
+            self.q = deque()
+        self.ev = pybfms.event()
+        
+        if kinds & EventKind.Exec:
+            bfm.add_on_exec_cb(self._on_exec, sym=addrs)
+        if kinds & EventKind.Entry:
+            bfm.add_on_entry_cb(self._on_entry, sym=addrs)
+        if kinds & EventKind.Exit:
+            bfm.add_on_exit_cb(self._on_exit, sym=addrs)
+            
+    def close(self):
+        """Unsubscribes the stream. Queued events may still be consumed"""
+        if self.closed:
+            return
+        self.closed = True
+        
+        if self.kinds & EventKind.Exec:
+            self.bfm.del_on_exec_cb(self._on_exec)
+        if self.kinds & EventKind.Entry:
+            self.bfm.del_on_entry_cb(self._on_entry)
+        if self.kinds & EventKind.Exit:
+            self.bfm.del_on_exit_cb(self._on_exit)
+        if self.blocking:
+            self.blocking = False
+            self.bfm._stream_backpressure(False)
+        self.ev.set()
+            
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, t, v, tb):
+        self.close()
+        
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> StreamEvent:
+        while len(self.q) == 0:
+            if self.closed:
+                raise StopAsyncIteration
+            self.ev.clear()
+            await self.ev.wait()
+            
+        ev = self.q.popleft()
+        
+        if self.blocking and len(self.q) <= self.maxlen//2:
+            self.blocking = False
+            self.bfm._stream_backpressure(False)
+            
+        return ev
+            
+    def _push(self, ev):
+        if len(self.q) >= self.maxlen:
+            if self.policy == Backpressure.DropOldest:
+                # The deque discards the oldest entry
+                self.dropped += 1
+            elif not self.blocking:
+                self.blocking = True
+                self.bfm._stream_backpressure(True)
+        self.q.append(ev)
+        self.ev.set()
+            
+    def _on_exec(self, pc, instr):
+        self._push(StreamEvent(EventKind.Exec, pc, instr))
+        
+    def _on_entry(self, pc):
+        self._push(StreamEvent(EventKind.Entry, pc, None))
+        
+    def _on_exit(self, pc):
+        self._push(StreamEvent(EventKind.Exit, pc, None))
+    
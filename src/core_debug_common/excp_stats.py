@@ -0,0 +1,117 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+
+
+class ExcpCauseStats(object):
+    """Exception counts and handler time for one trap cause"""
+
+    __slots__ = ("count", "instrs", "time")
+
+    def __init__(self):
+        self.count = 0
+        self.instrs = 0
+        self.time = 0
+
+
+class ExcpStats(object):
+    """Exception accounting, queryable at end of test.
+
+    Handler latency is measured in instructions, from the first
+    instruction of the handler up to the first instruction after its
+    return. max_instrs is the longest latency, which includes any
+    handlers nested within. The instrs and time totals, and the
+    breakdown by cause, count each instruction once: a nested handler
+    is charged to its own cause, and not again to the handler it
+    interrupts. Instructions are counted by BfmBase.n_exec, so they are
+    only exact when the BFM reports every instruction; under an enabled
+    PC filter, instructions the BFM omits are not counted. Handler time
+    is in simulation time units ('ns' by default), and is tracked only
+    when running under cocotb; it is None otherwise. The causes dict
+    breaks the figures down by the trap cause that
+    BfmBase.get_excp_cause() reports, when the BFM specialization
+    provides one.
+    """
+
+    def __init__(self, time_units="ns"):
+        self.count = 0
+        self.max_depth = 0
+        self.instrs = 0
+        self.max_instrs = 0
+        self.time = None
+        self.time_units = time_units
+        self.causes = {}
+        # [n_exec, time, cause, nested instrs, nested time] of each
+        # active handler, innermost last
+        self._active = []
+        self._get_sim_time = None
+        self._time_checked = False
+
+    def enter(self, n_exec, cause):
+        """Records entry to a handler at nesting depth len(_active)+1"""
+        self.count += 1
+        self._active.append([n_exec, self._now(), cause, 0, 0])
+        if len(self._active) > self.max_depth:
+            self.max_depth = len(self._active)
+
+    def exit(self, n_exec):
+        """Records return from the innermost handler"""
+        if len(self._active) == 0:
+            return
+        start_n, start_t, cause, nested_n, nested_t = self._active.pop()
+        instrs = n_exec - start_n
+        if instrs > self.max_instrs:
+            self.max_instrs = instrs
+        elapsed = 0
+        if start_t is not None:
+            elapsed = self._now() - start_t
+
+        # Charge only the handler's own share. Nested handlers have
+        # already been charged, and the interrupted handler excludes
+        # this one from its own share in turn
+        if len(self._active) > 0:
+            self._active[-1][3] += instrs
+            self._active[-1][4] += elapsed
+        instrs -= nested_n
+        elapsed -= nested_t
+        self.instrs += instrs
+        if start_t is not None:
+            self.time += elapsed
+
+        if cause is not None:
+            cs = self.causes.get(cause)
+            if cs is None:
+                cs = ExcpCauseStats()
+                self.causes[cause] = cs
+            cs.count += 1
+            cs.instrs += instrs
+            cs.time += elapsed
+
+    def report(self) -> str:
+        """Returns a text summary"""
+        lines = ["Exceptions: %d (max depth %d)" % (self.count, self.max_depth),
+                 "Handler instructions: %d (max %d)" % (self.instrs, self.max_instrs)]
+        if self.time is not None:
+            lines.append("Handler time: %d%s" % (self.time, self.time_units))
+        for cause, cs in sorted(self.causes.items(), key=lambda e: str(e[0])):
+            lines.append("  %s: %d exceptions, %d instructions" % (
+                str(cause), cs.count, cs.instrs))
+        return "\n".join(lines)
+
+    def _now(self):
+        if not self._time_checked:
+            # Only use simulation time if cocotb is running a simulation
+            self._time_checked = True
+            try:
+                from cocotb.utils import get_sim_time
+                get_sim_time(self.time_units)
+                self._get_sim_time = get_sim_time
+                self.time = 0
+            except Exception:
+                self._get_sim_time = None
+        if self._get_sim_time is None:
+            return None
+        return self._get_sim_time(self.time_units)
+
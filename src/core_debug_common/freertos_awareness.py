@@ -0,0 +1,57 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from core_debug_common.os_awareness import OsAwareness
+from core_debug_common.thread_info import ThreadInfo
+
+
+class FreeRtosAwareness(OsAwareness):
+    """OS awareness for FreeRTOS-style schedulers.
+
+    When the scheduler function (vTaskSwitchContext) returns, the
+    current-task pointer (pxCurrentTCB) is read from the mirror memory
+    and the BFM is switched to the thread whose ID is that TCB address.
+    If name_offset is given, thread names are read from the TCB's
+    pcTaskName field, which is name_len bytes at that offset. The
+    image containing the scheduler must be loaded before attaching.
+    """
+
+    def __init__(self,
+                 switch_sym="vTaskSwitchContext",
+                 current_tcb_sym="pxCurrentTCB",
+                 name_offset=None,
+                 name_len=16):
+        super().__init__()
+        self.switch_sym = switch_sym
+        self.current_tcb_sym = current_tcb_sym
+        self.name_offset = name_offset
+        self.name_len = name_len
+        self.current_tcb_addr = 0
+        self.n_switches = 0
+        self._read_ptr = None
+
+    def attach(self, bfm):
+        super().attach(bfm)
+        self.current_tcb_addr = bfm.sym2addr(self.current_tcb_sym)
+        self._read_ptr = bfm.mm.read64 if bfm.addr_width > 32 else bfm.mm.read32
+        bfm.add_on_exit_cb(self._on_switch, sym=self.switch_sym)
+
+    def detach(self):
+        self.bfm.del_on_exit_cb(self._on_switch)
+        super().detach()
+
+    def create_thread(self, tid) -> ThreadInfo:
+        ret = ThreadInfo(tid)
+        if self.name_offset is not None and tid != 0:
+            name = self.bfm.mm.read(tid + self.name_offset, self.name_len)
+            ret.name = name.split(b"\0", 1)[0].decode(errors="replace")
+        return ret
+
+    def _on_switch(self, pc):
+        tcb = self._read_ptr(self.current_tcb_addr)
+        if tcb != self.bfm.scheduled_thread().tid:
+            self.n_switches += 1
+            self.bfm.switch_thread(tcb)
+
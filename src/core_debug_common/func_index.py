@@ -0,0 +1,82 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+
+class FuncIndex(object):
+    """Maps an address to the function containing it.
+
+    Functions are kept as parallel arrays of start, end and name sorted
+    by start address, so lookup is a bisect with no allocation. Where
+    several functions share a start address, the first added is kept.
+    A function with a size of zero (eg a hand-written assembly routine)
+    extends to the start of the next function.
+    """
+
+    def __init__(self):
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.sizes = array('Q')
+        self.names = []
+        # Functions added since the last build: (start, size, name)
+        self._pending = []
+
+    def add(self, name, start, size):
+        self._pending.append((start, size, name))
+
+    def __len__(self):
+        if len(self._pending) > 0:
+            self._build()
+        return len(self.starts)
+
+    def lookup(self, pc) -> int:
+        """Returns the index of the function containing pc, or -1"""
+        if len(self._pending) > 0:
+            self._build()
+        i = bisect_right(self.starts, pc) - 1
+        if i >= 0 and pc < self.ends[i]:
+            return i
+        return -1
+
+    def addr2func(self, pc) -> Optional[Tuple[str,int]]:
+        """Returns (name, offset) of the function containing pc, or None"""
+        i = self.lookup(pc)
+        if i == -1:
+            return None
+        return (self.names[i], pc - self.starts[i])
+
+    def _build(self):
+        # Previously-built functions precede pending ones, so
+        # earlier additions win on a shared start address
+        funcs = list(zip(self.starts, self.sizes, self.names))
+        funcs.extend(self._pending)
+        self._pending = []
+        funcs.sort(key=lambda f: f[0])
+
+        starts = array('Q')
+        ends = array('Q')
+        sizes = array('Q')
+        names = []
+        for start, size, name in funcs:
+            if len(starts) > 0 and starts[-1] == start:
+                continue
+            starts.append(start)
+            ends.append(start+size)
+            sizes.append(size)
+            names.append(name)
+
+        # Zero-size functions extend to the next function
+        for i in range(len(starts)):
+            if sizes[i] == 0:
+                ends[i] = starts[i+1] if i+1 < len(starts) else 0xFFFFFFFFFFFFFFFF
+
+        self.starts = starts
+        self.ends = ends
+        self.sizes = sizes
+        self.names = names
+
@@ -0,0 +1,231 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from array import array
+from bisect import bisect_right
+import mmap
+import os
+from typing import Optional, Tuple
+
+from elftools.elf.elffile import ELFFile
+
+
+class LineIndex(object):
+    """Maps addresses to source file and line using .debug_line.
+
+    Nothing is read until the first lookup. The first lookup builds a
+    sorted index of compile-unit address ranges, from .debug_aranges
+    when present or otherwise from each CU's low/high PC. A CU's line
+    program is only decoded the first time an address in it is looked
+    up, unless decoding was needed to find its ranges. Its rows are kept
+    as sorted arrays of address, file ID and line. CU ranges may overlap
+    (eg code discarded by the linker is left at address 0), in which
+    case the containing ranges are tried from the highest start down.
+    """
+
+    def __init__(self, elf_path):
+        self.elf_path = elf_path
+        self.files = []
+        self._file_ids = {}
+        self._built = False
+        self._dwarf = None
+        self._map = None
+
+        # CU ranges, sorted by start. cu_ids index _cu_offsets
+        self.cu_starts = array('Q')
+        self.cu_ends = array('Q')
+        self.cu_ids = array('I')
+        # Highest end among ranges 0..i, to bound the search on overlap
+        self._max_ends = array('Q')
+        self._cu_offsets = []
+        # CU ID -> (addrs, file IDs, lines) once decoded
+        self._cu_rows = {}
+        self.n_decoded = 0
+
+    def addr2line(self, pc) -> Optional[Tuple[str,int]]:
+        """Returns (file, line) for pc, or None if there is no line info"""
+        if not self._built:
+            self._build()
+
+        i = bisect_right(self.cu_starts, pc) - 1
+        while i >= 0 and self._max_ends[i] > pc:
+            if pc < self.cu_ends[i]:
+                ret = self._cu_lookup(self.cu_ids[i], pc)
+                if ret is not None:
+                    return ret
+            i -= 1
+        return None
+
+    def _cu_lookup(self, cu_id, pc) -> Optional[Tuple[str,int]]:
+        rows = self._cu_rows.get(cu_id)
+        if rows is None:
+            rows = self._decode_cu(cu_id)
+        addrs, file_ids, lines = rows
+
+        j = bisect_right(addrs, pc) - 1
+        if j < 0 or lines[j] == 0:
+            # Before the first row, or past an end of sequence
+            return None
+        return (self.files[file_ids[j]], lines[j])
+
+    def close(self):
+        """Releases the ELF file. Undecoded CUs are no longer available"""
+        self._dwarf = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _build(self):
+        self._built = True
+
+        with open(self.elf_path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return
+            # pyelftools decodes on demand, so keep the file mapped
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        elffile = ELFFile(self._map)
+        if not elffile.has_dwarf_info():
+            self.close()
+            return
+        dwarf = elffile.get_dwarf_info()
+        self._dwarf = dwarf
+
+        # List of (start, end, cu-offset)
+        ranges = []
+        aranges = dwarf.get_aranges()
+        if aranges is not None:
+            for ent in aranges.entries:
+                if ent.length != 0:
+                    ranges.append((ent.begin_addr, ent.begin_addr+ent.length, ent.info_offset))
+        # Rows of CUs decoded to find their ranges, by CU offset
+        decoded = {}
+        if aranges is None:
+            for cu in dwarf.iter_CUs():
+                ranges.extend(self._cu_ranges(cu, decoded))
+
+        self._set_ranges(ranges, decoded)
+
+    def _set_ranges(self, ranges, decoded=None):
+        """Indexes a list of (start, end, cu-offset) ranges"""
+        cu_id_m = {}
+        ranges.sort()
+        max_end = 0
+        for start, end, cu_off in ranges:
+            cu_id = cu_id_m.get(cu_off)
+            if cu_id is None:
+                cu_id = len(self._cu_offsets)
+                cu_id_m[cu_off] = cu_id
+                self._cu_offsets.append(cu_off)
+                if decoded is not None and cu_off in decoded:
+                    self._cu_rows[cu_id] = decoded[cu_off]
+            max_end = max(max_end, end)
+            self.cu_starts.append(start)
+            self.cu_ends.append(end)
+            self.cu_ids.append(cu_id)
+            self._max_ends.append(max_end)
+
+    def _cu_ranges(self, cu, decoded):
+        """Returns the address ranges of a CU. Without low/high PC, the
+        CU is decoded to find the ranges its line program covers, and
+        its rows are saved in decoded for lookups"""
+        top = cu.get_top_DIE()
+        low = top.attributes.get("DW_AT_low_pc")
+        high = top.attributes.get("DW_AT_high_pc")
+        if low is not None and high is not None and "DW_AT_ranges" not in top.attributes:
+            if high.form == "DW_FORM_addr":
+                end = high.value
+            else:
+                end = low.value + high.value
+            return [(low.value, end, cu.cu_offset)]
+
+        rows, seqs = self._decode_rows(cu)
+        decoded[cu.cu_offset] = rows
+        return [(start, end, cu.cu_offset) for start, end in seqs]
+
+    @staticmethod
+    def _line_entries(lineprog):
+        if lineprog is None:
+            return
+        for ent in lineprog.get_entries():
+            if ent.state is not None:
+                yield ent.state
+
+    def _decode_cu(self, cu_id):
+        cu = self._dwarf.get_CU_at(self._cu_offsets[cu_id])
+        ret, _ = self._decode_rows(cu)
+        self._cu_rows[cu_id] = ret
+        return ret
+
+    def _decode_rows(self, cu):
+        """Decodes a CU's line program. Returns the row arrays, and the
+        (start, end) address range of each sequence"""
+        # Rows as (addr, order, file-id, line). end_sequence rows sort
+        # ahead of a row at the same address, and carry line 0
+        rows = []
+        seqs = []
+        seq_start = None
+        lineprog = self._dwarf.line_program_for_CU(cu)
+        comp_dir = cu.get_top_DIE().attributes.get("DW_AT_comp_dir")
+        if comp_dir is not None:
+            comp_dir = comp_dir.value
+            if isinstance(comp_dir, bytes):
+                comp_dir = comp_dir.decode(errors="replace")
+        file_m = {}
+        for st in self._line_entries(lineprog):
+            if seq_start is None:
+                seq_start = st.address
+            if st.end_sequence:
+                rows.append((st.address, 0, 0, 0))
+                seqs.append((seq_start, st.address))
+                seq_start = None
+            else:
+                file_id = file_m.get(st.file)
+                if file_id is None:
+                    file_id = self._file_id(self._file_name(lineprog, comp_dir, st.file))
+                    file_m[st.file] = file_id
+                rows.append((st.address, 1, file_id, st.line))
+        rows.sort(key=lambda r: (r[0], r[1]))
+
+        ret = (array('Q', (r[0] for r in rows)),
+               array('I', (r[2] for r in rows)),
+               array('I', (r[3] for r in rows)))
+        self.n_decoded += 1
+        return (ret, seqs)
+
+    def _file_id(self, name):
+        ret = self._file_ids.get(name)
+        if ret is None:
+            ret = len(self.files)
+            self.files.append(name)
+            self._file_ids[name] = ret
+        return ret
+
+    @staticmethod
+    def _file_name(lineprog, comp_dir, file_idx) -> str:
+        files = lineprog["file_entry"]
+        dirs = lineprog["include_directory"]
+
+        # DWARF 5 file and directory tables are 0-based and directory 0
+        # is the compilation directory. Earlier versions are 1-based
+        # and directory 0 is the CU's DW_AT_comp_dir
+        if lineprog.header.version >= 5:
+            ent = files[file_idx] if file_idx < len(files) else None
+            dir_idx = ent.dir_index if ent is not None else 0
+        else:
+            ent = files[file_idx-1] if 0 < file_idx <= len(files) else None
+            dir_idx = ent.dir_index-1 if ent is not None else -1
+
+        if ent is None:
+            return "<unknown>"
+
+        name = ent.name.decode(errors="replace")
+        if not os.path.isabs(name):
+            if 0 <= dir_idx < len(dirs):
+                name = os.path.join(dirs[dir_idx].decode(errors="replace"), name)
+            elif dir_idx == -1 and comp_dir is not None:
+                name = os.path.join(comp_dir, name)
+        return name
+
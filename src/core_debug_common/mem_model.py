@@ -3,20 +3,60 @@ Created on Feb 7, 2021
 
 @author: mballance
 '''
+import itertools
+import struct
+from typing import List, Iterator, Tuple
 
 class MemModel(object):
     
-    class TreeNode(object):
-        
-        def __init__(self):
-            self.nodes = [None]*256
-            
-        pass
+    # Memory-delta file format: a header followed by 
+    # (address, length, data) records
+    DELTA_MAGIC = b"MMDL"
+    DELTA_VERSION = 1
+    _delta_hdr = struct.Struct("<4sH")
+    _delta_rec = struct.Struct("<QI")
+    
+    # Granularity at which dirty pages are compared
+    _DIFF_BLK = 64
     
     class Page(object):
         
-        def __init__(self):
-            self.mem = bytearray(1 << 16)
+        def __init__(self, mem=None):
+            self.mem = bytearray(1 << 16) if mem is None else mem
+            # Snapshot generation in which the page was created.
+            # Pages from earlier generations may be shared
+            self.gen = 0
+            
+    class _IntCodec(object):
+        """Word codec for data widths that struct does not support.
+        Provides the subset of the struct.Struct API used here"""
+        
+        def __init__(self, size, little_endian):
+            self.size = size
+            self.order = "little" if little_endian else "big"
+            
+        def pack(self, v):
+            return v.to_bytes(self.size, self.order)
+        
+        def pack_into(self, buf, off, v):
+            buf[off:off+self.size] = v.to_bytes(self.size, self.order)
+            
+        def unpack_from(self, buf, off):
+            return (int.from_bytes(buf[off:off+self.size], self.order),)
+            
+    # struct formats for the natively-supported word sizes
+    _word_fmt = {1 : "B", 2 : "H", 4 : "I", 8 : "Q"}
+            
+    class Snapshot(object):
+        """Captured memory state. Holds references to the pages
+        that were current when the snapshot was taken"""
+        
+        def __init__(self, pages):
+            self.pages = pages
+            
+        @property
+        def n_pages(self):
+            return len(self.pages)
     
     def __init__(self, 
                  addr_width=32,
@@ -25,29 +65,116 @@ class MemModel(object):
         self.addr_width = addr_width
         self.data_width = data_width
         self.little_endian = little_endian
-        self.root = MemModel.TreeNode()
+        self.addr_mask = (1 << addr_width)-1
+        
+        # Select width- and endian-specific accessors once up-front
+        endian = "<" if little_endian else ">"
+        self._u16 = struct.Struct(endian + "H")
+        self._u32 = struct.Struct(endian + "I")
+        self._u64 = struct.Struct(endian + "Q")
+        
+        word_bytes = data_width // 8
+        if word_bytes in MemModel._word_fmt.keys():
+            self._word_st = struct.Struct(endian + MemModel._word_fmt[word_bytes])
+        else:
+            self._word_st = MemModel._IntCodec(word_bytes, little_endian)
+        self._word_align = 0xFFFF & ~(word_bytes-1)
+        self._word_mask = (1 << word_bytes)-1
+        self._word_data_mask = (1 << data_width)-1
+        
+        # Page number (addr >> 16) to page
+        self.pages = {}
         self.n_pages = 0
         
+        # Most-recently-used page. Accesses tend to cluster on
+        # a few pages, so this avoids most dictionary lookups
+        self._last_pgnum = -1
+        self._last_page = None
+        
+        # Most-recently-written page. Only holds a page that is
+        # private to the current generation
+        self._wr_pgnum = -1
+        self._wr_page = None
+        self._wr_ext = None
+        
+        self.gen = 0
+        
+        # Map of page number to the [lo,hi) byte extent written since
+        # the last clear_dirty(), and the memory state at that point if
+        # clear_dirty() was asked to keep it
+        self.dirty = {}
+        self._dirty_base = None
+        
     def write_word(self, addr, data, mask):
         """Write a data-width value to memory"""
-        page = self._getpage(addr)
-        pageaddr = addr & 0xFFFC
+        pageaddr = addr & self._word_align
+        page = self._getpage_w(addr, pageaddr, pageaddr+self._word_st.size)
         
-        for i in range(int(self.data_width/8)):
-            if (mask & 1<<i) != 0:
-                page.mem[pageaddr] = (data & 0xFF)
-            pageaddr += 1
-            data >>= 8
+        if mask == self._word_mask:
+            self._word_st.pack_into(page.mem, pageaddr, data & self._word_data_mask)
+        else:
+            self._write_lanes(page.mem, pageaddr, 
+                self._word_st.pack(data & self._word_data_mask), mask)
+        
+    def write_words(self, addrs, datas, masks=None):
+        """Writes a batch of data-width values. masks may be None
+        when all writes are full-width"""
+        if masks is None:
+            masks = itertools.repeat(self._word_mask)
+        
+        amask = self.addr_mask
+        align = self._word_align
+        full = self._word_mask
+        dmask = self._word_data_mask
+        st = self._word_st
+        wb = st.size
+        
+        last_pgnum = -1
+        mem = None
+        ext = None
+        for addr, data, mask in zip(addrs, datas, masks):
+            pgnum = (addr & amask) >> 16
+            off = addr & align
+            if pgnum != last_pgnum:
+                mem = self._getpage_w(addr, off, off+wb).mem
+                ext = self._wr_ext
+                last_pgnum = pgnum
+            else:
+                if off < ext[0]:
+                    ext[0] = off
+                if off+wb > ext[1]:
+                    ext[1] = off+wb
+            if mask == full:
+                st.pack_into(mem, off, data & dmask)
+            else:
+                self._write_lanes(mem, off, st.pack(data & dmask), mask)
+        
+    def write16(self, addr, data, mask=0x3):
+        pageaddr = addr & 0xFFFE
+        page = self._getpage_w(addr, pageaddr, pageaddr+2)
+        
+        if mask == 0x3:
+            self._u16.pack_into(page.mem, pageaddr, data & 0xFFFF)
+        else:
+            self._write_lanes(page.mem, pageaddr, self._u16.pack(data & 0xFFFF), mask)
         
     def write32(self, addr, data, mask=0xF):
-        page = self._getpage(addr)
         pageaddr = addr & 0xFFFC
+        page = self._getpage_w(addr, pageaddr, pageaddr+4)
+        
+        if mask == 0xF:
+            self._u32.pack_into(page.mem, pageaddr, data & 0xFFFFFFFF)
+        else:
+            self._write_lanes(page.mem, pageaddr, self._u32.pack(data & 0xFFFFFFFF), mask)
+            
+    def write64(self, addr, data, mask=0xFF):
+        pageaddr = addr & 0xFFF8
+        page = self._getpage_w(addr, pageaddr, pageaddr+8)
         
-        for i in range(4):
-            if (mask & 1<<i) != 0:
-                page.mem[pageaddr] = (data & 0xFF)
-            pageaddr += 1
-            data >>= 8
+        if mask == 0xFF:
+            self._u64.pack_into(page.mem, pageaddr, data & 0xFFFFFFFFFFFFFFFF)
+        else:
+            self._write_lanes(page.mem, pageaddr, self._u64.pack(data & 0xFFFFFFFFFFFFFFFF), mask)
             
     def read8(self, addr) -> int:
         page = self._getpage(addr)
@@ -57,88 +184,304 @@ class MemModel(object):
     
     def read16(self, addr) -> int:
         page = self._getpage(addr)
-        pageaddr = addr & 0xFFFE
-
-        data = 0        
-        for i in range(2):
-            if self.little_endian:
-                data |= (page.mem[pageaddr] << 8*i)
-            else:
-                raise NotImplementedError("Big-endian read not implemented")
-            pageaddr += 1
-            
-        return data
+        return self._u16.unpack_from(page.mem, addr & 0xFFFE)[0]
     
     def read32(self, addr) -> int:
         page = self._getpage(addr)
-        pageaddr = addr & 0xFFFC
-
-        data = 0        
-        for i in range(4):
-            if self.little_endian:
-                data |= (page.mem[pageaddr] << 8*i)
-            else:
-                raise NotImplementedError("Big-endian read not implemented")
-            pageaddr += 1
-            
-        return data
+        return self._u32.unpack_from(page.mem, addr & 0xFFFC)[0]
+    
+    def read64(self, addr) -> int:
+        page = self._getpage(addr)
+        return self._u64.unpack_from(page.mem, addr & 0xFFF8)[0]
+    
+    def read_word(self, addr) -> int:
+        """Read a data-width value from memory"""
+        page = self._getpage(addr)
+        return self._word_st.unpack_from(page.mem, addr & self._word_align)[0]
+    
+    @staticmethod
+    def _write_lanes(mem, pageaddr, wb, mask):
+        """Writes the byte lanes of a packed word selected by mask. 
+        Mask bit N selects the byte at address offset N"""
+        i = 0
+        while mask and i < len(wb):
+            if mask & 1:
+                mem[pageaddr+i] = wb[i]
+            mask >>= 1
+            i += 1
     
     def write(self, addr, data : bytearray):
+        """Writes a block of bytes, which may span pages"""
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        data = memoryview(data).cast("B")
+        
+        nbytes = len(data)
+        idx = 0
+        while idx < nbytes:
+            pageaddr = addr & 0xFFFF
+            n = min(0x10000-pageaddr, nbytes-idx)
+            page = self._getpage_w(addr, pageaddr, pageaddr+n)
+            page.mem[pageaddr:pageaddr+n] = data[idx:idx+n]
+            idx += n
+            addr += n
+    
+    def read(self, addr, nbytes : int) -> bytearray:
+        """Returns a copy of a block of bytes, which may span pages"""
+        ret = bytearray(nbytes)
+        self.read_into(addr, ret)
+        return ret
+    
+    def read_into(self, addr, buf) -> int:
+        """Fills a caller-supplied buffer with memory starting at addr"""
+        buf = memoryview(buf).cast("B")
 
-        page = self._getpage(addr)
-        pageaddr = addr & 0xFFFF
-        for i in range(len(data)):
-            page.mem[pageaddr] = data[i]
-            pageaddr += 1
-            addr += 1
+        nbytes = len(buf)
+        idx = 0
+        while idx < nbytes:
+            page = self._getpage(addr)
+            pageaddr = addr & 0xFFFF
+            n = min(0x10000-pageaddr, nbytes-idx)
+            buf[idx:idx+n] = memoryview(page.mem)[pageaddr:pageaddr+n]
+            idx += n
+            addr += n
             
-            if pageaddr > 65535:
-                pageaddr = addr & 0xFFFF
-                page = self._getpage(addr)
+        return nbytes
+    
+    def view(self, addr, nbytes : int) -> memoryview:
+        """Returns a read-only view of memory. The view references page 
+        storage directly when the range is within a single page, and 
+        is backed by a copy otherwise"""
+        pageaddr = addr & 0xFFFF
+        if pageaddr + nbytes <= 0x10000:
+            page = self._getpage(addr)
+            return memoryview(page.mem)[pageaddr:pageaddr+nbytes].toreadonly()
+        else:
+            return memoryview(self.read(addr, nbytes)).toreadonly()
+    
+    def memset(self, addr, val, size):
+        """Fills a block of memory with a byte value"""
+        fill = memoryview(bytes((val & 0xFF,)) * min(size, 0x10000))
 
+        idx = 0
+        while idx < size:
+            pageaddr = addr & 0xFFFF
+            n = min(0x10000-pageaddr, size-idx)
+            page = self._getpage_w(addr, pageaddr, pageaddr+n)
+            page.mem[pageaddr:pageaddr+n] = fill[:n]
+            idx += n
+            addr += n
+        
+    def snapshot(self) -> 'MemModel.Snapshot':
+        """Captures the current memory contents. Pages are shared with
+        the snapshot, and are copied on their first subsequent write"""
+        snap = MemModel.Snapshot(dict(self.pages))
+        self._new_gen()
+        return snap
     
-    def read(self, addr, nbytes : int) -> bytearray:
-        ret = bytearray(bytes)
+    def restore(self, snap : 'MemModel.Snapshot'):
+        """Returns memory to the state captured by a snapshot"""
+        for pgnum in self.pages.keys() | snap.pages.keys():
+            if self.pages.get(pgnum) is not snap.pages.get(pgnum):
+                self.dirty[pgnum] = [0, 0x10000]
+        self.pages = dict(snap.pages)
+        self.n_pages = len(self.pages)
+        self._last_pgnum = -1
+        self._last_page = None
+        self._new_gen()
         
-        page = self._getpage(addr)
-        pageaddr = addr & 0xFFFF
-        for i in range(nbytes):
-            ret[i] = page.mem[pageaddr]
-            pageaddr += 1
-            addr += 1
-            
-            if pageaddr > 65535:
-                pageaddr = addr & 0xFFFF
-                page = self._getpage(addr)
+    def diff(self, a : 'MemModel.Snapshot', b : 'MemModel.Snapshot'=None) -> List[int]:
+        """Returns the base addresses of pages whose content differs
+        between two snapshots, or between a snapshot and current memory"""
+        a_pages = a.pages
+        b_pages = self.pages if b is None else b.pages
+        zero = bytes(0x10000)
 
+        ret = []
+        for pgnum in a_pages.keys() | b_pages.keys():
+            a_page = a_pages.get(pgnum)
+            b_page = b_pages.get(pgnum)
+            
+            # Unmodified pages are shared, making the common case cheap
+            if a_page is b_page:
+                continue
+            a_mem = zero if a_page is None else a_page.mem
+            b_mem = zero if b_page is None else b_page.mem
+            if a_mem != b_mem:
+                ret.append(pgnum << 16)
+        ret.sort()
+        
         return ret
     
-    def memset(self, addr, val, size):
-        page = None
-
-        ms_addr = addr
-        for i in range(size):
-            if page is None or (ms_addr & 0xFFFF) == 0:
-                page = self._getpage(ms_addr)
+    def clear_dirty(self, keep_base=False):
+        """Clears dirty-page state. By default, subsequent deltas hold 
+        the span of bytes written in each page. When keep_base is set, 
+        memory is snapshotted so that deltas hold only the bytes whose
+        value changed. This is more compact when writes are scattered 
+        within a page, but each page is copied on its next write, and 
+        the copies are held until the next clear_dirty()"""
+        if keep_base:
+            self._dirty_base = self.snapshot()
+        else:
+            self._dirty_base = None
+        # The cached write extent belongs to the old dirty state
+        self._wr_pgnum = -1
+        self._wr_page = None
+        self._wr_ext = None
+        self.dirty = {}
+        
+    def dirty_pages(self) -> List[int]:
+        """Returns the base addresses of pages written since the
+        last clear_dirty()"""
+        return sorted(pgnum << 16 for pgnum in self.dirty)
+    
+    def dirty_ranges(self) -> Iterator[Tuple[int,bytes]]:
+        """Yields (addr,data) for the memory modified since the last 
+        clear_dirty(). By default, this is the span of bytes written in
+        each page. When clear_dirty() kept a base, ranges are trimmed to
+        the bytes whose value changed"""
+        zero = bytes(0x10000)
+        
+        if self._dirty_base is None:
+            for pgnum in sorted(self.dirty):
+                lo, hi = self.dirty[pgnum]
+                if lo >= hi:
+                    continue
+                page = self.pages.get(pgnum)
+                mem = zero if page is None else page.mem
+                yield ((pgnum << 16) + lo, bytes(mem[lo:hi]))
+            return
+        
+        base_pages = self._dirty_base.pages
+        blk = MemModel._DIFF_BLK
+        
+        for pgnum in sorted(self.dirty):
+            page = self.pages.get(pgnum)
+            base = base_pages.get(pgnum)
+            if page is base:
+                continue
+            cur = memoryview(zero if page is None else page.mem)
+            ref = memoryview(zero if base is None else base.mem)
+            if cur == ref:
+                continue
+            
+            # Locate runs of differing blocks, then trim the 
+            # unchanged bytes at either end of each run
+            off = 0
+            while off < 0x10000:
+                if cur[off:off+blk] == ref[off:off+blk]:
+                    off += blk
+                    continue
+                start = off
+                while off < 0x10000 and cur[off:off+blk] != ref[off:off+blk]:
+                    off += blk
+                end = off
+                while cur[start] == ref[start]:
+                    start += 1
+                while cur[end-1] == ref[end-1]:
+                    end -= 1
+                yield ((pgnum << 16) + start, bytes(cur[start:end]))
+                
+    def export_delta(self, fp):
+        """Writes the ranges modified since the last clear_dirty() 
+        to a binary file"""
+        fp.write(MemModel._delta_hdr.pack(
+            MemModel.DELTA_MAGIC, MemModel.DELTA_VERSION))
+        for addr, data in self.dirty_ranges():
+            fp.write(MemModel._delta_rec.pack(addr, len(data)))
+            fp.write(data)
+            
+    def load_delta(self, fp):
+        """Applies a delta written by export_delta()"""
+        hdr = fp.read(MemModel._delta_hdr.size)
+        if len(hdr) != MemModel._delta_hdr.size:
+            raise Exception("Truncated memory-delta header")
+        magic, version = MemModel._delta_hdr.unpack(hdr)
+        if magic != MemModel.DELTA_MAGIC or version != MemModel.DELTA_VERSION:
+            raise Exception("Unsupported memory-delta format (%s v%d)" % (
+                str(magic), version))
+        
+        while True:
+            rec = fp.read(MemModel._delta_rec.size)
+            if len(rec) == 0:
+                break
+            elif len(rec) != MemModel._delta_rec.size:
+                raise Exception("Truncated memory-delta record")
+            addr, nbytes = MemModel._delta_rec.unpack(rec)
+            data = fp.read(nbytes)
+            if len(data) != nbytes:
+                raise Exception("Truncated memory-delta record at 0x%08x" % addr)
+            self.write(addr, data)
+        
+    def _new_gen(self):
+        # All existing pages become shared, and are copied on next write
+        self.gen += 1
+        self._wr_pgnum = -1
+        self._wr_page = None
+        self._wr_ext = None
+        
+    def _getpage_w(self, addr, lo, hi) -> 'MemModel.Page':
+        """Locates the page holding addr in preparation for a write to
+        page offsets [lo,hi), and records the write as dirty"""
+        pgnum = (addr & self.addr_mask) >> 16
+        
+        if pgnum == self._wr_pgnum:
+            ext = self._wr_ext
+            if lo < ext[0]:
+                ext[0] = lo
+            if hi > ext[1]:
+                ext[1] = hi
+            return self._wr_page
+        
+        page = self._getpage(addr)
+        
+        if page.gen != self.gen:
+            # Page may be referenced by a snapshot. Copy before writing
+            copy = self._newpage(page.mem)
+            copy.gen = self.gen
+            self.pages[pgnum] = copy
+            self._last_page = copy
+            page = copy
+        
+        ext = self.dirty.get(pgnum)
+        if ext is None:
+            self.dirty[pgnum] = [lo, hi]
+            ext = self.dirty[pgnum]
+        else:
+            if lo < ext[0]:
+                ext[0] = lo
+            if hi > ext[1]:
+                ext[1] = hi
+        self._wr_pgnum = pgnum
+        self._wr_page = page
+        self._wr_ext = ext
 
-            page.mem[ms_addr&0xFFFF] = val
-            ms_addr += 1
+        return page
         
     def _getpage(self, addr) -> 'MemModel.Page':
-        """Walk the tree to find the page"""
-        
-        node = self.root
-        b = self.addr_width - 8
-        
-        while b > 16:
-            ab = (addr >> b) & 0xFF
-            if node.nodes[ab] is None:
-                if b > 24:
-                    node.nodes[ab] = MemModel.TreeNode()
-                else:
-                    node.nodes[ab] = MemModel.Page()
-                    self.n_pages += 1
-            node = node.nodes[ab]
-            b -= 8
+        """Locates the page holding addr, creating it if needed"""
+        pgnum = (addr & self.addr_mask) >> 16
+        
+        if pgnum == self._last_pgnum:
+            return self._last_page
 
-        return node
+        page = self.pages.get(pgnum)
+        if page is None:
+            page = self._newpage()
+            page.gen = self.gen
+            self.pages[pgnum] = page
+            self.n_pages += 1
+            
+        self._last_pgnum = pgnum
+        self._last_page = page
+
+        return page
+    
+    def _newpage(self, init=None) -> 'MemModel.Page':
+        """Allocates storage for a page, zeroed or initialized with a
+        copy of init. Overridden by backends that place pages somewhere
+        other than the Python heap"""
+        if init is None:
+            return MemModel.Page()
+        else:
+            return MemModel.Page(bytearray(init))
@@ -0,0 +1,134 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import ctypes
+import mmap
+import tempfile
+import weakref
+
+from core_debug_common.mem_model import MemModel
+
+
+class MmapMemModel(MemModel):
+    """Memory model that places pages in a sparse memory-mapped file.
+    
+    Page slots are assigned in the order pages are first touched, so the
+    file size tracks the number of pages in use rather than the address
+    space. Slots that are never written remain holes in the file, and
+    the OS is free to page the mirror out to the file. A slot is reused
+    once its page is referenced by neither the model nor a snapshot, so
+    repeated snapshots and restores don't grow the file.
+    """
+    
+    # Pages are mapped in 16MiB chunks
+    PAGES_PER_CHUNK = 256
+    CHUNK_SZ = PAGES_PER_CHUNK << 16
+    
+    _zero = bytes(0x10000)
+    
+    def __init__(self,
+                 addr_width=32,
+                 data_width=32,
+                 little_endian=True,
+                 path=None):
+        super().__init__(addr_width, data_width, little_endian)
+        
+        if path is None:
+            self.fp = tempfile.TemporaryFile()
+        else:
+            self.fp = open(path, "w+b")
+        self.chunks = []
+        self.n_slots = 0
+        
+        # One view per slot, including slots held by snapshots
+        self.views = []
+        # Views of slots whose page has been released
+        self.free_views = []
+        
+    def close(self):
+        """Releases the mapping and the backing file. Snapshots taken
+        from this model are invalid once it is closed. Memory returned 
+        by view() remains readable, since mappings that it references
+        are kept until it is released"""
+        for view in self.views:
+            try:
+                view.release()
+            except BufferError:
+                # Exported by an outstanding view(). Left to the GC
+                pass
+        self.views.clear()
+        self.free_views.clear()
+        self.pages.clear()
+        self._last_pgnum = -1
+        self._last_page = None
+        self._wr_pgnum = -1
+        self._wr_page = None
+        self._wr_ext = None
+        
+        for chunk in self.chunks:
+            try:
+                chunk.close()
+            except BufferError:
+                pass
+        self.chunks.clear()
+        self.fp.close()
+        
+    def view(self, addr, nbytes : int) -> memoryview:
+        """Returns a read-only view of memory. A view within a single
+        page keeps the page referenced, so that its slot is not reused
+        while the view is alive"""
+        pageaddr = addr & 0xFFFF
+        if nbytes == 0 or pageaddr + nbytes > 0x10000:
+            return super().view(addr, nbytes)
+        page = self._getpage(addr)
+        buf = (ctypes.c_char * nbytes).from_buffer(page.mem, pageaddr)
+        buf.page = page
+        return memoryview(buf).cast("B").toreadonly()
+        
+    def _newpage(self, init=None) -> 'MemModel.Page':
+        if len(self.free_views) > 0:
+            view = self.free_views.pop()
+            if init is None:
+                view[:] = MmapMemModel._zero
+        else:
+            view = self._newslot()
+            
+        if init is not None:
+            view[:] = init
+            
+        page = MemModel.Page(view)
+        # Return the slot for reuse once the page is unreferenced. The
+        # finalizer must not keep the model alive
+        weakref.finalize(page, MmapMemModel._release, weakref.ref(self), view)
+        
+        return page
+    
+    def _newslot(self) -> memoryview:
+        chunk_idx = self.n_slots // MmapMemModel.PAGES_PER_CHUNK
+        
+        if chunk_idx == len(self.chunks):
+            # Extending the file leaves a hole, which costs no disk 
+            # space until a page within it is written
+            self.fp.truncate((chunk_idx+1)*MmapMemModel.CHUNK_SZ)
+            self.chunks.append(mmap.mmap(
+                self.fp.fileno(), 
+                MmapMemModel.CHUNK_SZ,
+                offset=chunk_idx*MmapMemModel.CHUNK_SZ))
+            
+        off = (self.n_slots % MmapMemModel.PAGES_PER_CHUNK) << 16
+        self.n_slots += 1
+        
+        view = memoryview(self.chunks[chunk_idx])[off:off+0x10000]
+        self.views.append(view)
+        
+        return view
+    
+    @staticmethod
+    def _release(model_r, view):
+        model = model_r()
+        # Views are invalid once the model is closed
+        if model is not None and len(model.chunks) > 0:
+            model.free_views.append(view)
+    
@@ -0,0 +1,33 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from core_debug_common.thread_info import ThreadInfo
+
+
+class OsAwareness(object):
+    """Base class for OS-awareness plugins.
+
+    A plugin is attached with BfmBase.set_os_awareness(). It typically
+    hooks scheduler functions in attach(), determines the incoming
+    thread when one runs (eg by reading the OS's current-task pointer
+    from the mirror memory), and calls BfmBase.switch_thread() with its
+    thread ID. The BFM creates threads on first use via create_thread().
+    """
+
+    def __init__(self):
+        self.bfm = None
+
+    def attach(self, bfm):
+        """Called when the plugin is installed in a BFM"""
+        self.bfm = bfm
+
+    def detach(self):
+        """Called when the plugin is removed. Must remove any hooks"""
+        self.bfm = None
+
+    def create_thread(self, tid) -> ThreadInfo:
+        """Returns a new ThreadInfo (or derived class) for tid"""
+        return ThreadInfo(tid)
+
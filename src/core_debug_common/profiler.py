@@ -0,0 +1,266 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+
+
+class Profiler(object):
+    """Function-level profiler driven by a BfmBase's call/return events.
+
+    Instructions are counted by BfmBase.n_exec. At each call, return,
+    exception, return from exception or thread switch, the instructions
+    executed since the previous event are charged to the function that
+    was running, so plain instructions cost nothing beyond the BFM's
+    counter. Code in a
+    thread's base frame (eg an interrupt handler entered without a call)
+    is charged to the thread's name. While attached, the profiler 
+    requires the BFM to report every instruction, disabling any PC 
+    filter, so that n_exec is exact.
+
+    Counts are held in lists indexed by the BFM's symbol IDs. Inclusive
+    counts are the instructions elapsed between entry and exit, and
+    count only the outermost activation of a recursive function. When
+    time_units is given, simulation time is accumulated in the same way,
+    using cocotb's get_sim_time() (or time_f, if specified).
+    """
+
+    def __init__(self, bfm, time_units=None, time_f=None):
+        self.bfm = bfm
+        self.calls = []
+        self.excl = []
+        self.incl = []
+        self.excl_time = []
+        self.incl_time = []
+        # Map of (caller, callee) symbol IDs to [calls, incl, incl_time]
+        self.edges = {}
+        # Active activations per symbol ID, for recursion
+        self._active = []
+        # Per-thread shadow stack of (symid, caller, n_exec, time)
+        self._shadow = {}
+        self._thread_id = {}
+
+        self.time_units = time_units
+        self._time_f = None
+        if time_units is not None:
+            if time_f is None:
+                try:
+                    from cocotb.utils import get_sim_time
+                except ImportError:
+                    raise Exception("Profiling simulation time requires cocotb")
+                time_f = lambda: get_sim_time(time_units)
+            self._time_f = time_f
+
+        self._cur = -1
+        self._last_n = 0
+        self._last_t = 0
+        self.attached = False
+
+    def attach(self):
+        """Starts profiling. Has no effect if already attached"""
+        if self.attached:
+            return
+        bfm = self.bfm
+        self._last_n = bfm.n_exec
+        if self._time_f is not None:
+            self._last_t = self._time_f()
+        self._cur = self._top_id()
+        bfm.add_on_entry_cb(self._on_entry)
+        bfm.add_on_exit_cb(self._on_exit)
+        bfm.add_on_excp_cb(self._on_switch)
+        bfm.add_on_eret_cb(self._on_switch)
+        bfm.add_on_thread_switch_cb(self._on_thread_switch)
+        bfm.require_full_exec(True)
+        self.attached = True
+
+    def detach(self):
+        """Stops profiling. Counts are retained"""
+        if not self.attached:
+            return
+        self._charge(self.bfm.n_exec+1)
+        bfm = self.bfm
+        bfm.del_on_entry_cb(self._on_entry)
+        bfm.del_on_exit_cb(self._on_exit)
+        bfm.del_on_excp_cb(self._on_switch)
+        bfm.del_on_eret_cb(self._on_switch)
+        bfm.del_on_thread_switch_cb(self._on_thread_switch)
+        bfm.require_full_exec(False)
+        self.attached = False
+
+    def flush(self):
+        """Charges instructions executed since the last event"""
+        if self.attached:
+            self._charge(self.bfm.n_exec+1)
+
+    def _grow(self, symid):
+        n = symid+1-len(self.calls)
+        self.calls.extend([0]*n)
+        self.excl.extend([0]*n)
+        self.incl.extend([0]*n)
+        self._active.extend([0]*n)
+        if self._time_f is not None:
+            self.excl_time.extend([0]*n)
+            self.incl_time.extend([0]*n)
+
+    def _frame_id(self, t, idx) -> int:
+        """Returns the ID that frame idx of thread t is charged to"""
+        if idx > 0:
+            return t.callstack.symids[idx]
+        ret = self._thread_id.get(t)
+        if ret is None:
+            ret = self.bfm.symtab.intern(t.name)
+            self._thread_id[t] = ret
+        return ret
+
+    def _top_id(self) -> int:
+        t = self.bfm.active_thread
+        return self._frame_id(t, len(t.callstack)-1)
+
+    def _charge(self, n_exec):
+        """Charges instructions before the current one (n_exec) to the
+        running function"""
+        cur = self._cur
+        if cur >= len(self.calls):
+            self._grow(cur)
+        n_exec -= 1
+        self.excl[cur] += n_exec - self._last_n
+        self._last_n = n_exec
+        if self._time_f is not None:
+            now = self._time_f()
+            self.excl_time[cur] += now - self._last_t
+            self._last_t = now
+
+    def _on_entry(self, addr):
+        bfm = self.bfm
+        self._charge(bfm.n_exec)
+
+        t = bfm.active_thread
+        depth = len(t.callstack)-1
+        callee = t.callstack.symids[depth]
+        caller = self._frame_id(t, depth-1)
+        if callee >= len(self.calls):
+            self._grow(callee)
+        self.calls[callee] += 1
+        self._active[callee] += 1
+
+        shadow = self._shadow.get(t)
+        if shadow is None:
+            shadow = []
+            self._shadow[t] = shadow
+        shadow.append((callee, caller, self._last_n, self._last_t))
+        self._cur = callee
+
+    def _on_exit(self, addr):
+        bfm = self.bfm
+        self._charge(bfm.n_exec)
+        self._cur = self._top_id()
+
+        shadow = self._shadow.get(bfm.active_thread)
+        if not shadow:
+            # Entered before profiling started
+            return
+        callee, caller, start_n, start_t = shadow.pop()
+        incl = self._last_n - start_n
+        incl_t = self._last_t - start_t
+
+        self._active[callee] -= 1
+        if self._active[callee] == 0:
+            self.incl[callee] += incl
+            if self._time_f is not None:
+                self.incl_time[callee] += incl_t
+
+        edge = self.edges.get((caller, callee))
+        if edge is None:
+            self.edges[(caller, callee)] = [1, incl, incl_t]
+        else:
+            edge[0] += 1
+            edge[1] += incl
+            edge[2] += incl_t
+
+    def _on_switch(self, addr):
+        self._charge(self.bfm.n_exec)
+        self._cur = self._top_id()
+
+        # Exception contexts are reused with their frames discarded, so
+        # drop any activations the context no longer holds
+        t = self.bfm.active_thread
+        shadow = self._shadow.get(t)
+        if shadow and len(shadow) >= len(t.callstack):
+            for e in shadow[len(t.callstack)-1:]:
+                self._active[e[0]] -= 1
+            del shadow[len(t.callstack)-1:]
+
+    def _on_thread_switch(self, t):
+        # In exception context, the switch takes effect on return from
+        # the exception. Otherwise, the current instruction ran on the
+        # previous thread
+        if t is self.bfm.active_thread:
+            self._charge(self.bfm.n_exec+1)
+            self._cur = self._top_id()
+
+    def total(self) -> int:
+        """Returns the number of instructions profiled"""
+        self.flush()
+        return sum(self.excl)
+
+    def report(self, limit=None) -> str:
+        """Returns a text report of functions, sorted by exclusive
+        instruction count"""
+        self.flush()
+        total = max(sum(self.excl), 1)
+        ids = sorted(
+            (i for i in range(len(self.calls)) if self.excl[i] or self.calls[i]),
+            key=lambda i: -self.excl[i])
+        if limit is not None:
+            ids = ids[:limit]
+
+        names = self.bfm.symtab.names
+        lines = ["%6s %10s %12s %12s  %s" % ("%Excl", "Calls", "Exclusive", "Inclusive", "Function")]
+        for i in ids:
+            line = "%6.2f %10d %12d %12d  %s" % (
+                100.0*self.excl[i]/total, self.calls[i], self.excl[i],
+                self.incl[i], names[i])
+            if self._time_f is not None:
+                line += " (%d%s excl, %d%s incl)" % (
+                    self.excl_time[i], self.time_units,
+                    self.incl_time[i], self.time_units)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write_callgrind(self, fp, cmd="firmware"):
+        """Writes the profile in callgrind format, for viewing with
+        kcachegrind or summarizing with callgrind_annotate"""
+        self.flush()
+        timed = self._time_f is not None
+
+        fp.write("# callgrind format\n")
+        fp.write("version: 1\n")
+        fp.write("creator: core_debug_common\n")
+        fp.write("cmd: %s\n" % cmd)
+        fp.write("positions: line\n")
+        fp.write("events: Ir%s\n" % (" Time" if timed else ""))
+        fp.write("summary: %d%s\n\n" % (
+            sum(self.excl), (" %d" % sum(self.excl_time)) if timed else ""))
+
+        names = self.bfm.symtab.names
+        callees = {}
+        for (caller, callee), edge in self.edges.items():
+            callees.setdefault(caller, []).append((callee, edge))
+
+        for i in range(len(self.calls)):
+            if not (self.excl[i] or self.calls[i] or i in callees):
+                continue
+            fp.write("fn=%s\n" % names[i])
+            if timed:
+                fp.write("0 %d %d\n" % (self.excl[i], self.excl_time[i]))
+            else:
+                fp.write("0 %d\n" % self.excl[i])
+            for callee, edge in callees.get(i, ()):
+                fp.write("cfn=%s\n" % names[callee])
+                fp.write("calls=%d 0\n" % edge[0])
+                if timed:
+                    fp.write("0 %d %d\n" % (edge[1], edge[2]))
+                else:
+                    fp.write("0 %d\n" % edge[1])
+            fp.write("\n")
+
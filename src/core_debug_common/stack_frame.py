@@ -4,12 +4,45 @@ Created on Mar 25, 2021
 @author: mballance
 '''
 
+class SymTable(object):
+    """Symbol-name intern table. Frames hold an index into names rather
+    than a string. Each BfmBase has its own table, shared by the call
+    stacks of its threads, so names are released with the BFM"""
+
+    __slots__ = ("names", "ids")
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name) -> int:
+        """Returns the ID of a symbol name, adding it if required"""
+        ret = self.ids.get(name)
+        if ret is None:
+            ret = len(self.names)
+            self.names.append(name)
+            self.ids[name] = ret
+        return ret
+
+    def __len__(self):
+        return len(self.names)
+
 class StackFrame(object):
-    
-    def __init__(self, addr, sym, is_func=True):
+
+    __slots__ = ("addr", "retaddr", "symid", "is_func", "symtab")
+
+    def __init__(self, addr, sym, is_func=True, symtab=None):
         self.addr = addr
         self.retaddr = -1
-        self.sym = sym
+        self.symtab = symtab if symtab is not None else SymTable()
+        self.symid = sym if isinstance(sym, int) else self.symtab.intern(sym)
         self.is_func = is_func
-        
-        
\ No newline at end of file
+
+    @property
+    def sym(self) -> str:
+        return self.symtab.names[self.symid]
+
+    @sym.setter
+    def sym(self, sym):
+        self.symid = self.symtab.intern(sym)
+
@@ -3,14 +3,20 @@ Created on Mar 25, 2021
 
 @author: mballance
 '''
-from core_debug_common.stack_frame import StackFrame
-from typing import List
+from core_debug_common.call_stack import CallStack
 
 class ThreadInfo(object):
     """Holds data about the state of a thread"""
     
-    def __init__(self, tid):
+    __slots__ = ("tid", "name", "stack_base", "callstack", "pending_ev", 
+                 "pending_retaddr")
+    
+    def __init__(self, tid, name=None):
         self.tid = tid
+        self.name = name if name is not None else str(tid)
         self.stack_base = -1
-        self.callstack : List[StackFrame] = []
+        self.callstack = CallStack()
+        # Call/Ret event that coincided with an exception, and is 
+        # replayed on return from the exception
         self.pending_ev = 0
+        self.pending_retaddr = -1
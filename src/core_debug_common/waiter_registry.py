@@ -0,0 +1,111 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import pybfms
+
+
+class WaiterRegistry(object):
+    """Tracks coroutines waiting for an event at one of a set of addresses.
+    
+    Waiters are indexed by address, so notifying an event is a single
+    dictionary lookup regardless of how many coroutines are waiting.
+    """
+    
+    class Waiter(object):
+        
+        def __init__(self, addrs, resolve=None):
+            self.addrs = addrs
+            # Optional callable that recomputes addrs. See refresh()
+            self.resolve = resolve
+            self.ev = pybfms.event()
+            # Address that released the waiter
+            self.hit = None
+    
+    def __init__(self, on_change=None):
+        # Map of address to list of waiters
+        self.waiters = {}
+        # Waiters whose addresses are recomputed by refresh()
+        self.resolved = []
+        # Called when the set of addresses being waited on changes
+        self.on_change = on_change
+        
+    def add(self, addrs, resolve=None) -> 'WaiterRegistry.Waiter':
+        w = WaiterRegistry.Waiter(addrs, resolve)
+        if resolve is not None:
+            self.resolved.append(w)
+        if self._index(w) and self.on_change is not None:
+            self.on_change()
+        return w
+    
+    def remove(self, w : 'WaiterRegistry.Waiter'):
+        if w.resolve is not None and w in self.resolved:
+            self.resolved.remove(w)
+        if self._unindex(w) and self.on_change is not None:
+            self.on_change()
+            
+    def refresh(self) -> bool:
+        """Recomputes the addresses of waiters added with a resolve
+        function, eg after symbols change. Returns True if the set of
+        addresses being waited on changed"""
+        changed = False
+        for w in self.resolved:
+            addrs = w.resolve()
+            if addrs != w.addrs:
+                changed |= self._unindex(w)
+                w.addrs = addrs
+                changed |= self._index(w)
+        if changed and self.on_change is not None:
+            self.on_change()
+        return changed
+    
+    def _index(self, w) -> bool:
+        changed = False
+        for addr in w.addrs:
+            wl = self.waiters.get(addr)
+            if wl is None:
+                self.waiters[addr] = [w]
+                changed = True
+            else:
+                wl.append(w)
+        return changed
+    
+    def _unindex(self, w) -> bool:
+        changed = False
+        for addr in w.addrs:
+            wl = self.waiters.get(addr)
+            if wl is not None and w in wl:
+                wl.remove(w)
+                if len(wl) == 0:
+                    self.waiters.pop(addr)
+                    changed = True
+        return changed
+    
+    def notify(self, addr):
+        """Releases all waiters for addr"""
+        wl = self.waiters.get(addr)
+        if wl is not None:
+            for w in wl.copy():
+                self.remove(w)
+                w.hit = addr
+                w.ev.set(addr)
+                
+    async def wait(self, addrs, timeout=None, units=None, resolve=None):
+        """Waits for an event at one of the addresses. Returns the address 
+        hit, or None if the timeout elapses first. The waiter is removed
+        if the calling coroutine is killed while waiting"""
+        w = self.add(addrs, resolve)
+        
+        try:
+            if timeout is None:
+                await w.ev.wait()
+            else:
+                from cocotb.triggers import First
+                await First(w.ev.wait(), pybfms.delay(timeout, units))
+        finally:
+            if w.hit is None:
+                self.remove(w)
+        
+        return w.hit
+    
@@ -0,0 +1,71 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+
+Measures the cost of call/return processing in BfmBase.execute_batch(),
+for calls to named functions and to unknown addresses, with recursion 
+up to a configurable depth. Also reports the memory held per 
+call-stack frame
+'''
+import gc
+import timeit
+import tracemalloc
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+
+
+def make_trace(n, depth, target):
+    """Returns a trace of n call/return pairs, recursing to depth"""
+    addrs = []
+    retaddrs = []
+    evs = []
+    while len(addrs) < 2*n:
+        for d in range(depth):
+            addrs.append(target(d))
+            retaddrs.append(0x8000 + 4*d)
+            evs.append(int(ExecEvent.Call))
+        for d in reversed(range(depth)):
+            addrs.append(0x8000 + 4*d)
+            retaddrs.append(0)
+            evs.append(int(ExecEvent.Ret))
+    return addrs, retaddrs, [0]*len(addrs), evs
+
+def make_bfm():
+    bfm = BfmBase()
+    for i in range(64):
+        bfm.addr2sym_m[0x1000 + 0x100*i] = "f%d" % i
+    return bfm
+
+def bench(target, depth, n=2000):
+    bfm = make_bfm()
+    addrs, retaddrs, instrs, evs = make_trace(n, depth, target)
+    
+    def run():
+        bfm.execute_batch(addrs, retaddrs, instrs, evs)
+    gc.collect()
+    t = min(timeit.repeat(run, number=1, repeat=200))
+    return 1e9*t/(len(addrs)/2)
+
+def frame_bytes(target, depth=10000):
+    """Returns the memory held per frame of a deep call stack"""
+    bfm = make_bfm()
+    addrs, retaddrs, instrs, evs = make_trace(depth, depth, target)
+    gc.collect()
+    tracemalloc.start()
+    bfm.execute_batch(addrs[:depth], retaddrs[:depth], instrs[:depth], evs[:depth])
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size/depth
+
+def main():
+    targets = (
+        ("named", lambda d: 0x1000 + 0x100*(d%64)),
+        ("unknown", lambda d: 0x100000 + 0x100*(d%64)))
+    for name, target in targets:
+        for depth in (1, 100):
+            print("%-8s depth %3d: %.1f ns/call+ret" % (name, depth, bench(target, depth)))
+        print("%-8s %.1f bytes/frame" % (name, frame_bytes(target)))
+
+if __name__ == "__main__":
+    main()
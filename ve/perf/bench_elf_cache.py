@@ -0,0 +1,50 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+
+Measures BfmBase.load_elf() startup time for a large image, parsing
+with pyelftools versus loading from a warm ElfCache
+'''
+import os
+import sys
+import tempfile
+import timeit
+
+from core_debug_common.bfm_base import BfmBase
+from core_debug_common.elf_cache import ElfCache
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "unit"))
+from testing_elf_builder import TestingElfBuilder
+
+
+def build_elf(path, n_syms, text_sz):
+    elf = TestingElfBuilder()
+    elf.add_text(".text", 0x10000, bytes(text_sz))
+    elf.add_bss(".bss", 0x10000+text_sz, 0x100000)
+    for i in range(n_syms):
+        elf.add_symbol("func_%d" % i, 0x10000 + 16*(i % (text_sz//16)), 16)
+    elf.write(path)
+
+def bench(path, setup="pass", **kwargs):
+    def run():
+        BfmBase().load_elf(path, **kwargs)
+    return min(timeit.repeat(run, setup=setup, number=1, repeat=3))
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "big.elf")
+        for n_syms in (10000, 50000):
+            build_elf(path, n_syms, 4*1024*1024)
+            cache = ElfCache(os.path.join(d, "cache"))
+            cache.invalidate()
+
+            t_parse = bench(path, use_segments=True)
+            t_cold = bench(path, setup=cache.invalidate, cache=cache)
+            t_warm = bench(path, cache=cache)
+            t_verify = bench(path, cache=ElfCache(cache.cache_dir, verify_hash=True))
+            print("%d symbols: parse %.1f ms ; cold cache %.1f ms ; warm %.1f ms ; warm+verify %.1f ms" % (
+                n_syms, 1e3*t_parse, 1e3*t_cold, 1e3*t_warm, 1e3*t_verify))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+
+Measures the per-instruction cost of BfmBase.execute() and
+execute_batch() with 0, 1 and 10 exec/entry subscribers
+'''
+import timeit
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+
+
+def make_trace(n):
+    """Returns a trace with a call/return pair every 64 instructions.
+    Event bits are plain ints, as delivered by the HDL side"""
+    addrs = []
+    retaddrs = []
+    evs = []
+    pc = 0x1000
+    for i in range(n):
+        if i % 64 == 0:
+            addrs.append(0x2000)
+            retaddrs.append(pc+4)
+            evs.append(int(ExecEvent.Call))
+        elif i % 64 == 32:
+            addrs.append(pc+4)
+            retaddrs.append(0)
+            evs.append(int(ExecEvent.Ret))
+            pc += 4
+        else:
+            addrs.append(0x2000 + 4*(i%64))
+            retaddrs.append(0)
+            evs.append(0)
+    return addrs, retaddrs, [0]*n, evs
+
+def bench(n_subscribers, batch, n=100000):
+    bfm = BfmBase()
+    for _ in range(n_subscribers):
+        bfm.add_on_exec_cb(lambda pc, instr: None)
+        bfm.add_on_entry_cb(lambda pc: None)
+        bfm.add_on_exit_cb(lambda pc: None)
+    addrs, retaddrs, instrs, evs = make_trace(n)
+    
+    if batch:
+        def run():
+            bfm.execute_batch(addrs, retaddrs, instrs, evs)
+    else:
+        def run():
+            execute = bfm.execute
+            for i in range(n):
+                execute(addrs[i], retaddrs[i], instrs[i], evs[i])
+            
+    t = min(timeit.repeat(run, number=1, repeat=5))
+    return 1e9*t/n
+
+def main():
+    for n_subscribers in (0, 1, 10):
+        print("%2d subscribers: execute %.1f ns/instr ; execute_batch %.1f ns/instr" % (
+            n_subscribers, bench(n_subscribers, False), bench(n_subscribers, True)))
+
+if __name__ == "__main__":
+    main()
+    
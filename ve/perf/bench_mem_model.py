@@ -0,0 +1,83 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+
+Micro-benchmark for MemModel page lookup. Compares the original
+256-way tree walk against the flat page table
+'''
+import timeit
+
+from core_debug_common.mem_model import MemModel
+
+
+class TreeMemModel(MemModel):
+    """Reference model using the original tree-walk page lookup"""
+    
+    class TreeNode(object):
+        
+        def __init__(self):
+            self.nodes = [None]*256
+    
+    def __init__(self, addr_width=32, data_width=32, little_endian=True):
+        super().__init__(addr_width, data_width, little_endian)
+        self.root = TreeMemModel.TreeNode()
+        
+    def _getpage(self, addr) -> 'MemModel.Page':
+        node = self.root
+        b = self.addr_width - 8
+        
+        while b > 16:
+            ab = (addr >> b) & 0xFF
+            if node.nodes[ab] is None:
+                if b > 24:
+                    node.nodes[ab] = TreeMemModel.TreeNode()
+                else:
+                    node.nodes[ab] = MemModel.Page()
+                    self.n_pages += 1
+            node = node.nodes[ab]
+            b -= 8
+
+        return node
+
+def bench(mm_t, addr_width, alternate, n=200000):
+    mm = mm_t(addr_width)
+    
+    stack = (1 << (addr_width-1)) - 0x1000
+    data = 0x20000000
+    addrs = []
+    for i in range(n):
+        if alternate:
+            # Accesses alternating between a stack and a data region
+            if i & 1:
+                addrs.append(stack - 4*(i & 0xFF))
+            else:
+                addrs.append(data + 4*(i & 0xFFF))
+        else:
+            # Runs of accesses within a region
+            if i & 0x100:
+                addrs.append(stack - 4*(i & 0xFF))
+            else:
+                addrs.append(data + 4*(i & 0xFF))
+
+    def run():
+        rd = mm.read8
+        for a in addrs:
+            rd(a)
+
+    t = min(timeit.repeat(run, number=1, repeat=5))
+    return 1e9*t/n
+    
+def main():
+    for aw in (32, 64):
+        for alternate in (False, True):
+            t_tree = bench(TreeMemModel, aw, alternate)
+            t_flat = bench(MemModel, aw, alternate)
+            print("addr_width=%d %-11s: tree %.1f ns/access ; flat %.1f ns/access (%.2fx)" % (
+                aw, 
+                "alternating" if alternate else "clustered",
+                t_tree, t_flat, t_tree/t_flat))
+
+if __name__ == "__main__":
+    main()
+    
@@ -0,0 +1,64 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+
+Measures the cost of profiling in BfmBase.execute_batch(). Reports the
+time per instruction, with and without a Profiler attached, for traces
+with a call or return every N instructions
+'''
+import gc
+import timeit
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+from core_debug_common.profiler import Profiler
+
+
+def make_trace(n, run_len):
+    """Returns a trace of n instructions, with a call or return at
+    the start of each run of run_len instructions"""
+    addrs = []
+    retaddrs = []
+    evs = []
+    depth = 0
+    while len(addrs) < n:
+        if depth < 4:
+            addrs.append(0x1000 + 0x100*depth)
+            retaddrs.append(0x8000 + 4*depth)
+            evs.append(int(ExecEvent.Call))
+            depth += 1
+        else:
+            depth = 0
+            addrs.append(0x8000)
+            retaddrs.append(0)
+            evs.append(int(ExecEvent.Ret))
+        for i in range(1, run_len):
+            addrs.append(addrs[-1] + 4)
+            retaddrs.append(0)
+            evs.append(0)
+    return addrs, retaddrs, [0]*len(addrs), evs
+
+def bench(run_len, profile, n=20000):
+    bfm = BfmBase()
+    for i in range(4):
+        bfm.addr2sym_m[0x1000 + 0x100*i] = "f%d" % i
+    if profile:
+        Profiler(bfm).attach()
+    addrs, retaddrs, instrs, evs = make_trace(n, run_len)
+
+    def run():
+        bfm.execute_batch(addrs, retaddrs, instrs, evs)
+    gc.collect()
+    t = min(timeit.repeat(run, number=1, repeat=20))
+    return 1e9*t/len(addrs)
+
+def main():
+    for run_len in (1, 10, 100):
+        base = bench(run_len, False)
+        prof = bench(run_len, True)
+        print("event every %3d instrs: %.1f ns/instr ; profiled %.1f ns/instr" % (
+            run_len, base, prof))
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,49 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from unittest.case import TestCase
+
+from core_debug_common.addr_range_index import AddrRangeIndex
+
+
+class TestAddrRangeIndex(TestCase):
+    
+    def test_smoke(self):
+        idx = AddrRangeIndex()
+        
+        def f1(): pass
+        def f2(): pass
+        
+        self.assertEqual(idx.find(0x1000, 4), ())
+        
+        idx.add(0x1000, 0x1010, f1)
+        idx.add(0x100C, 0x2000, f2)
+        
+        self.assertEqual(idx.find(0x0FFC, 4), ())
+        self.assertEqual(idx.find(0x0FFC, 8), (f1,))
+        self.assertEqual(idx.find(0x1000, 4), (f1,))
+        self.assertEqual(idx.find(0x100C, 4), (f1, f2))
+        self.assertEqual(idx.find(0x1010, 4), (f2,))
+        self.assertEqual(idx.find(0x1FFC, 4), (f2,))
+        self.assertEqual(idx.find(0x2000, 4), ())
+        self.assertEqual(idx.find(0xFFFFFFF0, 4), ())
+        
+        idx.remove(f1)
+        self.assertFalse(idx.has(f1))
+        self.assertEqual(idx.find(0x100C, 4), (f2,))
+        self.assertRaises(ValueError, idx.remove, f1)
+        
+    def test_multi_range(self):
+        idx = AddrRangeIndex()
+        
+        def f1(): pass
+        
+        idx.add(0x1000, 0x1004, f1)
+        idx.add(0x1008, 0x100C, f1)
+        
+        self.assertEqual(idx.find(0x1000, 12), (f1,))
+        self.assertEqual(idx.find(0x1004, 4), ())
+        self.assertEqual(idx.find(0x1008, 4), (f1,))
+        
@@ -0,0 +1,670 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import os
+import re
+import tempfile
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+from core_debug_common.event_stream import EventKind, Backpressure
+from core_debug_common_test_case import CoreDebugCommonTestCase
+from testing_elf_builder import TestingElfBuilder
+
+
+class TestBfmBase(CoreDebugCommonTestCase):
+    
+    def test_memwrite_addr_range(self):
+        bfm = BfmBase()
+        
+        all_w = []
+        uart_w = []
+        buf_w = []
+        bfm.add_memwrite_cb(lambda ia, wa, wd, wm: all_w.append(wa))
+        
+        def uart_cb(iaddr, waddr, wdata, wmask):
+            uart_w.append(waddr)
+        bfm.add_memwrite_cb(uart_cb, addr_range=(0x40000000, 0x40000010))
+        bfm.add_memwrite_cb(
+            lambda ia, wa, wd, wm: buf_w.append(wa), 
+            addr_range=[range(0x20000000, 0x20000100), (0x40000008, 0x4000000C)])
+        
+        for addr in (0x40000000, 0x40000008, 0x40000010, 0x20000000, 0x200000FC, 0x20000100):
+            bfm.memwrite(0, addr, 0x12345678, 0xF)
+            
+        self.assertEqual(len(all_w), 6)
+        self.assertEqual(uart_w, [0x40000000, 0x40000008])
+        self.assertEqual(buf_w, [0x40000008, 0x20000000, 0x200000FC])
+        self.assertEqual(bfm.mm.read32(0x20000100), 0x12345678)
+        
+        bfm.del_memwrite_cb(uart_cb)
+        bfm.memwrite(0, 0x40000000, 0, 0xF)
+        self.assertEqual(uart_w, [0x40000000, 0x40000008])
+        
+    def test_addr_range_args(self):
+        bfm = BfmBase()
+        
+        writes = []
+        def write_cb(iaddr, waddr, wdata, wmask):
+            writes.append(waddr)
+        
+        # A tuple of ranges is accepted like a list
+        bfm.add_memwrite_cb(write_cb, addr_range=((0x0, 0x4), (0x8, 0xC)))
+        for addr in (0x0, 0x4, 0x8):
+            bfm.memwrite(0, addr, 0, 0xF)
+        self.assertEqual(writes, [0x0, 0x8])
+        bfm.del_memwrite_cb(write_cb)
+        
+        # An invalid range registers nothing
+        for addr_range in ([(0x0, 0x4), (0x8, 0x8)], [range(0, 4), (0x10, 0x8)], [(0, 4, 8)]):
+            with self.assertRaises(Exception):
+                bfm.add_memwrite_cb(write_cb, addr_range=addr_range)
+            with self.assertRaises(Exception):
+                bfm.add_memread_cb(write_cb, addr_range=addr_range)
+        self.assertEqual(bfm.memwrite_idx.ranges, [])
+        self.assertEqual(bfm.memread_idx.ranges, [])
+        
+    def test_memread_addr_range(self):
+        bfm = BfmBase()
+        
+        reads = []
+        def read_cb(iaddr, raddr, rdata, rmask):
+            reads.append((raddr, rdata))
+        bfm.add_memread_cb(read_cb, addr_range=(0x1000, 0x1004))
+
+        bfm.memread(0, 0x0FFC, 1, 0xF)
+        bfm.memread(0, 0x1000, 2, 0xF)
+        bfm.memread(0, 0x1004, 3, 0xF)
+        self.assertEqual(reads, [(0x1000, 2)])
+        
+        bfm.del_memread_cb(read_cb)
+        bfm.memread(0, 0x1000, 2, 0xF)
+        self.assertEqual(len(reads), 1)
+        
+    def test_memwrite_batch(self):
+        bfm = BfmBase()
+        
+        writes = []
+        ranged = []
+        batches = []
+        bfm.add_memwrite_cb(lambda ia, wa, wd, wm: writes.append((wa, wd, wm)))
+        bfm.add_memwrite_cb(
+            lambda ia, wa, wd, wm: ranged.append(wa), 
+            addr_range=(0x1004, 0x1008))
+        
+        def batch_cb(iaddrs, waddrs, wdatas, wmasks):
+            batches.append(list(waddrs))
+        bfm.add_memwrite_cb(batch_cb, batch=True)
+        
+        bfm.memwrite_batch(
+            [0x100, 0x104, 0x108],
+            [0x1000, 0x1004, 0x1008],
+            [1, 2, 3],
+            [0xF, 0x3, 0xF])
+        bfm.memwrite_batch([0x10C], [0x100C], [4])
+        bfm.memwrite(0x110, 0x1010, 5, 0xF)
+        
+        self.assertEqual(writes, [
+            (0x1000, 1, 0xF), (0x1004, 2, 0x3), (0x1008, 3, 0xF), 
+            (0x100C, 4, 0xF), (0x1010, 5, 0xF)])
+        self.assertEqual(ranged, [0x1004])
+        self.assertEqual(batches, [[0x1000, 0x1004, 0x1008], [0x100C], [0x1010]])
+        self.assertEqual(bfm.mm.read(0x1000, 20), 
+                         bytes([1,0,0,0, 2,0,0,0, 3,0,0,0, 4,0,0,0, 5,0,0,0]))
+
+        bfm.del_memwrite_cb(batch_cb)
+        bfm.memwrite_batch([0x114], [0x1014], [6])
+        self.assertEqual(len(batches), 3)
+        
+    def test_memwrite_batch_ranged_cb(self):
+        bfm = BfmBase()
+        self.assertRaises(Exception, bfm.add_memwrite_cb, 
+                          lambda *args: None, addr_range=(0, 4), batch=True)
+        
+    def test_execute_batch(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m[0x100] = "main"
+        bfm.addr2sym_m[0x200] = "func"
+        
+        trace = []
+        bfm.add_on_entry_cb(lambda pc: trace.append(("entry", pc)))
+        bfm.add_on_exit_cb(lambda pc: trace.append(("exit", pc)))
+        
+        # Register an exec callback part-way through the batch
+        def exec_cb(pc, instr):
+            trace.append(("exec", pc))
+        def func_entry(pc):
+            if pc == 0x200:
+                bfm.add_on_exec_cb(exec_cb)
+        bfm.add_on_entry_cb(func_entry)
+        
+        addrs    = [0x100,          0x104, 0x108, 0x200,          0x204, 0x10C,         0x110]
+        retaddrs = [0x000,          0x000, 0x000, 0x10C,          0x000, 0x000,         0x000]
+        evs      = [ExecEvent.Call, 0,     0,     ExecEvent.Call, 0,     ExecEvent.Ret, 0]
+        bfm.execute_batch(addrs, retaddrs, [0]*len(addrs), evs)
+        
+        self.assertEqual(trace, [
+            ("entry", 0x100), 
+            ("entry", 0x200),
+            ("exec", 0x204),
+            ("exec", 0x10C),
+            ("exit", 0x200),
+            ("exec", 0x110)])
+        self.assertEqual(
+            [f.sym for f in bfm.active_thread.callstack], 
+            ["<initial>", "main"])
+        
+    def test_sym_entry_exit_cb(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {0x100 : "main", 0x200 : "f1", 0x300 : "f2"}
+        bfm.sym2addr_m = {"main" : 0x100, "f1" : 0x200, "f2" : 0x300}
+        
+        trace = []
+        def f1_entry(pc):
+            trace.append(("f1_entry", pc))
+        def f1_exit(pc):
+            trace.append(("f1_exit", pc))
+        def f12_entry(pc):
+            trace.append(("f12_entry", pc))
+        bfm.add_on_entry_cb(f1_entry, sym="f1")
+        bfm.add_on_exit_cb(f1_exit, sym=0x200)
+        bfm.add_on_entry_cb(f12_entry, sym=["f1", "f2"])
+        self.assertRaises(Exception, bfm.add_on_entry_cb, f1_entry, sym="f3")
+        
+        bfm.execute(0x100, 0, 0, ExecEvent.Call)
+        bfm.execute(0x200, 0x104, 0, ExecEvent.Call)
+        bfm.execute(0x104, 0, 0, ExecEvent.Ret)
+        bfm.execute(0x300, 0x108, 0, ExecEvent.Call)
+        bfm.execute(0x108, 0, 0, ExecEvent.Ret)
+        
+        self.assertEqual(trace, [
+            ("f1_entry", 0x200), 
+            ("f12_entry", 0x200), 
+            ("f1_exit", 0x200),
+            ("f12_entry", 0x300)])
+        
+        bfm.del_on_entry_cb(f12_entry)
+        bfm.del_on_exit_cb(f1_exit)
+        self.assertEqual(bfm.on_sym_entry_cb, {0x200 : (f1_entry,)})
+        self.assertEqual(bfm.on_sym_exit_cb, {})
+        self.assertRaises(ValueError, bfm.del_on_exit_cb, f1_exit)
+        
+    def test_on_entry_waiters(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {0x100 : "main", 0x200 : "f1"}
+        bfm.sym2addr_m = {"main" : 0x100, "f1" : 0x200}
+        
+        co_entry = bfm.on_entry("f1")
+        co_exit = bfm.on_exit(["f1", "main"])
+        co_exec = bfm.on_exec(0x204)
+        for co in (co_entry, co_exit, co_exec):
+            co.send(None)
+        
+        bfm.execute_batch(
+            [0x100, 0x200, 0x204, 0x104],
+            [0x000, 0x104, 0x000, 0x000],
+            [0, 0, 0, 0],
+            [ExecEvent.Call, ExecEvent.Call, 0, ExecEvent.Ret])
+        
+        for co, addr in ((co_entry, 0x200), (co_exit, 0x200), (co_exec, 0x204)):
+            with self.assertRaises(StopIteration) as cm:
+                co.send(None)
+            self.assertEqual(cm.exception.value, addr)
+        
+        self.assertEqual(bfm.entry_waiters.waiters, {})
+        self.assertEqual(bfm.exit_waiters.waiters, {})
+        self.assertEqual(bfm.exec_waiters.waiters, {})
+        
+    def test_pc_filter(self):
+        class FilterBfm(BfmBase):
+            def __init__(self):
+                super().__init__()
+                self.filters = []
+            def pc_filter_changed(self, ranges):
+                self.filters.append(ranges)
+                
+        bfm = FilterBfm()
+        bfm.sym2addr_m = {"main" : 0x100, "f1" : 0x200}
+        bfm.enable_pc_filter()
+        
+        def entry_cb(pc):
+            pass
+        bfm.add_on_entry_cb(entry_cb, sym="f1")
+        
+        co = bfm.on_exec([0x104, 0x108, 0x100])
+        co.send(None)
+        self.assertEqual(bfm.pc_filter(), [(0x100, 0x101), (0x104, 0x105), (0x108, 0x109), (0x200, 0x201)])
+        
+        # Global exec callbacks require every instruction
+        def exec_cb(pc, instr):
+            pass
+        bfm.add_on_exec_cb(exec_cb)
+        self.assertIsNone(bfm.pc_filter())
+        bfm.del_on_exec_cb(exec_cb)
+        
+        bfm.execute(0x104, 0, 0, 0)
+        self.assertRaises(StopIteration, co.send, None)
+        
+        bfm.del_on_entry_cb(entry_cb)
+
+        self.assertEqual(bfm.filters, [
+            [],
+            [(0x200, 0x201)],
+            [(0x100, 0x101), (0x104, 0x105), (0x108, 0x109), (0x200, 0x201)],
+            None,
+            [(0x100, 0x101), (0x104, 0x105), (0x108, 0x109), (0x200, 0x201)],
+            [(0x200, 0x201)],
+            []])
+        
+    def _anext(self, stream):
+        """Returns the next stream event, or None if the consumer would block"""
+        co = stream.__anext__()
+        try:
+            co.send(None)
+        except StopIteration as e:
+            return e.value
+        co.close()
+        return None
+        
+    def test_event_stream(self):
+        bfm = BfmBase()
+        bfm.sym2addr_m = {"main" : 0x100, "f1" : 0x200}
+        
+        with bfm.events(kinds=EventKind.Entry|EventKind.Exit|EventKind.Exec, addrs="f1") as s:
+            self.assertIsNone(self._anext(s))
+            
+            bfm.execute(0x100, 0, 0, ExecEvent.Call)
+            bfm.execute(0x200, 0x104, 0, ExecEvent.Call)
+            bfm.execute(0x204, 0, 0, 0)
+            bfm.execute(0x104, 0, 0, ExecEvent.Ret)
+            
+            self.assertEqual(self._anext(s), (EventKind.Exec, 0x200, 0))
+            self.assertEqual(self._anext(s), (EventKind.Entry, 0x200, None))
+            self.assertEqual(self._anext(s), (EventKind.Exit, 0x200, None))
+            self.assertIsNone(self._anext(s))
+            
+        # Closing the stream unsubscribes
+        self.assertEqual(bfm.on_sym_exec_cb, {})
+        self.assertEqual(bfm.on_sym_entry_cb, {})
+        self.assertTrue(bfm._exec_idle)
+        with self.assertRaises(StopAsyncIteration):
+            s.__anext__().send(None)
+            
+    def test_empty_addrs(self):
+        bfm = BfmBase()
+        f = lambda pc: None
+        
+        # An empty address set is rejected rather than registering nothing
+        with self.assertRaises(Exception):
+            bfm.add_on_entry_cb(f, sym=[])
+        with self.assertRaises(Exception):
+            bfm.events(addrs=[])
+        self.assertEqual(bfm.on_sym_entry_cb, {})
+        self.assertEqual(bfm.on_sym_exit_cb, {})
+        
+        # A pattern may match nothing, and can still be deleted
+        bfm.add_on_entry_cb(f, sym=["nomatch_*"])
+        bfm.del_on_entry_cb(f)
+        
+    def test_event_stream_drop_oldest(self):
+        bfm = BfmBase()
+        
+        s = bfm.events(kinds=EventKind.Entry, maxlen=2)
+        for addr in (0x100, 0x200, 0x300):
+            bfm.execute(addr, addr+4, 0, ExecEvent.Call)
+            
+        self.assertEqual(s.dropped, 1)
+        self.assertEqual(self._anext(s).addr, 0x200)
+        self.assertEqual(self._anext(s).addr, 0x300)
+        s.close()
+        
+    def test_event_stream_block_sim(self):
+        class BpBfm(BfmBase):
+            def __init__(self):
+                super().__init__()
+                self.bp = []
+            def backpressure(self, en):
+                self.bp.append(en)
+                
+        bfm = BpBfm()
+        
+        s = bfm.events(kinds=EventKind.Entry, maxlen=2, policy=Backpressure.BlockSim)
+        for addr in (0x100, 0x200, 0x300, 0x400):
+            bfm.execute(addr, addr+4, 0, ExecEvent.Call)
+        
+        # No events are lost
+        self.assertEqual(s.dropped, 0)
+        self.assertEqual(bfm.bp, [True])
+        self.assertEqual(self._anext(s).addr, 0x100)
+        self.assertEqual(self._anext(s).addr, 0x200)
+        self.assertEqual(bfm.bp, [True])
+        self.assertEqual(self._anext(s).addr, 0x300)
+        self.assertEqual(bfm.bp, [True, False])
+        s.close()
+        
+    def _build_elf(self, path):
+        elf = TestingElfBuilder()
+        elf.add_text(".text", 0x1000, bytes(range(1, 17)))
+        elf.add_data(".data", 0x12FFFC, bytes([0x11, 0x22, 0x33, 0x44, 0x55, 0x66]))
+        elf.add_bss(".bss", 0x130004, 0x20000)
+        elf.add_symbol("main", 0x1000, 8)
+        elf.add_symbol("f1", 0x1008, 8)
+        elf.add_symbol("buf", 0x130004, 0x20000, TestingElfBuilder.STT_OBJECT)
+        elf.write(path)
+        
+    def test_load_elf_modes(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            
+            for kwargs in ({}, {"use_segments" : True}, {"use_segments" : True, "use_mmap" : True}):
+                bfm = BfmBase()
+                # Pre-fill .bss to confirm it is cleared
+                bfm.mm.memset(0x130000, 0xFF, 0x30000)
+                bfm.load_elf(path, **kwargs)
+                
+                self.assertEqual(bfm.sym2addr("f1"), 0x1008)
+                self.assertEqual(bfm.addr2sym(0x130004), "buf")
+                self.assertEqual(bfm.mm.read(0x1000, 16), bytes(range(1, 17)))
+                self.assertEqual(bfm.mm.read32(0x12FFFC), 0x44332211)
+                self.assertEqual(bfm.mm.read16(0x130000), 0x6655)
+                self.assertEqual(bfm.mm.read(0x130004, 0x20000), bytes(0x20000))
+                self.assertEqual(bfm.mm.read8(0x150004), 0xFF)
+        
+    def test_addr2func(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            
+            bfm = BfmBase()
+            bfm.load_elf(path)
+            
+            self.assertEqual(bfm.addr2func(0x1000), ("main", 0))
+            self.assertEqual(bfm.addr2func(0x100C), ("f1", 4))
+            # Data symbols are not functions
+            self.assertIsNone(bfm.addr2func(0x130008))
+            
+            # A call into the middle of a function is named by offset
+            bfm.execute(0x1004, 0, 0, ExecEvent.Call)
+            self.assertEqual(bfm.active_thread.callstack[-1].sym, "main+0x4")
+            bfm.execute(0x2000, 0, 0, ExecEvent.Call)
+            self.assertEqual(bfm.active_thread.callstack[-1].sym, "<unknown 0x2000>")
+            
+    def test_multi_image(self):
+        with tempfile.TemporaryDirectory() as d:
+            rom = os.path.join(d, "rom.elf")
+            elf = TestingElfBuilder()
+            elf.add_text(".text", 0x0, bytes([0xAA]*16))
+            elf.add_symbol("_start", 0x0, 8)
+            elf.add_symbol("init", 0x8, 8)
+            elf.write(rom)
+            
+            mod = os.path.join(d, "mod.elf")
+            elf = TestingElfBuilder()
+            elf.add_text(".text", 0x0, bytes([0xBB]*16))
+            elf.add_symbol("init", 0x0, 8)
+            elf.add_symbol("mod_fn", 0x8, 8)
+            elf.write(mod)
+            
+            bfm = BfmBase()
+            rom_i = bfm.load_elf(rom)
+            mod_a = bfm.load_elf(mod, offset=0x10000, name="mod_a")
+            mod_b = bfm.load_elf(mod, offset=0x20000, name="mod_b", load_data=False)
+            
+            self.assertEqual(rom_i.name, "rom.elf")
+            self.assertEqual((mod_a.start, mod_a.end), (0x10000, 0x10010))
+            self.assertEqual(bfm.mm.read8(0x10004), 0xBB)
+            self.assertEqual(bfm.mm.read8(0x20004), 0)
+            
+            # Later images take precedence ; namespaced lookup is exact
+            self.assertEqual(bfm.sym2addr("init"), 0x20000)
+            self.assertEqual(bfm.sym2addr("rom.elf:init"), 0x8)
+            self.assertEqual(bfm.sym2addr("mod_a:init"), 0x10000)
+            self.assertEqual(bfm.addr2sym(0x20008), "mod_fn")
+            
+            self.assertIs(bfm.image_at(0x4), rom_i)
+            self.assertIs(bfm.image_at(0x1000C), mod_a)
+            self.assertIsNone(bfm.image_at(0x10010))
+            self.assertEqual(bfm.addr2func(0x2000C), ("mod_fn", 4))
+            
+            bfm.unload_image(mod_b)
+            self.assertEqual(bfm.sym2addr("init"), 0x10000)
+            self.assertIsNone(bfm.addr2sym(0x20008))
+            self.assertIsNone(bfm.addr2func(0x2000C))
+            bfm.unload_image("mod_a")
+            self.assertEqual(bfm.sym2addr("init"), 0x8)
+            self.assertEqual(bfm.addr2sym(0x10000), None)
+            with self.assertRaises(Exception):
+                bfm.sym2addr("mod_fn")
+            with self.assertRaises(Exception):
+                bfm.unload_image(mod_a)
+            
+            # Image names default to the file name, and are unique
+            self.assertEqual(bfm.load_elf(rom).name, "rom.elf#2")
+            with self.assertRaises(Exception):
+                bfm.load_elf(mod, name="rom.elf")
+                
+            # Overlapping images resolve to the most recent
+            mod_c = bfm.load_elf(mod, offset=0x4, name="mod_c", load_data=False)
+            self.assertIs(bfm.image_at(0x6), mod_c)
+            self.assertEqual(bfm.addr2func(0x6), ("init", 2))
+            
+    def _build_module(self, path, syms):
+        elf = TestingElfBuilder()
+        elf.add_text(".text", 0x0, bytes(0x100))
+        for i, name in enumerate(syms):
+            elf.add_symbol(name, 0x10*i, 0x10)
+        elf.write(path)
+    
+    def test_sym_patterns(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {0x100 : "main", 0x200 : "test_a", 0x300 : "test_b", 0x400 : "uart_isr"}
+        bfm.sym2addr_m = {v : k for k, v in bfm.addr2sym_m.items()}
+        
+        tests = []
+        isrs = []
+        bfm.add_on_entry_cb(tests.append, sym="test_*")
+        bfm.add_on_exit_cb(isrs.append, sym=re.compile(r"_isr$"))
+        self.assertEqual(set(bfm.on_sym_entry_cb.keys()), {0x200, 0x300})
+        self.assertEqual(set(bfm.on_sym_exit_cb.keys()), {0x400})
+        
+        bfm.execute_batch(
+            [0x100, 0x200, 0x104, 0x300, 0x400, 0x304],
+            [0x000, 0x104, 0x000, 0x108, 0x304, 0x000],
+            [0]*6,
+            [ExecEvent.Call, ExecEvent.Call, ExecEvent.Ret, ExecEvent.Call, 
+             ExecEvent.Call, ExecEvent.Ret])
+        self.assertEqual(tests, [0x200, 0x300])
+        self.assertEqual(isrs, [0x400])
+        
+        # Patterns that match nothing are allowed, and can be removed
+        def nop(pc):
+            pass
+        bfm.add_on_entry_cb(nop, sym="syscall_*")
+        bfm.del_on_entry_cb(nop)
+        bfm.del_on_entry_cb(tests.append)
+        self.assertEqual(bfm.on_sym_entry_cb, {})
+        self.assertEqual(bfm._pattern_subs[0][1].pattern, r"_isr$")
+        with self.assertRaises(Exception):
+            bfm.add_on_entry_cb(nop, sym="no_such_sym")
+            
+    def test_sym_patterns_reresolve(self):
+        with tempfile.TemporaryDirectory() as d:
+            mod = os.path.join(d, "mod.elf")
+            self._build_module(mod, ["mod_init", "test_m1", "test_m2"])
+            
+            bfm = BfmBase()
+            bfm.sym2addr_m = {"main" : 0x100, "test_a" : 0x200}
+            
+            entered = []
+            bfm.add_on_entry_cb(entered.append, sym=["main", "test_*"])
+            bfm.add_on_exec_cb(lambda pc, instr: None, sym="mod_a:mod_*")
+            self.assertEqual(set(bfm.on_sym_entry_cb.keys()), {0x100, 0x200})
+            self.assertEqual(bfm.on_sym_exec_cb, {})
+            
+            co = bfm.on_entry("test_m*")
+            co.send(None)
+            self.assertEqual(bfm.entry_waiters.waiters, {})
+            
+            img = bfm.load_elf(mod, offset=0x10000, name="mod_a", load_data=False)
+            self.assertEqual(set(bfm.on_sym_entry_cb.keys()), {0x100, 0x200, 0x10010, 0x10020})
+            self.assertEqual(set(bfm.on_sym_exec_cb.keys()), {0x10000})
+            self.assertIn(0x10000, bfm._exec_addrs)
+            self.assertEqual(set(bfm.entry_waiters.waiters.keys()), {0x10010, 0x10020})
+            
+            bfm.execute(0x10020, 0, 0, ExecEvent.Call)
+            with self.assertRaises(StopIteration) as cm:
+                co.send(None)
+            self.assertEqual(cm.exception.value, 0x10020)
+            self.assertEqual(entered, [0x10020])
+            
+            bfm.unload_image(img)
+            self.assertEqual(set(bfm.on_sym_entry_cb.keys()), {0x100, 0x200})
+            self.assertEqual(bfm.on_sym_exec_cb, {})
+            self.assertEqual(bfm._exec_addrs, set())
+            
+    def test_unwind_resync(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {0x100 : "main", 0x200 : "f1", 0x300 : "f2", 0x400 : "f3"}
+        bfm.sym2addr_m = {v : k for k, v in bfm.addr2sym_m.items()}
+        exits = []
+        bfm.add_on_exit_cb(exits.append)
+        f1_exits = []
+        bfm.add_on_exit_cb(f1_exits.append, sym="f1")
+        callstack = bfm.active_thread.callstack
+        
+        # main -> f1 -> f2 -> f3, then longjmp back into main
+        bfm.execute(0x100, 0x10, 0, ExecEvent.Call)
+        bfm.execute(0x200, 0x104, 0, ExecEvent.Call)
+        bfm.execute(0x300, 0x204, 0, ExecEvent.Call)
+        bfm.execute(0x400, 0x304, 0, ExecEvent.Call)
+        bfm.execute(0x104, 0, 0, ExecEvent.Ret)
+        self.assertEqual(callstack.syms(), ["<initial>", "main"])
+        self.assertEqual(exits, [0x400, 0x300, 0x200])
+        self.assertEqual(f1_exits, [0x200])
+        self.assertEqual((bfm.n_ret_resync, bfm.n_ret_skipped), (1, 2))
+        
+        # A return nothing expects (eg a missed call) is counted, and ignored
+        bfm.execute(0x200, 0x108, 0, ExecEvent.Call)
+        bfm.execute(0x5004, 0, 0, ExecEvent.Ret)
+        self.assertEqual(bfm.n_ret_unmatched, 1)
+        self.assertEqual(callstack.syms(), ["<initial>", "main", "f1"])
+        
+        # f1 tail-calls f2, which returns directly to main
+        bfm.execute(0x300, 0, 0, ExecEvent.Call)
+        bfm.execute(0x108, 0, 0, ExecEvent.Ret)
+        self.assertEqual(callstack.syms(), ["<initial>", "main"])
+        self.assertEqual(exits[-2:], [0x300, 0x200])
+        self.assertEqual(callstack.retaddrs, [0x10, -1])
+        
+        bfm.execute(0x10, 0, 0, ExecEvent.Ret)
+        self.assertEqual(callstack.syms(), ["<initial>"])
+        self.assertEqual(callstack.retaddrs, [-1])
+        self.assertEqual((bfm.n_ret_resync, bfm.n_ret_skipped, bfm.n_ret_unmatched), (2, 3, 1))
+        
+        bfm.execute(0x5004, 0, 0, ExecEvent.Ret)
+        self.assertEqual(bfm.n_ret_unmatched, 2)
+        
+    def test_unwind_strict(self):
+        bfm = BfmBase()
+        bfm.strict_unwind = True
+        bfm.bfm_info = type("BfmInfo", (), {"inst_name" : "core"})
+        bfm.execute(0x100, 0x10, 0, ExecEvent.Call)
+        bfm.execute(0x200, 0x104, 0, ExecEvent.Call)
+        with self.assertRaises(Exception):
+            bfm.execute(0x10, 0, 0, ExecEvent.Ret)
+            
+    def test_excp_pool(self):
+        class CauseBfm(BfmBase):
+            cause = 7
+            def get_excp_cause(self):
+                return self.cause
+            
+        bfm = CauseBfm()
+        bfm.addr2sym_m = {0x100 : "main", 0x800 : "isr", 0x900 : "fault"}
+        
+        # Timer interrupt, with a nested fault. The outer handler spans 6
+        # instructions, including the 2 of the fault handler
+        bfm.execute_batch(
+            [0x100, 0x104, 0x800, 0x804, 0x900, 0x904, 0x808, 0x80C, 0x108],
+            [0x10, 0, 0, 0, 0, 0, 0, 0, 0],
+            [0]*9,
+            [ExecEvent.Call, 0, ExecEvent.Excp, 0, ExecEvent.Excp, 0, 
+             ExecEvent.Eret, 0, ExecEvent.Eret])
+        outer = bfm._excp_pool[(1, None)]
+        self.assertEqual(bfm.n_exec, 9)
+        self.assertEqual(bfm.excp_stats.count, 2)
+        self.assertEqual(bfm.excp_stats.max_depth, 2)
+        self.assertEqual(bfm.excp_stats.instrs, 6)
+        self.assertEqual(bfm.excp_stats.max_instrs, 6)
+        self.assertIsNone(bfm.excp_stats.time)
+        self.assertEqual(bfm.excp_stats.causes[7].count, 2)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>", "main"])
+        
+        # The context for each nesting level is reused and reset
+        bfm.execute(0x800, 0, 0, ExecEvent.Excp)
+        self.assertIs(bfm.active_thread, outer)
+        bfm.execute(0x800, 0x80C, 0, ExecEvent.Call)
+        bfm.execute(0x10C, 0, 0, ExecEvent.Eret)
+        bfm.execute(0x800, 0, 0, ExecEvent.Excp)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>"])
+        bfm.execute(0x110, 0, 0, ExecEvent.Eret)
+        
+        # Contexts may also be pooled by cause
+        bfm.excp_pool_by_cause = True
+        bfm.cause = 11
+        bfm.execute(0x800, 0, 0, ExecEvent.Excp)
+        self.assertIsNot(bfm.active_thread, outer)
+        self.assertIs(bfm.active_thread, bfm._excp_pool[(1, 11)])
+        bfm.execute(0x114, 0, 0, ExecEvent.Eret)
+        self.assertEqual(bfm.excp_stats.causes[11].count, 1)
+        self.assertIn("Exceptions: 5 (max depth 2)", bfm.excp_stats.report())
+        
+    def test_excp_nested_stats(self):
+        class CauseBfm(BfmBase):
+            causes = [3, 7, 11]
+            def get_excp_cause(self):
+                return self.causes.pop(0)
+            
+        bfm = CauseBfm()
+        bfm.addr2sym_m = {0x100 : "main", 0x800 : "isr", 0x900 : "fault"}
+        
+        # Three nested handlers spanning 10, 6 and 2 instructions. Each is
+        # charged once in the totals, and latency includes nested handlers
+        bfm.execute_batch(
+            [0x100, 0x800, 0x804, 0x900, 0x904, 0xA00, 0xA04, 0x908, 0x90C,
+             0x808, 0x80C, 0x104],
+            [0x10] + [0]*11,
+            [0]*12,
+            [ExecEvent.Call, ExecEvent.Excp, 0, ExecEvent.Excp, 0, ExecEvent.Excp, 0,
+             ExecEvent.Eret, 0, ExecEvent.Eret, 0, ExecEvent.Eret])
+        stats = bfm.excp_stats
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.max_depth, 3)
+        self.assertEqual(stats.instrs, 10)
+        self.assertEqual(stats.max_instrs, 10)
+        self.assertEqual([(c, stats.causes[c].count, stats.causes[c].instrs) for c in (3, 7, 11)],
+                         [(3, 1, 4), (7, 1, 4), (11, 1, 2)])
+        self.assertIn("Handler instructions: 10 (max 10)", stats.report())
+        
+    def test_excp_pending(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {0x100 : "main", 0x200 : "func", 0x800 : "isr"}
+        entries = []
+        bfm.add_on_entry_cb(entries.append)
+        bfm.execute(0x100, 0x10, 0, ExecEvent.Call)
+        
+        # Interrupt taken as func is called. The call is replayed on return
+        bfm.execute(0x800, 0x104, 0, ExecEvent.Excp|ExecEvent.Call)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>"])
+        bfm.execute(0x200, 0, 0, ExecEvent.Eret)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>", "main", "func"])
+        self.assertEqual(entries, [0x100, 0x200])
+        
+        # Return from exception that coincides with a return from func
+        bfm.execute(0x800, 0, 0, ExecEvent.Excp)
+        bfm.execute(0x104, 0, 0, ExecEvent.Eret|ExecEvent.Ret)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>", "main"])
+        self.assertEqual(bfm.n_ret_unmatched, 0)
+        
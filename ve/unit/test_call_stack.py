@@ -0,0 +1,113 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from unittest.case import TestCase
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+from core_debug_common.call_stack import CallStack
+from core_debug_common.callframe_window_mgr import CallframeWindowMgr
+from core_debug_common.stack_frame import StackFrame
+from core_debug_common.thread_info import ThreadInfo
+
+
+class TestCallStack(TestCase):
+    
+    def test_frames(self):
+        cs = CallStack()
+        cs.append(StackFrame(0, "<initial>", False))
+        cs.push(0x100, cs.symtab.intern("main"))
+        cs[-2].retaddr = 0x10
+        cs[-1].retaddr = 0x104
+        
+        self.assertEqual(len(cs), 2)
+        self.assertEqual([(f.addr, f.retaddr, f.sym, f.is_func) for f in cs], 
+                         [(0, 0x10, "<initial>", False), (0x100, 0x104, "main", True)])
+        self.assertEqual(cs.syms(), ["<initial>", "main"])
+        with self.assertRaises(IndexError):
+            cs[2]
+        
+        frame = cs.pop()
+        self.assertEqual((frame.addr, frame.retaddr, frame.sym), (0x100, 0x104, "main"))
+        self.assertEqual(cs[0].sym, "<initial>")
+        
+        # Frames hold IDs interned in the stack's table
+        self.assertEqual(StackFrame(0x200, "main", symtab=cs.symtab).symid, frame.symid)
+        other = StackFrame(0x200, "other")
+        cs.append(other)
+        self.assertEqual(cs[-1].sym, "other")
+        
+    def test_window_mgr(self):
+        t = ThreadInfo("t0")
+        t.callstack.append(StackFrame(0, "<initial>", False))
+        frames = {}
+        mgr = CallframeWindowMgr(4, 
+            lambda i, text: frames.__setitem__(i, text), 
+            lambda i: frames.pop(i, None),
+            lambda t: None)
+        
+        mgr.set_thread(t)
+        for i in range(5):
+            t.callstack.push(0x100*i, t.callstack.symtab.intern("f%d" % i))
+            mgr.enter(t)
+        self.assertEqual(frames, {0 : "4: f3", 1 : "5: f4"})
+        
+        t.callstack.pop()
+        mgr.exit(t)
+        t.callstack.pop()
+        mgr.exit(t)
+        self.assertEqual(frames, {0 : "0: <initial>", 1 : "1: f0", 2 : "2: f1", 3 : "3: f2"})
+        
+    def test_exit_hook(self):
+        class HookBfm(BfmBase):
+            def __init__(self):
+                super().__init__()
+                self.frames = []
+            def exit(self, frame):
+                self.frames.append((frame.addr, frame.sym))
+                
+        bfm = HookBfm()
+        bfm.addr2sym_m = {0x100 : "main"}
+        bfm.execute(0x100, 0x10, 0, ExecEvent.Call)
+        bfm.execute(0x108, 0x10C, 0, ExecEvent.Call)
+        self.assertEqual(bfm.active_thread.callstack.syms(), 
+                         ["<initial>", "main", "<unknown 0x108>"])
+        bfm.execute(0x10C, 0, 0, ExecEvent.Ret)
+        bfm.execute(0x10, 0, 0, ExecEvent.Ret)
+        self.assertEqual(bfm.frames, [(0x108, "<unknown 0x108>"), (0x100, "main")])
+        
+    def test_sym_table_scope(self):
+        bfm = BfmBase()
+        bfm.execute(0x108, 0x10C, 0, ExecEvent.Call)
+        self.assertIn("<unknown 0x108>", bfm.symtab.ids)
+        
+        # Each BFM interns names in its own table, used by all threads
+        # including exception contexts
+        other = BfmBase()
+        self.assertNotIn("<unknown 0x108>", other.symtab.ids)
+        other.switch_thread(1)
+        other.execute(0x800, 0, 0, ExecEvent.Excp)
+        for t in list(other.threads.values()) + [other.active_thread]:
+            self.assertIs(t.callstack.symtab, other.symtab)
+        self.assertEqual(len(other.symtab), 1)
+        
+    def test_find_retaddr(self):
+        cs = CallStack()
+        cs.append(StackFrame(0, "<initial>", False))
+        for i in range(4):
+            cs.push(0x100*(i+1), cs.symtab.intern("f%d" % i))
+        # Recursion: several frames expect the same return address
+        cs[0].retaddr = 0x10
+        cs[1].retaddr = 0x104
+        cs[2].retaddr = 0x104
+        cs[3].retaddr = 0x104
+        
+        self.assertEqual(cs.find_retaddr(0x104), 3)
+        self.assertEqual(cs.find_retaddr(0x10), 0)
+        self.assertEqual(cs.find_retaddr(0x20), -1)
+        
+        cs.truncate(3)
+        self.assertEqual(cs.find_retaddr(0x104), 2)
+        self.assertEqual(len(cs), 3)
+        
@@ -0,0 +1,104 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import os
+import tempfile
+
+from core_debug_common.bfm_base import BfmBase
+from core_debug_common.elf_cache import ElfCache
+from core_debug_common_test_case import CoreDebugCommonTestCase
+from testing_elf_builder import TestingElfBuilder
+
+
+class TestElfCache(CoreDebugCommonTestCase):
+
+    def _build_elf(self, path, data=bytes([0x11, 0x22, 0x33, 0x44])):
+        elf = TestingElfBuilder()
+        elf.add_text(".text", 0x1000, bytes(range(1, 17)))
+        elf.add_data(".data", 0x2000, data)
+        elf.add_bss(".bss", 0x2004, 0x100)
+        elf.add_symbol("main", 0x1000, 8)
+        elf.add_symbol("f1", 0x1008, 8)
+        elf.add_symbol("buf", 0x2004, 0x100, TestingElfBuilder.STT_OBJECT)
+        elf.write(path)
+
+    def _check(self, bfm, b0=0x11):
+        self.assertEqual(bfm.sym2addr("f1"), 0x1008)
+        self.assertEqual(bfm.addr2sym(0x2004), "buf")
+        self.assertEqual(bfm.mm.read(0x1000, 16), bytes(range(1, 17)))
+        self.assertEqual(bfm.mm.read8(0x2000), b0)
+        self.assertEqual(bfm.mm.read(0x2004, 0x100), bytes(0x100))
+
+    def test_cold_warm(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            cache = ElfCache(os.path.join(d, "cache"))
+
+            for use_mmap in (False, True, False):
+                bfm = BfmBase()
+                bfm.load_elf(path, use_mmap=use_mmap, cache=cache)
+                self._check(bfm)
+
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(cache.hits, 2)
+
+            info = cache.load(path)
+            self.assertEqual(info.sym_names, ["main", "f1", "buf"])
+            self.assertEqual(list(info.sym_sizes), [8, 8, 0x100])
+            self.assertEqual(info.sym_type(0), TestingElfBuilder.STT_FUNC)
+            self.assertEqual(info.sym_type(2), TestingElfBuilder.STT_OBJECT)
+
+    def test_invalidate_on_change(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            cache = ElfCache(os.path.join(d, "cache"))
+
+            BfmBase().load_elf(path, cache=cache)
+
+            # Same size, different content and timestamp
+            st = os.stat(path)
+            self._build_elf(path, bytes([0x99, 0x22, 0x33, 0x44]))
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+            bfm = BfmBase()
+            bfm.load_elf(path, cache=cache)
+            self._check(bfm, 0x99)
+            self.assertEqual(cache.misses, 2)
+
+    def test_touch_is_hit(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            cache = ElfCache(os.path.join(d, "cache"))
+            self.assertIsNone(cache.load(path))
+            BfmBase().load_elf(path, cache=cache)
+
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+            self.assertIsNotNone(cache.load(path))
+            self.assertIsNotNone(cache.load(path))
+            self.assertEqual(cache.hits, 2)
+
+            cache.invalidate(path)
+            self.assertIsNone(cache.load(path))
+
+    def test_corrupt_entry(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            self._build_elf(path)
+            cache = ElfCache(os.path.join(d, "cache"))
+            BfmBase().load_elf(path, cache=cache)
+
+            with open(cache.entry_path(path), "r+b") as fp:
+                fp.truncate(os.path.getsize(cache.entry_path(path)) - 3)
+            self.assertIsNone(cache.load(path))
+
+            bfm = BfmBase()
+            bfm.load_elf(path, cache=cache)
+            self._check(bfm)
+            self.assertIsNotNone(cache.load(path))
+
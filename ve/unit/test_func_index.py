@@ -0,0 +1,50 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from unittest.case import TestCase
+
+from core_debug_common.func_index import FuncIndex
+
+
+class TestFuncIndex(TestCase):
+    
+    def test_lookup(self):
+        idx = FuncIndex()
+        idx.add("f2", 0x2000, 0x20)
+        idx.add("f1", 0x1000, 0x10)
+        idx.add("f1_alias", 0x1000, 0x10)
+        
+        self.assertEqual(idx.addr2func(0x1000), ("f1", 0))
+        self.assertEqual(idx.addr2func(0x100C), ("f1", 0xC))
+        self.assertIsNone(idx.addr2func(0x1010))
+        self.assertIsNone(idx.addr2func(0xFFF))
+        self.assertEqual(idx.addr2func(0x201F), ("f2", 0x1F))
+        self.assertIsNone(idx.addr2func(0x2020))
+        self.assertEqual(len(idx), 2)
+        
+    def test_zero_size(self):
+        idx = FuncIndex()
+        idx.add("asm_entry", 0x100, 0)
+        idx.add("f1", 0x200, 0x10)
+        idx.add("asm_tail", 0x300, 0)
+        
+        self.assertEqual(idx.addr2func(0x1FC), ("asm_entry", 0xFC))
+        self.assertIsNone(idx.addr2func(0x210))
+        self.assertEqual(idx.addr2func(0x400), ("asm_tail", 0x100))
+        
+        # Adding a function later splits the zero-size range
+        idx.add("f0", 0x180, 0x8)
+        self.assertEqual(idx.addr2func(0x17C), ("asm_entry", 0x7C))
+        self.assertEqual(idx.addr2func(0x184), ("f0", 0x4))
+        self.assertIsNone(idx.addr2func(0x190))
+        
+    def test_large(self):
+        idx = FuncIndex()
+        for i in range(100000):
+            idx.add("f%d" % i, 0x10000 + 0x40*i, 0x30)
+        for i in range(0, 100000, 997):
+            self.assertEqual(idx.addr2func(0x10000 + 0x40*i + 0x2C), ("f%d" % i, 0x2C))
+            self.assertEqual(idx.lookup(0x10000 + 0x40*i + 0x30), -1)
+            
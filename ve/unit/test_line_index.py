@@ -0,0 +1,150 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from array import array
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.case import TestCase
+
+from core_debug_common.bfm_base import BfmBase
+from core_debug_common.elf_info import ElfInfo
+from core_debug_common.line_index import LineIndex
+from elftools.elf.elffile import ELFFile
+from testing_elf_builder import TestingElfBuilder
+
+
+MAIN_C = """
+static int sq(int x) {
+    return x*x;
+}
+
+int main(int argc, char **argv) {
+    return sq(argc);
+}
+"""
+
+HELPER_C = """int helper(int a) {
+    int b = a + 1;
+    return b * 2;
+}
+"""
+
+@unittest.skipIf(shutil.which("gcc") is None, "gcc is required to build DWARF test images")
+class TestLineIndex(TestCase):
+
+    def _build(self, d, *cflags):
+        for name, src in (("main.c", MAIN_C), ("helper.c", HELPER_C)):
+            with open(os.path.join(d, name), "w") as fp:
+                fp.write(src)
+        exe = os.path.join(d, "t.elf")
+        subprocess.check_call(["gcc", "-g", "-O0"] + list(cflags) + [
+            "-o", exe, "main.c", "helper.c"], cwd=d)
+
+        with open(exe, "rb") as fp:
+            info = ElfInfo.from_elffile(ELFFile(fp))
+        syms = dict(zip(info.sym_names, info.sym_values))
+        return exe, syms
+
+    def _check(self, *cflags, strip_aranges=False):
+        with tempfile.TemporaryDirectory() as d:
+            exe, syms = self._build(d, *cflags)
+            if strip_aranges:
+                # Forces CU ranges to come from the CU DIEs
+                subprocess.check_call(["objcopy", "--remove-section=.debug_aranges", exe])
+            idx = LineIndex(exe)
+
+            f, line = idx.addr2line(syms["main"])
+            self.assertEqual(os.path.basename(f), "main.c")
+            self.assertEqual(line, 6)
+            self.assertEqual(idx.n_decoded, 1)
+            f, line = idx.addr2line(syms["sq"])
+            self.assertEqual(line, 2)
+            self.assertEqual(idx.n_decoded, 1)
+
+            f, line = idx.addr2line(syms["helper"])
+            self.assertEqual(f, os.path.join(d, "helper.c"))
+            self.assertEqual(line, 1)
+            self.assertEqual(idx.n_decoded, 2)
+
+            # Body of helper, past the prologue
+            lines = set(idx.addr2line(a)[1] for a in range(syms["helper"], syms["helper"]+16))
+            self.assertIn(2, lines)
+
+            self.assertIsNone(idx.addr2line(0))
+            idx.close()
+
+    def test_dwarf5(self):
+        self._check("-gdwarf-5")
+
+    def test_dwarf4(self):
+        self._check("-gdwarf-4")
+
+    @unittest.skipIf(shutil.which("objcopy") is None, "objcopy is required")
+    def test_no_aranges(self):
+        self._check(strip_aranges=True)
+
+    @unittest.skipIf(shutil.which("objcopy") is None, "objcopy is required")
+    def test_no_aranges_decode_once(self):
+        with tempfile.TemporaryDirectory() as d:
+            # Functions in separate sections give each CU a DW_AT_ranges
+            # list, so CU ranges come from the line programs. Rows decoded
+            # then are kept for lookups
+            exe, syms = self._build(d, "-ffunction-sections")
+            subprocess.check_call(["objcopy", "--remove-section=.debug_aranges", exe])
+            idx = LineIndex(exe)
+
+            self.assertEqual(idx.addr2line(syms["main"])[1], 6)
+            self.assertEqual(idx.n_decoded, 2)
+            self.assertEqual(idx.addr2line(syms["sq"])[1], 2)
+            self.assertEqual(idx.addr2line(syms["helper"])[1], 1)
+            self.assertEqual(idx.n_decoded, 2)
+
+    def test_bfm_addr2line(self):
+        with tempfile.TemporaryDirectory() as d:
+            exe, syms = self._build(d)
+            bfm = BfmBase(addr_width=64)
+            bfm.load_elf(exe, use_segments=True)
+            
+            self.assertEqual(bfm.images[0].line_idx.n_decoded, 0)
+            self.assertEqual(bfm.addr2line(syms["helper"]), (os.path.join(d, "helper.c"), 1))
+            self.assertIsNone(bfm.addr2line(0))
+
+    def test_no_debug_info(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "t.elf")
+            elf = TestingElfBuilder()
+            elf.add_text(".text", 0x1000, bytes(16))
+            elf.add_symbol("main", 0x1000, 16)
+            elf.write(path)
+
+            self.assertIsNone(LineIndex(path).addr2line(0x1000))
+
+
+
+class TestLineIndexOverlap(TestCase):
+
+    def test_overlap(self):
+        idx = LineIndex("none.elf")
+        idx._built = True
+        f = idx._file_id("a.c")
+        g = idx._file_id("b.c")
+
+        # CU 'a' covers [0,0x100). CU 'b' covers [0x40,0x60), and also
+        # [0x40,0x48) again, as left by discarded sections
+        decoded = {
+            10 : (array('Q', [0, 0x80, 0x100]), array('I', [f, f, 0]), array('I', [1, 2, 0])),
+            20 : (array('Q', [0x40, 0x60]), array('I', [g, 0]), array('I', [5, 0]))}
+        idx._set_ranges([(0, 0x100, 10), (0x40, 0x60, 20), (0x40, 0x48, 20)], decoded)
+
+        self.assertEqual(idx.addr2line(0x30), ("a.c", 1))
+        self.assertEqual(idx.addr2line(0x50), ("b.c", 5))
+        # Covered only by the earlier, longer range
+        self.assertEqual(idx.addr2line(0x60), ("a.c", 1))
+        self.assertEqual(idx.addr2line(0x80), ("a.c", 2))
+        self.assertIsNone(idx.addr2line(0x100))
+        self.assertEqual(idx.n_decoded, 0)
@@ -20,4 +20,257 @@ class TestMemModel(TestCase):
         val = mm.read32(0x80000000)
         self.assertEqual(val, 0x08070605)
         
-        self.assertEqual(mm.n_pages, 2)
\ No newline at end of file
+        self.assertEqual(mm.n_pages, 2)
+        
+    def test_adjacent_pages(self):
+        mm = MemModel()
+        
+        mm.write(0x00000000, [1, 2, 3, 4])
+        mm.write(0x00010000, [5, 6, 7, 8])
+        
+        self.assertEqual(mm.read32(0x00000000), 0x04030201)
+        self.assertEqual(mm.read32(0x00010000), 0x08070605)
+        self.assertEqual(mm.n_pages, 2)
+        
+    def test_64bit_addr(self):
+        mm = MemModel(addr_width=64)
+        
+        mm.write(0xFFFF_FFFF_0000_0000, [1, 2, 3, 4])
+        mm.write(0x0000_0001_0000_0000, [5, 6, 7, 8])
+        
+        self.assertEqual(mm.read32(0xFFFF_FFFF_0000_0000), 0x04030201)
+        self.assertEqual(mm.read32(0x0000_0001_0000_0000), 0x08070605)
+        self.assertEqual(mm.n_pages, 2)
+        
+    def test_write_read_span_pages(self):
+        mm = MemModel()
+        
+        data = bytes((i & 0xFF) for i in range(3*0x10000))
+        mm.write(0x1000FFF0, data)
+        self.assertEqual(mm.n_pages, 4)
+
+        self.assertEqual(mm.read(0x1000FFF0, len(data)), data)
+        self.assertEqual(mm.read(0x1000FFF0+0x10, 4), data[0x10:0x14])
+        self.assertEqual(mm.read8(0x1000FFF0+0x20000), data[0x20000])
+
+    def test_read_into(self):
+        mm = MemModel()
+        
+        mm.write(0x0000FFFE, [1, 2, 3, 4])
+        buf = bytearray(8)
+        self.assertEqual(mm.read_into(0x0000FFFC, buf), 8)
+        self.assertEqual(buf, bytes([0, 0, 1, 2, 3, 4, 0, 0]))
+        
+    def test_view(self):
+        mm = MemModel()
+        
+        mm.write(0x0000FFFE, [1, 2, 3, 4])
+
+        # Within a single page, the view tracks later writes        
+        v = mm.view(0x00010000, 2)
+        self.assertEqual(bytes(v), bytes([3, 4]))
+        mm.write(0x00010000, [5])
+        self.assertEqual(bytes(v), bytes([5, 4]))
+        
+        # Spanning pages, the view holds a copy
+        v = mm.view(0x0000FFFE, 4)
+        self.assertEqual(bytes(v), bytes([1, 2, 5, 4]))
+        
+    def test_memset_span_pages(self):
+        mm = MemModel()
+        
+        mm.memset(0x0001FFFE, 0xA5, 0x10004)
+        self.assertEqual(mm.read8(0x0001FFFD), 0)
+        self.assertEqual(mm.read8(0x0001FFFE), 0xA5)
+        self.assertEqual(mm.read32(0x00030000), 0xA5A5)
+        self.assertEqual(mm.read(0x0001FFFE, 0x10004), bytes([0xA5])*0x10004)
+        self.assertEqual(mm.n_pages, 3)
+        
+    def test_snapshot_restore(self):
+        mm = MemModel()
+        
+        mm.write32(0x00000000, 0x11111111)
+        mm.write32(0x00010000, 0x22222222)
+        snap = mm.snapshot()
+        
+        # Pages are shared until written
+        self.assertIs(snap.pages[0], mm.pages[0])
+        
+        mm.write32(0x00000000, 0x33333333)
+        mm.write32(0x00020000, 0x44444444)
+        self.assertIsNot(snap.pages[0], mm.pages[0])
+        self.assertIs(snap.pages[1], mm.pages[1])
+        self.assertEqual(mm.read32(0x00000000), 0x33333333)
+        
+        mm.restore(snap)
+        self.assertEqual(mm.read32(0x00000000), 0x11111111)
+        self.assertEqual(mm.read32(0x00010000), 0x22222222)
+        self.assertEqual(mm.n_pages, 2)
+        
+        # Writes after a restore must not modify the snapshot
+        mm.write32(0x00010000, 0x55555555)
+        mm.restore(snap)
+        self.assertEqual(mm.read32(0x00010000), 0x22222222)
+        
+    def test_snapshot_diff(self):
+        mm = MemModel()
+        
+        mm.write32(0x00000000, 1)
+        mm.write32(0x00010000, 2)
+        s1 = mm.snapshot()
+
+        mm.write32(0x00010004, 3)
+        mm.write32(0x00030000, 4)
+        # Writing the existing value leaves the content unchanged
+        mm.write32(0x00000000, 1)
+        # Touching a new page without writing non-zero data
+        mm.read8(0x00040000)
+        s2 = mm.snapshot()
+        
+        self.assertEqual(mm.diff(s1, s2), [0x00010000, 0x00030000])
+        self.assertEqual(mm.diff(s2), [])
+        
+        mm.memset(0x00000000, 0xFF, 4)
+        self.assertEqual(mm.diff(s2), [0x00000000])
+        
+    def test_dirty_pages(self):
+        mm = MemModel()
+        
+        mm.write32(0x00000000, 1)
+        mm.write_word(0x00010000, 2, 0xF)
+        mm.read32(0x00020000)
+        self.assertEqual(mm.dirty_pages(), [0x00000000, 0x00010000])
+        
+        mm.clear_dirty()
+        self.assertEqual(mm.dirty_pages(), [])
+        
+        mm.memset(0x0002FFFF, 0, 2)
+        mm.write(0x00000000, [1])
+        self.assertEqual(mm.dirty_pages(), [0x00000000, 0x00020000, 0x00030000])
+        
+    def test_dirty_ranges(self):
+        mm = MemModel()
+        
+        mm.write(0x00001000, [1, 2, 3, 4])
+        mm.clear_dirty(keep_base=True)
+        
+        mm.write(0x00001002, [3, 5, 6])
+        mm.write(0x0000FFFE, bytes([7])*0x100)
+        mm.write32(0x00002000, 0)
+        
+        self.assertEqual(list(mm.dirty_ranges()), [
+            (0x00001003, bytes([5, 6])),
+            (0x0000FFFE, bytes([7, 7])),
+            (0x00010000, bytes([7])*0xFE)])
+        
+    def test_dirty_ranges_written(self):
+        mm = MemModel()
+        
+        mm.write(0x00001000, [1, 2, 3, 4])
+        mm.clear_dirty()
+        # Without a base, no page is copied on write
+        page = mm.pages[0]
+        mm.write32(0x00001004, 0x08070605)
+        self.assertIs(mm.pages[0], page)
+        
+        # Ranges cover the bytes written in each page
+        mm.write_words([0x00010010, 0x00010008, 0x0001000C], [1, 2, 3])
+        mm.memset(0x0002FFFE, 0xFF, 4)
+        mm.write16(0x00001002, 0x0403)
+        self.assertEqual(list(mm.dirty_ranges()), [
+            (0x00001002, bytes([3, 4, 5, 6, 7, 8])),
+            (0x00010008, bytes([2,0,0,0, 3,0,0,0, 1,0,0,0])),
+            (0x0002FFFE, bytes([0xFF, 0xFF])),
+            (0x00030000, bytes([0xFF, 0xFF]))])
+        
+        # A single-word write exports a single-word delta
+        import io
+        mm.clear_dirty()
+        mm.write32(0x00001000, 0)
+        fp = io.BytesIO()
+        mm.export_delta(fp)
+        self.assertEqual(len(fp.getvalue()), 6 + 12 + 4)
+        
+    def test_delta_export_load(self):
+        import io
+        mm = MemModel()
+        
+        mm.write32(0x00000000, 0x11223344)
+        mm.memset(0x8000FFF0, 0x5A, 0x20)
+        
+        fp = io.BytesIO()
+        mm.export_delta(fp)
+        
+        mm2 = MemModel()
+        fp.seek(0)
+        mm2.load_delta(fp)
+        
+        self.assertEqual(mm2.read32(0x00000000), 0x11223344)
+        self.assertEqual(mm2.read(0x8000FFEF, 0x22), 
+                         bytes([0]) + bytes([0x5A])*0x20 + bytes([0]))
+        self.assertEqual(mm2.n_pages, 3)
+        
+        # Only the modified bytes are recorded
+        self.assertEqual(len(fp.getvalue()), 6 + 12 + 4 + 2*12 + 0x20)
+        
+    def test_write_word_mask(self):
+        mm = MemModel()
+        
+        mm.write_word(0x00001000, 0x44332211, 0xF)
+        self.assertEqual(mm.read32(0x00001000), 0x44332211)
+        
+        mm.write_word(0x00001000, 0xDDCCBBAA, 0x5)
+        self.assertEqual(mm.read32(0x00001000), 0x44CC22AA)
+        self.assertEqual(mm.read16(0x00001002), 0x44CC)
+        self.assertEqual(mm.read_word(0x00001000), 0x44CC22AA)
+        
+    def test_big_endian(self):
+        mm = MemModel(little_endian=False)
+        
+        mm.write(0x00001000, [1, 2, 3, 4])
+        self.assertEqual(mm.read32(0x00001000), 0x01020304)
+        self.assertEqual(mm.read16(0x00001002), 0x0304)
+        
+        mm.write_word(0x00001000, 0xAABBCCDD, 0xF)
+        self.assertEqual(mm.read(0x00001000, 4), bytes([0xAA, 0xBB, 0xCC, 0xDD]))
+        
+        # Mask bit N selects the byte at address offset N
+        mm.write_word(0x00001000, 0x11223344, 0x2)
+        self.assertEqual(mm.read(0x00001000, 4), bytes([0xAA, 0x22, 0xCC, 0xDD]))
+        
+    def test_64bit_data(self):
+        mm = MemModel(addr_width=64, data_width=64)
+        
+        mm.write_word(0x8000_0000_0000_1004, 0x8877665544332211, 0xFF)
+        self.assertEqual(mm.read_word(0x8000_0000_0000_1000), 0x8877665544332211)
+        self.assertEqual(mm.read64(0x8000_0000_0000_1000), 0x8877665544332211)
+        self.assertEqual(mm.read32(0x8000_0000_0000_1004), 0x88776655)
+        
+        mm.write_word(0x8000_0000_0000_1000, 0, 0xF0)
+        self.assertEqual(mm.read64(0x8000_0000_0000_1000), 0x0000000044332211)
+        
+    def test_wide_data(self):
+        mm = MemModel(data_width=128)
+        
+        mm.write_word(0x00001000, (0x1122 << 64) | 0x3344, 0xFFFF)
+        self.assertEqual(mm.read64(0x00001000), 0x3344)
+        self.assertEqual(mm.read64(0x00001008), 0x1122)
+        
+        mm.write_word(0x00001000, (0xFF << 64) | 0xFF, 0x0101)
+        self.assertEqual(mm.read_word(0x00001000), (0x11FF << 64) | 0x33FF)
+        
+    def test_write_words(self):
+        mm = MemModel()
+        
+        mm.write_words(
+            [0x00001000, 0x00001004, 0x00020000],
+            [0x11111111, 0x22222222, 0x33333333])
+        mm.write_words(
+            [0x00001000, 0x00001004],
+            [0xAAAAAAAA, 0xBBBBBBBB],
+            [0x1, 0xF])
+        
+        self.assertEqual(mm.read32(0x00001000), 0x111111AA)
+        self.assertEqual(mm.read32(0x00001004), 0xBBBBBBBB)
+        self.assertEqual(mm.read32(0x00020000), 0x33333333)
+        self.assertEqual(mm.dirty_pages(), [0x00000000, 0x00020000])
@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from unittest.case import TestCase
+
+from core_debug_common.mmap_mem_model import MmapMemModel
+
+
+class TestMmapMemModel(TestCase):
+    
+    def test_smoke(self):
+        mm = MmapMemModel(addr_width=64)
+        
+        mm.write(0x0000_0000_0000_0000, [1, 2, 3, 4])
+        mm.write(0x8000_0000_0000_0000, [5, 6, 7, 8])
+        mm.write_word(0x7FFF_FFFF_FFFF_FFF0, 0x11223344, 0xF)
+        
+        self.assertEqual(mm.read32(0x0000_0000_0000_0000), 0x04030201)
+        self.assertEqual(mm.read32(0x8000_0000_0000_0000), 0x08070605)
+        self.assertEqual(mm.read32(0x7FFF_FFFF_FFFF_FFF0), 0x11223344)
+        self.assertEqual(mm.n_pages, 3)
+        
+        mm.close()
+        
+    def test_span_chunks(self):
+        mm = MmapMemModel()
+        
+        # Touch enough pages to require a second mapping
+        n = MmapMemModel.PAGES_PER_CHUNK+2
+        for i in range(n):
+            mm.write32(i << 16, i)
+
+        data = bytes((i & 0xFF) for i in range(0x20000))
+        mm.write(((n-2) << 16) + 0x100, data)
+            
+        self.assertEqual(len(mm.chunks), 2)
+        for i in range(n-2):
+            self.assertEqual(mm.read32(i << 16), i)
+        self.assertEqual(mm.read(((n-2) << 16) + 0x100, len(data)), data)
+        
+        mm.close()
+        
+    def test_snapshot(self):
+        mm = MmapMemModel()
+        
+        mm.write32(0x00000000, 0x11111111)
+        snap = mm.snapshot()
+        mm.write32(0x00000000, 0x22222222)
+        self.assertEqual(mm.diff(snap), [0x00000000])
+        
+        mm.restore(snap)
+        self.assertEqual(mm.read32(0x00000000), 0x11111111)
+        
+        mm.close()
+        
+    def test_slot_reuse(self):
+        mm = MmapMemModel()
+        
+        # Each write after a snapshot copies the page. Slots of copies 
+        # that no snapshot refers to are reused
+        for i in range(50):
+            snap = mm.snapshot()
+            mm.write32(0x00001000, i)
+            del snap
+        self.assertLessEqual(mm.n_slots, 2)
+        self.assertEqual(len(mm.views), mm.n_slots)
+        self.assertEqual(mm.n_pages, 1)
+        
+        # Slots held by live snapshots are not reused
+        snaps = []
+        for i in range(4):
+            snaps.append(mm.snapshot())
+            mm.write32(0x00001000, 0x100+i)
+        self.assertEqual(mm.n_slots, 5)
+        mm.restore(snaps[1])
+        self.assertEqual(mm.read32(0x00001000), 0x100)
+        snaps.clear()
+        
+        # A reused slot is zeroed for a new page
+        mm.write32(0x00002000, 1)
+        mm.write32(0x00010000, 1)
+        self.assertEqual(mm.read(0x00010004, 0xFFFC), bytes(0xFFFC))
+        self.assertEqual(mm.read32(0x00001000), 0x100)
+        self.assertEqual(mm.n_slots, 5)
+        
+        mm.close()
+        
+    def test_view_pins_page(self):
+        mm = MmapMemModel()
+        
+        mm.write32(0x00000000, 0x11111111)
+        v = mm.view(0x00000000, 4)
+        snap = mm.snapshot()
+        mm.write32(0x00000000, 0x22222222)
+        del snap
+        
+        # The view's page is still referenced, so its slot isn't reused
+        mm.write32(0x00050000, 0x33333333)
+        self.assertEqual(bytes(v), bytes([0x11]*4))
+        self.assertEqual(mm.read32(0x00000000), 0x22222222)
+        
+        # Closing with an outstanding view is allowed
+        mm.close()
+        self.assertEqual(bytes(v), bytes([0x11]*4))
+        
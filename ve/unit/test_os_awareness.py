@@ -0,0 +1,95 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+from core_debug_common.freertos_awareness import FreeRtosAwareness
+from core_debug_common.os_awareness import OsAwareness
+from core_debug_common_test_case import CoreDebugCommonTestCase
+
+
+class TestOsAwareness(CoreDebugCommonTestCase):
+    
+    TCB_A = 0xA000
+    TCB_B = 0xB000
+    PX_CURRENT_TCB = 0x9000
+    NAME_OFFSET = 0x34
+    
+    def _bfm(self):
+        bfm = BfmBase()
+        bfm.sym2addr_m = {
+            "PendSV_Handler" : 0x1000, 
+            "vTaskSwitchContext" : 0x2000,
+            "pxCurrentTCB" : self.PX_CURRENT_TCB,
+            "taskA" : 0x3000,
+            "taskB" : 0x4000}
+        bfm.addr2sym_m = {v : k for k, v in bfm.sym2addr_m.items()}
+        bfm.mm.write(self.TCB_A + self.NAME_OFFSET, b"TaskA\0")
+        bfm.mm.write(self.TCB_B + self.NAME_OFFSET, b"TaskB\0")
+        return bfm
+    
+    def _context_switch(self, bfm, pc, tcb):
+        """Drives a context-switch interrupt taken at pc"""
+        bfm.mm.write32(self.PX_CURRENT_TCB, tcb)
+        bfm.execute(0x1000, 0, 0, ExecEvent.Excp)
+        bfm.execute(0x2000, 0x1008, 0, ExecEvent.Call)
+        bfm.execute(0x1008, 0, 0, ExecEvent.Ret)
+        bfm.execute(pc, 0, 0, ExecEvent.Eret)
+    
+    def test_freertos_switch(self):
+        bfm = self._bfm()
+        os_a = FreeRtosAwareness(name_offset=self.NAME_OFFSET)
+        bfm.set_os_awareness(os_a)
+        
+        # Scheduler start: first task is A
+        self._context_switch(bfm, 0x3000, self.TCB_A)
+        self.assertIs(bfm.active_thread, bfm.threads[self.TCB_A])
+        self.assertEqual(bfm.active_thread.name, "TaskA")
+        bfm.execute(0x3000, 0x3100, 0, ExecEvent.Call)
+        
+        # Preempt A within taskA, and run B
+        self._context_switch(bfm, 0x4000, self.TCB_B)
+        self.assertEqual(bfm.active_thread.name, "TaskB")
+        bfm.execute(0x4000, 0x4100, 0, ExecEvent.Call)
+        self.assertEqual(bfm.active_thread.callstack.syms(), ["<initial>", "taskB"])
+        
+        # Back to A. Its callstack is preserved, so the return matches
+        self._context_switch(bfm, 0x3010, self.TCB_A)
+        thread_a = bfm.threads[self.TCB_A]
+        self.assertIs(bfm.active_thread, thread_a)
+        self.assertEqual(thread_a.callstack.syms(), ["<initial>", "taskA"])
+        bfm.execute(0x3100, 0, 0, ExecEvent.Ret)
+        self.assertEqual(thread_a.callstack.syms(), ["<initial>"])
+        self.assertEqual(bfm.threads[self.TCB_B].callstack.syms(), ["<initial>", "taskB"])
+        
+        # A switch to the running task is not a switch
+        self._context_switch(bfm, 0x3110, self.TCB_A)
+        self.assertEqual(os_a.n_switches, 3)
+        self.assertEqual(set(bfm.threads.keys()), {"<default>", self.TCB_A, self.TCB_B})
+        
+        bfm.set_os_awareness(None)
+        self.assertEqual(bfm.on_sym_exit_cb, {})
+        
+    def test_switch_thread(self):
+        switched = []
+        class SwitchBfm(BfmBase):
+            def thread_switch(self, t):
+                switched.append(t.tid)
+        class TestOs(OsAwareness):
+            def create_thread(self, tid):
+                t = super().create_thread(tid)
+                t.name = "task-%d" % tid
+                return t
+                
+        bfm = SwitchBfm()
+        bfm.set_os_awareness(TestOs())
+        
+        default_t = bfm.active_thread
+        bfm.switch_thread(1)
+        self.assertEqual(bfm.active_thread.name, "task-1")
+        self.assertIs(bfm.get_thread(1), bfm.active_thread)
+        bfm.switch_thread("<default>")
+        self.assertIs(bfm.active_thread, default_t)
+        self.assertEqual(switched, [1, "<default>"])
+        
@@ -0,0 +1,167 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import io
+
+from core_debug_common.bfm_base import BfmBase, ExecEvent
+from core_debug_common.profiler import Profiler
+from core_debug_common_test_case import CoreDebugCommonTestCase
+
+
+class TestProfiler(CoreDebugCommonTestCase):
+
+    def _bfm(self):
+        bfm = BfmBase()
+        bfm.addr2sym_m = {
+            0x100 : "main", 0x200 : "f", 0x300 : "g", 0x400 : "r", 0x800 : "isr"}
+        return bfm
+
+    def _run(self, bfm, trace):
+        """Executes (addr, retaddr, ev) tuples as a batch"""
+        bfm.execute_batch(
+            [e[0] for e in trace], [e[1] for e in trace], [0]*len(trace),
+            [e[2] for e in trace])
+
+    def _counts(self, prof, name):
+        prof.flush()
+        i = prof.bfm.symtab.ids[name]
+        return (prof.calls[i], prof.excl[i], prof.incl[i])
+
+    def test_counts(self):
+        bfm = self._bfm()
+        now = [0]
+        prof = Profiler(bfm, time_units="ns", time_f=lambda: now[0])
+        prof.attach()
+        sym_ids = bfm.symtab.ids
+
+        C, R = ExecEvent.Call, ExecEvent.Ret
+        self._run(bfm, [
+            (0x100, 0x10, C),                     # main
+            (0x104, 0, 0),
+            (0x200, 0x108, C),                    # f
+            (0x204, 0, 0),
+            (0x300, 0x208, C), (0x304, 0, 0),     # g
+            (0x208, 0, R), (0x20C, 0, 0),
+            (0x108, 0, R),
+            (0x200, 0x10C, C),                    # f again
+            (0x10C, 0, R),
+            (0x400, 0x110, C), (0x404, 0, 0),     # r recurses once
+            (0x400, 0x408, C), (0x404, 0, 0),
+            (0x408, 0, R),
+            (0x110, 0, R),
+            (0x114, 0, 0)])
+        now[0] = 100
+
+        # main has not returned, so has no inclusive count yet
+        self.assertEqual(self._counts(prof, "main"), (1, 6, 0))
+        self.assertEqual(self._counts(prof, "f"), (2, 5, 7))
+        self.assertEqual(self._counts(prof, "g"), (1, 2, 2))
+        self.assertEqual(self._counts(prof, "r"), (2, 5, 5))
+        self.assertEqual(prof.total(), 18)
+        self.assertEqual(prof.excl_time[sym_ids["main"]], 100)
+
+        edges = prof.edges
+        self.assertEqual(edges[(sym_ids["main"], sym_ids["f"])][:2], [2, 7])
+        self.assertEqual(edges[(sym_ids["r"], sym_ids["r"])][:2], [1, 2])
+        self.assertNotIn((sym_ids["<default>"], sym_ids["main"]), edges)
+
+        report = prof.report().splitlines()
+        self.assertEqual(report[1].split()[1:], ["1", "6", "0", "main",
+                                                 "(100ns", "excl,", "0ns", "incl)"])
+        self.assertEqual(len(prof.report(limit=2).splitlines()), 3)
+
+    def test_excp(self):
+        bfm = self._bfm()
+        prof = Profiler(bfm)
+        prof.attach()
+        sym_ids = bfm.symtab.ids
+
+        C, R = ExecEvent.Call, ExecEvent.Ret
+        self._run(bfm, [
+            (0x100, 0x10, C), (0x104, 0, 0),
+            (0x800, 0, ExecEvent.Excp),           # handler base frame
+            (0x804, 0, 0),
+            (0x300, 0x808, C), (0x304, 0, 0),     # g, called from handler
+            (0x808, 0, R),
+            (0x108, 0, ExecEvent.Eret),
+            (0x10C, 0, 0)])
+
+        self.assertEqual(self._counts(prof, "g"), (1, 2, 2))
+        self.assertEqual(self._counts(prof, "main"), (1, 4, 0))
+        self.assertEqual(prof.excl[sym_ids["<exception>"]], 3)
+        self.assertIn((sym_ids["<exception>"], sym_ids["g"]), prof.edges)
+
+        # Frames abandoned in a reused exception context are dropped
+        self._run(bfm, [
+            (0x800, 0, ExecEvent.Excp),
+            (0x300, 0x808, C),
+            (0x110, 0, ExecEvent.Eret),
+            (0x800, 0, ExecEvent.Excp),
+            (0x114, 0, ExecEvent.Eret)])
+        self.assertEqual(prof._active[sym_ids["g"]], 0)
+
+        prof.detach()
+        self.assertEqual(bfm.on_entry_cb, ())
+        self.assertEqual(prof.total(), 14)
+
+    def test_callgrind(self):
+        bfm = self._bfm()
+        prof = Profiler(bfm)
+        prof.attach()
+        self._run(bfm, [
+            (0x100, 0x10, ExecEvent.Call),
+            (0x200, 0x104, ExecEvent.Call), (0x204, 0, 0),
+            (0x104, 0, ExecEvent.Ret)])
+
+        fp = io.StringIO()
+        prof.write_callgrind(fp, cmd="test.elf")
+        out = fp.getvalue()
+        self.assertIn("events: Ir\n", out)
+        self.assertIn("summary: 4\n", out)
+        self.assertIn("fn=main\n0 2\ncfn=f\ncalls=1 0\n0 2\n", out)
+        self.assertIn("fn=f\n0 2\n\n", out)
+
+    def test_pc_filter(self):
+        class FilterBfm(BfmBase):
+            def __init__(self):
+                super().__init__()
+                self.filters = []
+            def pc_filter_changed(self, ranges):
+                self.filters.append(ranges)
+                
+        bfm = FilterBfm()
+        bfm.enable_pc_filter()
+        
+        # Exact instruction counts require every instruction
+        prof = Profiler(bfm)
+        prof.attach()
+        self.assertIsNone(bfm.pc_filter())
+        prof.detach()
+        self.assertEqual(bfm.pc_filter(), [])
+        self.assertEqual(bfm.filters, [[], None, []])
+
+    def test_thread_switch(self):
+        bfm = self._bfm()
+        prof = Profiler(bfm)
+        prof.attach()
+        # Attaching again has no effect
+        prof.attach()
+
+        C = ExecEvent.Call
+        self._run(bfm, [(0x100, 0x10, C), (0x104, 0, 0)])
+        # Switch outside exception context, as an RTOS plugin might
+        bfm.switch_thread(1)
+        self._run(bfm, [(0x500, 0, 0), (0x504, 0, 0), (0x508, 0, 0)])
+        bfm.switch_thread("<default>")
+        self._run(bfm, [(0x108, 0, 0)])
+
+        self.assertEqual(self._counts(prof, "main"), (1, 3, 0))
+        self.assertEqual(prof.excl[bfm.symtab.ids["1"]], 3)
+
+        prof.detach()
+        self.assertEqual(bfm.on_thread_switch_cb, ())
+        self.assertEqual(bfm._n_full_exec, 0)
+        with self.assertRaises(Exception):
+            bfm.require_full_exec(False)
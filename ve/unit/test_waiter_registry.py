@@ -0,0 +1,104 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import sys
+import types
+from unittest import mock
+from unittest.case import TestCase
+
+import pybfms
+
+from core_debug_common.waiter_registry import WaiterRegistry
+
+
+class TestWaiterRegistry(TestCase):
+    
+    def _run(self, co):
+        """Runs a coroutine to its first suspension point, or to completion"""
+        try:
+            co.send(None)
+        except StopIteration as e:
+            return (True, e.value)
+        return (False, None)
+    
+    def test_notify(self):
+        rgy = WaiterRegistry()
+        
+        co1 = rgy.wait({0x100, 0x200})
+        co2 = rgy.wait({0x200})
+        co3 = rgy.wait({0x300})
+        for co in (co1, co2, co3):
+            self.assertEqual(self._run(co), (False, None))
+        self.assertEqual(set(rgy.waiters.keys()), {0x100, 0x200, 0x300})
+        
+        rgy.notify(0x400)
+        rgy.notify(0x200)
+        
+        # Both waiters on 0x200 are released and fully deregistered
+        self.assertEqual(set(rgy.waiters.keys()), {0x300})
+        self.assertEqual(self._run(co1), (True, 0x200))
+        self.assertEqual(self._run(co2), (True, 0x200))
+        
+        co3.close()
+        
+    def test_cancel(self):
+        rgy = WaiterRegistry()
+        
+        co = rgy.wait({0x100})
+        self._run(co)
+        self.assertIn(0x100, rgy.waiters.keys())
+        
+        # Killing the waiting coroutine removes the waiter
+        co.close()
+        self.assertEqual(rgy.waiters, {})
+        
+    def test_refresh(self):
+        changes = []
+        rgy = WaiterRegistry(lambda: changes.append(set(rgy.waiters.keys())))
+        addrs = set()
+        
+        co = rgy.wait(set(addrs), resolve=lambda: set(addrs))
+        self._run(co)
+        self.assertEqual(rgy.waiters, {})
+        
+        addrs.update({0x100, 0x200})
+        self.assertTrue(rgy.refresh())
+        self.assertEqual(changes, [{0x100, 0x200}])
+        self.assertFalse(rgy.refresh())
+        
+        rgy.notify(0x200)
+        self.assertEqual(self._run(co), (True, 0x200))
+        self.assertEqual(rgy.resolved, [])
+        self.assertEqual(rgy.waiters, {})
+        
+    def test_timeout(self):
+        delays = []
+        class Delay(object):
+            """Stub backend delay that has already elapsed"""
+            def __init__(self, t, units):
+                delays.append((t, units))
+            def __await__(self):
+                return None
+                yield
+        class First(object):
+            """Stub of cocotb's First, as resolved when the delay wins"""
+            def __init__(self, *triggers):
+                self.triggers = triggers
+            def __await__(self):
+                return (yield from self.triggers[-1].__await__())
+            
+        triggers = types.ModuleType("cocotb.triggers")
+        triggers.First = First
+        cocotb = types.ModuleType("cocotb")
+        cocotb.triggers = triggers
+        
+        rgy = WaiterRegistry()
+        with mock.patch.dict(sys.modules, {"cocotb" : cocotb, "cocotb.triggers" : triggers}), \
+                mock.patch.object(pybfms, "delay", Delay):
+            co = rgy.wait({0x100}, timeout=10, units="us")
+            self.assertEqual(self._run(co), (True, None))
+            
+        self.assertEqual(delays, [(10, "us")])
+        self.assertEqual(rgy.waiters, {})
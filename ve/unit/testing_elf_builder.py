@@ -0,0 +1,163 @@
+'''
+Created on Oct 18, 2026
+
+@author: mballance
+'''
+import struct
+
+
+class TestingElfBuilder(object):
+    """Writes minimal 32-bit little-endian ELF executables for tests.
+    
+    Each allocated PROGBITS section gets its own PT_LOAD segment. A
+    NOBITS section directly following a PROGBITS section extends that
+    section's segment, as a linker would lay out .data and .bss
+    """
+    
+    # Not a test case, despite the name
+    __test__ = False
+    
+    SHT_PROGBITS = 1
+    SHT_SYMTAB = 2
+    SHT_STRTAB = 3
+    SHT_NOBITS = 8
+    
+    SHF_WRITE = 0x1
+    SHF_ALLOC = 0x2
+    SHF_EXECINSTR = 0x4
+    
+    STT_NOTYPE = 0
+    STT_OBJECT = 1
+    STT_FUNC = 2
+    
+    STB_LOCAL = 0
+    STB_GLOBAL = 1
+    
+    def __init__(self):
+        # List of (name, type, flags, addr, data, size)
+        self.sections = []
+        # List of (name, value, size, type, bind)
+        self.symbols = []
+        
+    def add_text(self, name, addr, data):
+        self.sections.append((name, self.SHT_PROGBITS, 
+            self.SHF_ALLOC|self.SHF_EXECINSTR, addr, bytes(data), len(data)))
+        
+    def add_data(self, name, addr, data):
+        self.sections.append((name, self.SHT_PROGBITS, 
+            self.SHF_ALLOC|self.SHF_WRITE, addr, bytes(data), len(data)))
+        
+    def add_bss(self, name, addr, size):
+        self.sections.append((name, self.SHT_NOBITS, 
+            self.SHF_ALLOC|self.SHF_WRITE, addr, b"", size))
+        
+    def add_symbol(self, name, value, size=0, type=STT_FUNC, bind=STB_GLOBAL):
+        self.symbols.append((name, value, size, type, bind))
+        
+    def write(self, path):
+        with open(path, "wb") as fp:
+            fp.write(self.build())
+        
+    def build(self) -> bytes:
+        # Segments: [vaddr, offset, filesz, memsz, flags]
+        segs = []
+        n_segs = 0
+        prev = None
+        for s in self.sections:
+            if s[1] == self.SHT_PROGBITS or prev is None or prev[1] != self.SHT_PROGBITS:
+                n_segs += 1
+            prev = s
+        
+        off = 52 + 32*n_segs
+        body = bytearray()
+        sh_offsets = []
+        prev = None
+        for name, sh_type, flags, addr, data, size in self.sections:
+            if sh_type == self.SHT_PROGBITS:
+                while (off+len(body)) % 4 != 0:
+                    body.append(0)
+                sh_offsets.append(off+len(body))
+                segs.append([addr, off+len(body), size, size, 
+                    4|(2 if flags & self.SHF_WRITE else 0)|(1 if flags & self.SHF_EXECINSTR else 0)])
+                body.extend(data)
+            else:
+                sh_offsets.append(off+len(body))
+                if prev is not None and prev[1] == self.SHT_PROGBITS:
+                    segs[-1][3] = (addr + size) - segs[-1][0]
+                else:
+                    segs.append([addr, off+len(body), 0, size, 6])
+            prev = (name, sh_type)
+            
+        # String tables
+        shstrtab = bytearray(b"\0")
+        def shstr(s):
+            ret = len(shstrtab)
+            shstrtab.extend(s.encode() + b"\0")
+            return ret
+        strtab = bytearray(b"\0")
+        
+        # Symbol table. Locals must precede globals
+        syms = sorted(self.symbols, key=lambda s: s[4] != self.STB_LOCAL)
+        symtab = bytearray(16)
+        n_local = 1
+        for name, value, size, st_type, bind in syms:
+            st_name = len(strtab)
+            strtab.extend(name.encode() + b"\0")
+            shndx = 0xFFF1
+            for i, sec in enumerate(self.sections):
+                if sec[3] <= value < sec[3]+max(sec[5], 1):
+                    shndx = i+1
+                    break
+            symtab.extend(struct.pack("<IIIBBH", 
+                st_name, value, size, (bind << 4)|st_type, 0, shndx))
+            if bind == self.STB_LOCAL:
+                n_local += 1
+            
+        # Section headers: (name, type, flags, addr, offset, size, link, info, align, entsize)
+        shdrs = [(0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+        for i, (name, sh_type, flags, addr, data, size) in enumerate(self.sections):
+            shdrs.append((shstr(name), sh_type, flags, addr, sh_offsets[i], size, 0, 0, 4, 0))
+            
+        symtab_idx = len(shdrs)
+        off_symtab = off + len(body)
+        body.extend(symtab)
+        shdrs.append((shstr(".symtab"), self.SHT_SYMTAB, 0, 0, off_symtab, len(symtab), 
+                      symtab_idx+1, n_local, 4, 16))
+        off_strtab = off + len(body)
+        body.extend(strtab)
+        shdrs.append((shstr(".strtab"), self.SHT_STRTAB, 0, 0, off_strtab, len(strtab), 0, 0, 1, 0))
+        shstrndx = len(shdrs)
+        name_shstrtab = shstr(".shstrtab")
+        off_shstrtab = off + len(body)
+        body.extend(shstrtab)
+        shdrs.append((name_shstrtab, self.SHT_STRTAB, 0, 0, off_shstrtab, len(shstrtab), 0, 0, 1, 0))
+        
+        while (off+len(body)) % 4 != 0:
+            body.append(0)
+        off_shdrs = off + len(body)
+        
+        ret = bytearray()
+        ret.extend(b"\x7fELF" + bytes([1, 1, 1, 0]) + bytes(8))
+        ret.extend(struct.pack("<HHIIIIIHHHHHH",
+            2,          # ET_EXEC
+            243,        # EM_RISCV
+            1,
+            segs[0][0] if len(segs) else 0,
+            52,
+            off_shdrs,
+            0,
+            52,
+            32,
+            len(segs),
+            40,
+            len(shdrs),
+            shstrndx))
+        for vaddr, offset, filesz, memsz, flags in segs:
+            ret.extend(struct.pack("<IIIIIIII", 
+                1, offset, vaddr, vaddr, filesz, memsz, flags, 4))
+        ret.extend(body)
+        for sh in shdrs:
+            ret.extend(struct.pack("<IIIIIIIIII", *sh))
+            
+        return bytes(ret)
+    